@@ -0,0 +1,1160 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the bot's hot paths: before/after timings only.
+Runs against a throw-away copy of the schema, never the live whitebot.db.
+Correctness checks (query plans, idempotency, equal results) live in tests/.
+
+Without a config.py the WHITEBOT_* environment stub from tests/config_stub.py
+is used.
+
+Usage: python benchmark.py [name ...]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import sqlite3
+import tempfile
+import time
+
+from tests import config_stub
+
+config_stub.install()
+
+from tests.stub_provider import load_products_list, start_stub_provider  # noqa: E402
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register a benchmark under ``name`` (python benchmark.py <name>)."""
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def print_header(text):
+    print(f"\n{'='*60}")
+    print(f"  {text}")
+    print(f"{'='*60}\n")
+
+
+def print_result(label, seconds, calls):
+    per_call_us = seconds / calls * 1_000_000
+    print(f"  {label:<38} {per_call_us:>10.1f} µs/call  ({calls} calls)")
+    return per_call_us
+
+
+def _timeit(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return time.perf_counter() - start
+
+
+def _temp_database():
+    """Point services.database at a fresh temp file and create the schema."""
+    import services.catalog_snapshot as catalog_snapshot
+    import services.database as database
+    import services.settings as settings
+
+    tmp_dir = tempfile.mkdtemp(prefix="whitebot_bench_")
+    path = os.path.join(tmp_dir, "bench.db")
+    database.DB_NAME = path
+    settings.DB_NAME = path
+    settings._table_ready = False
+    settings.invalidate()
+    catalog_snapshot.SNAPSHOT_PATH = os.path.join(tmp_dir, "catalog_snapshot.bin")
+    with contextlib.redirect_stdout(io.StringIO()):   # migration messages
+        database.init_db()
+        settings.init_settings_table()
+    return path
+
+
+@benchmark("pool")
+def bench_connection_pool(calls=5000):
+    """Per-call latency of get_balance: connect-per-call vs pooled connection."""
+    print_header("Connection pool: get_balance latency")
+    import services.database as database
+
+    path = _temp_database()
+    database.add_balance("1000", 25.0)
+
+    def unpooled_get_balance():
+        # Behaviour before the pool: open, query, close on every call.
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT balance FROM users WHERE user_id = ?", ("1000",)).fetchone()
+        conn.close()
+        return row['balance']
+
+    def pooled_get_balance():
+        return database.get_balance("1000")
+
+    before = print_result("connect per call (before)", _timeit(unpooled_get_balance, calls), calls)
+    after = print_result("pooled get_balance (after)", _timeit(pooled_get_balance, calls), calls)
+    print(f"\n  speed-up: x{before / after:.1f}")
+
+
+@benchmark("admin_check")
+def bench_admin_check(calls=20000):
+    """is_user_admin on the middleware hot path: DB query vs in-memory admin set."""
+    print_header("Admin check: per-update role resolution")
+    import config
+    import services.database as database
+
+    _temp_database()
+    database.add_balance("2000", 0)
+
+    def db_lookup():
+        # Behaviour before the admin set: config check, then a query per call.
+        user_id = 2000
+        if user_id in config.ADMIN_IDS:
+            return True
+        conn = database.get_db_connection()
+        row = conn.execute("SELECT is_admin FROM users WHERE user_id = ?", (str(user_id),)).fetchone()
+        conn.close()
+        return bool(row['is_admin']) if row else False
+
+    before = print_result("pooled DB query (before)", _timeit(db_lookup, calls), calls)
+    after = print_result("in-memory admin set (after)", _timeit(lambda: database.is_user_admin(2000), calls), calls)
+    print(f"\n  speed-up: x{before / after:.1f}")
+
+
+@benchmark("subscription")
+def bench_subscription_cache(users=50, updates=2000, api_latency=0.05):
+    """Subscription checks for a burst of updates: get_chat_member per update vs TTL cache."""
+    print_header("Subscription check: get_chat_member per update vs cache")
+    import asyncio
+    import random
+    from services.subscription_cache import SubscriptionCache
+
+    rng = random.Random(7)
+    stream = [rng.randrange(users) for _ in range(updates)]
+    api_calls = 0
+
+    async def get_chat_member(user_id):
+        nonlocal api_calls
+        api_calls += 1
+        await asyncio.sleep(api_latency)
+        return user_id % 5 != 0
+
+    async def handle_all(check):
+        # 20 updates in flight at a time, like a busy polling loop
+        for i in range(0, len(stream), 20):
+            await asyncio.gather(*(check(uid) for uid in stream[i:i + 20]))
+
+    async def run():
+        nonlocal api_calls
+        cache = SubscriptionCache()
+        for label, check in (("get_chat_member per update (before)", get_chat_member),
+                             ("TTL cache + single-flight (after)",
+                              lambda uid: cache.is_subscribed(uid, get_chat_member))):
+            api_calls = 0
+            start = time.perf_counter()
+            await handle_all(check)
+            elapsed = time.perf_counter() - start
+            print(f"  {label:<38} {elapsed * 1000:>8.0f} ms  {api_calls:>5} Telegram calls")
+        print(f"\n  cache stats: {cache.stats()}")
+
+    asyncio.run(run())
+
+
+@benchmark("classifier")
+def bench_category_classifier(rounds=20):
+    """Category assignment for refresh_data over products_list.txt."""
+    print_header("Category classifier: products_list.txt")
+    import data.mappings as mappings
+    from services.catalog import clean_str
+    from services.category_classifier import CategoryClassifier
+
+    products = load_products_list()
+
+    def keyword_loop():
+        # Behaviour before the classifier: merged map rebuilt per product, any() per key.
+        keys = []
+        for p in products:
+            name = clean_str(p.get('name', ''))
+            cat_name = clean_str(p.get('category_name', '')).lower()
+            category_key = "default"
+            all_maps = {**mappings.GAMES_MAP, **mappings.APPS_MAP}
+            search_text = (cat_name + " " + name.lower())
+            for key, keywords in all_maps.items():
+                if any(kw in search_text for kw in keywords):
+                    category_key = key
+                    break
+            keys.append(category_key)
+        return keys
+
+    classifier = CategoryClassifier({**mappings.GAMES_MAP, **mappings.APPS_MAP})
+
+    def compiled():
+        return [classifier.classify(clean_str(p.get('category_name', '')), clean_str(p.get('name', '')))
+                for p in products]
+
+    calls = rounds * len(products)
+    before = print_result("keyword loop (before)", _timeit(keyword_loop, rounds), calls)
+    after = print_result("compiled classifier (after)", _timeit(compiled, rounds), calls)
+    print(f"\n  speed-up: x{before / after:.1f}")
+
+    hits = sum(1 for k in compiled() if k != "default")
+    print(f"  categorized: {hits} of {len(products)} products")
+
+
+@benchmark("provider")
+def bench_provider_client(calls=300):
+    """/check latency against a local stub: new connection per call vs pooled keep-alive session."""
+    print_header("Provider client: connection reuse")
+    import asyncio
+    try:
+        from services.provider_client import ProviderClient
+    except ImportError as e:
+        print(f"❌ {e} (pip install -r requirements.txt)")
+        return
+
+    server = start_stub_provider(load_products_list())
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    async def fresh_connection_per_call():
+        # Behaviour before the client: every call opened its own connection.
+        for _ in range(calls):
+            client = ProviderClient(base_url, "bench")
+            await client.check_orders(["1"])
+            await client.close()
+
+    async def pooled_client():
+        client = ProviderClient(base_url, "bench")
+        for _ in range(calls):
+            await client.check_orders(["1"])
+        await client.close()
+
+    try:
+        for label, scenario in (("new connection per call (before)", fresh_connection_per_call),
+                                ("pooled keep-alive session (after)", pooled_client)):
+            server.connections = 0
+            start = time.perf_counter()
+            asyncio.run(scenario())
+            print_result(label, time.perf_counter() - start, calls)
+            print(f"  {'':<38} {server.connections:>10} TCP connections")
+    finally:
+        server.shutdown()
+
+
+@benchmark("refresh")
+def bench_catalog_refresh():
+    """refresh_data against a local stub: full, 304, small diff and margin change."""
+    print_header("Catalog refresh: conditional and incremental")
+    import asyncio
+    import copy
+    try:
+        import services.api_manager as api_manager
+        from services import provider_client
+    except ImportError as e:
+        print(f"❌ {e} (pip install -r requirements.txt)")
+        return
+    import config
+    import services.settings as settings
+
+    products = load_products_list()
+    server = start_stub_provider(products)
+    config.API_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    _temp_database()
+
+    async def run():
+        async def timed(label, **kwargs):
+            start = time.perf_counter()
+            await api_manager.refresh_data(**kwargs)
+            elapsed = (time.perf_counter() - start) * 1000
+            stats = api_manager.get_last_refresh_stats()
+            print(f"  {label:<30} {elapsed:>8.1f} ms  {stats['status']:<12} "
+                  f"+{stats['added']} ~{stats['changed']} -{stats['removed']} repriced {stats['repriced']}")
+
+        await timed("first refresh")
+        await timed("no change (ETag -> 304)")
+
+        edited = copy.deepcopy(products[:-3])   # 3 products removed
+        for p in edited[:5]:                   # 5 price changes
+            p['price'] = float(p.get('price') or 0) + 1
+        server.set_products(edited)
+        await timed("5 changed, 3 removed")
+
+        margins = dict(settings.get_setting("margins", {}))
+        margins["default"] = float(margins.get("default", 1.0)) + 0.05
+        settings.update_setting("margins", margins)
+        await timed("margin change (304, reprice)")
+        await timed("forced", force=True)
+        await provider_client.close_client()
+
+    try:
+        import contextlib
+        import io
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            asyncio.run(run())
+        print("\n".join(line for line in log.getvalue().splitlines() if line.startswith("  ")))
+    finally:
+        server.shutdown()
+
+
+@benchmark("warm_start")
+def bench_warm_start():
+    """First category click after a restart: cold refresh_data vs catalog snapshot + background revalidation."""
+    print_header("Warm start: catalog snapshot")
+    import asyncio
+    try:
+        import services.api_manager as api_manager
+        from services import provider_client
+    except ImportError as e:
+        print(f"❌ {e} (pip install -r requirements.txt)")
+        return
+    import config
+    import services.catalog_snapshot as catalog_snapshot
+    from services.catalog import ProductCatalog
+
+    products = load_products_list()
+    server = start_stub_provider(products)
+    config.API_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    _temp_database()
+
+    def restart():
+        # What a new process starts with.
+        api_manager._catalog = ProductCatalog()
+        api_manager._raw_products = {}
+        api_manager._feed_hash = None
+        api_manager._priced_margins = None
+        api_manager._feed_validators.clear()
+
+    async def first_click(short_id):
+        start = time.perf_counter()
+        prods = await api_manager.get_products_by_cat_id(short_id)
+        return (time.perf_counter() - start) * 1000, prods
+
+    async def run():
+        await api_manager.refresh_data()
+        reference = api_manager.get_catalog()
+        short_id = next(iter(reference.by_category))
+        size = os.path.getsize(catalog_snapshot.SNAPSHOT_PATH)
+
+        restart()
+        os.rename(catalog_snapshot.SNAPSHOT_PATH, catalog_snapshot.SNAPSHOT_PATH + ".off")
+        cold_ms, _ = await first_click(short_id)
+
+        restart()
+        os.rename(catalog_snapshot.SNAPSHOT_PATH + ".off", catalog_snapshot.SNAPSHOT_PATH)
+        start = time.perf_counter()
+        api_manager.warm_start()
+        load_ms = (time.perf_counter() - start) * 1000
+        warm_ms, _ = await first_click(short_id)
+        unknown_ms, _ = await first_click("no-such-category")
+        await api_manager._revalidate_task
+        await provider_client.close_client()
+        return size, cold_ms, load_ms, warm_ms, unknown_ms
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            size, cold_ms, load_ms, warm_ms, unknown_ms = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    print(f"  snapshot: {size / 1024:.0f} KiB (products_list.txt: {os.path.getsize('products_list.txt') / 1024:.0f} KiB)")
+    print(f"  {'first click, cold (before)':<40} {cold_ms:>8.1f} ms  (provider fetch + pricing; more with a remote provider)")
+    print(f"  {'warm_start() at boot':<40} {load_ms:>8.1f} ms")
+    print(f"  {'first click, warm (after)':<40} {warm_ms:>8.3f} ms")
+    print(f"  {'unknown category id (after)':<40} {unknown_ms:>8.3f} ms  (refresh runs in the background)")
+
+
+@benchmark("product_sync")
+def bench_product_sync(rounds=5):
+    """sync_products_from_api: per-row INSERT OR REPLACE loop vs bulk hashed upsert."""
+    print_header("Product sync: products_list.txt into SQLite")
+    import contextlib
+    import copy
+    import io
+    import services.database as database
+
+    path = _temp_database()
+    products = load_products_list()
+
+    def row_loop():
+        # Behaviour before the bulk path: CREATE TABLE + one statement per product.
+        conn = sqlite3.connect(path)
+        c = conn.cursor()
+        c.execute('''CREATE TABLE IF NOT EXISTS products (
+            id TEXT PRIMARY KEY, name TEXT, price REAL, category_name TEXT,
+            min_qty INTEGER DEFAULT 1, max_qty INTEGER DEFAULT 1000, description TEXT
+        )''')
+        for p in products:
+            c.execute("""
+                INSERT OR REPLACE INTO products
+                (id, name, price, category_name, min_qty, max_qty, description)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (str(p.get('id')), p.get('name', 'Unknown'), float(p.get('price', 0)),
+                  p.get('category_name', 'General'), int(p.get('min', 1)), int(p.get('max', 1000)),
+                  p.get('description', '')))
+        conn.commit()
+        conn.close()
+
+    def bulk(items):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return database.sync_products_from_api(items, prune=True)
+
+    loop_ms = _timeit(row_loop, rounds) / rounds * 1000
+    print(f"  {'row loop, full catalog (before)':<38} {loop_ms:>10.1f} ms  ({len(products)} rows written)")
+
+    database.get_db_connection().execute("DELETE FROM products").connection.commit()
+    stats = bulk(products)
+    print(f"  {'bulk, empty table':<38} {stats['seconds'] * 1000:>10.1f} ms  "
+          f"(+{stats['inserted']} ~{stats['updated']} -{stats['deleted']} rows written)")
+    stats = bulk(products)
+    print(f"  {'bulk, unchanged feed':<38} {stats['seconds'] * 1000:>10.1f} ms  "
+          f"(+{stats['inserted']} ~{stats['updated']} -{stats['deleted']} rows written)")
+    edited = copy.deepcopy(products[:-3])
+    for p in edited[:5]:
+        p['price'] = float(p.get('price') or 0) + 1
+    stats = bulk(edited)
+    print(f"  {'bulk, 5 changed / 3 vanished':<38} {stats['seconds'] * 1000:>10.1f} ms  "
+          f"(+{stats['inserted']} ~{stats['updated']} -{stats['deleted']} rows written)")
+
+
+@benchmark("poller")
+def bench_order_poller(orders=2000, fresh_share=0.1):
+    """Order status polling: single call + linear matching vs batched poller with backoff."""
+    print_header("Order poller: open api_orders")
+    import asyncio
+    import contextlib
+    import io
+    try:
+        import services.api_manager as api_manager
+        from services import provider_client
+        from services.order_poller import OrderPoller, TICK_SECONDS
+    except ImportError as e:
+        print(f"❌ {e} (pip install -r requirements.txt)")
+        return
+    import config
+    import services.database as database
+
+    server = start_stub_provider([])
+    # provider cost model: 10 ms per request + 0.2 ms per order id looked up
+    server.check_delay = lambda n: 0.010 + 0.0002 * n
+    # a third of the orders get rejected, a third completed, the rest stay pending
+    server.check_status = lambda u: ("rejected", "completed", "pending")[int(u.split("-")[1]) % 3]
+    config.API_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def seed():
+        _temp_database()
+        for i in range(orders):
+            database.log_api_order(str(1000 + i % 50), f"bench-{i}", "Product", 1.0, "pending", order_id=str(i))
+        conn = database.get_db_connection()
+        # most open orders are old; only fresh_share were placed in the last minutes
+        conn.execute("UPDATE api_orders SET created_at = datetime('now', '-2 days') WHERE CAST(order_id AS INTEGER) >= ?",
+                     (int(orders * fresh_share),))
+        conn.commit()
+        conn.close()
+
+    async def linear_cycle():
+        # Behaviour before the poller: one /check, next() scans, per-order queries and writes.
+        pending_orders = database.get_pending_api_orders()
+        stats = await api_manager.check_orders_status([o['uuid'] for o in pending_orders])
+        for stat in stats or []:
+            local_order = next((o for o in pending_orders if o['uuid'] == stat.get('order_uuid')), None)
+            if not local_order:
+                continue
+            current = database.get_order_by_uuid(local_order['uuid'])
+            if not current or current['status'] != 'pending':
+                continue
+            if stat['status'] == 'completed':
+                database.update_api_order_status(local_order['uuid'], "completed", code="CODE", notified=1)
+            elif stat['status'] == 'rejected':
+                database.update_api_order_status(local_order['uuid'], "rejected", notified=1)
+                database.add_balance(local_order['user_id'], float(local_order['price']))
+
+    async def poller_cycle():
+        return await OrderPoller().run_cycle()
+
+    async def run():
+        print(f"  one cycle, {orders} open orders:")
+        for label, cycle in (("single call + linear match (before)", linear_cycle),
+                             ("batched concurrent poller (after)", poller_cycle)):
+            seed()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                await cycle()
+            elapsed = time.perf_counter() - start
+            still_open = len(database.get_pending_api_orders())
+            refunded = sum(database.get_balance(str(1000 + u)) for u in range(50))
+            print(f"  {label:<38} {elapsed * 1000:>8.1f} ms  open after: {still_open}, refunded: {refunded:.0f}$")
+        await provider_client.close_client()
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    # Steady state: how many order ids reach /check in one hour when nothing resolves
+    seed()
+    pending_orders = database.get_pending_api_orders()
+    poller, now, polled = OrderPoller(), time.time(), 0
+    for tick in range(3600 // TICK_SECONDS):
+        due = poller._due(pending_orders, now + tick * TICK_SECONDS)
+        poller._schedule(due, now + tick * TICK_SECONDS)
+        polled += len(due)
+    print(f"\n  order ids sent to /check per hour ({len(pending_orders)} open, {fresh_share:.0%} fresh):")
+    print(f"  {'fixed 60 s loop (before)':<38} {60 * len(pending_orders):>8}")
+    print(f"  {'age-based backoff (after)':<38} {polled:>8}")
+
+
+@benchmark("broadcast")
+def bench_broadcast(users=300, send_latency=0.04):
+    """Broadcast engine against a fake Telegram API: throughput, blocked users, crash + resume."""
+    print_header("Broadcast: rate-limited, resumable")
+    import asyncio
+    from types import SimpleNamespace
+    try:
+        from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+        from aiogram.methods import CopyMessage
+        import services.broadcast as broadcast
+    except ImportError as e:
+        print(f"❌ {e} (pip install -r requirements.txt)")
+        return
+    import services.database as database
+
+    class FakeBot:
+        """copy_message takes send_latency; every 10th user blocked the bot, one flood-wait."""
+
+        def __init__(self):
+            self.delivered = []
+            self.flood_sent = False
+
+        async def copy_message(self, chat_id, from_chat_id, message_id):
+            await asyncio.sleep(send_latency)
+            method = CopyMessage(chat_id=chat_id, from_chat_id=from_chat_id, message_id=message_id)
+            if int(chat_id) % 10 == 0:
+                raise TelegramForbiddenError(method, "Forbidden: bot was blocked by the user")
+            if not self.flood_sent and len(self.delivered) == users // 2:
+                self.flood_sent = True
+                raise TelegramRetryAfter(method, "Too Many Requests", 1)
+            self.delivered.append(chat_id)
+
+        async def edit_message_text(self, *args, **kwargs):
+            pass
+
+    _temp_database()
+    for i in range(users):
+        database.ensure_user_exists(str(10_000 + i))
+    source = SimpleNamespace(chat=SimpleNamespace(id=1), message_id=1)
+
+    async def run():
+        bot = FakeBot()
+        start = time.perf_counter()
+        job_id, total = await broadcast.start_broadcast(bot, source, source)
+        await asyncio.sleep(2)
+        # simulated crash: stop the job mid-way, then resume it like main.py does on start-up
+        task = broadcast._running[job_id]
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        progress = database.get_broadcast_progress(job_id)
+        print(f"  after crash:  {progress}")
+        await broadcast.resume_broadcasts(bot)
+        await asyncio.gather(*broadcast._running.values())
+        elapsed = time.perf_counter() - start
+
+        progress = database.get_broadcast_progress(job_id)
+        duplicates = len(bot.delivered) - len(set(bot.delivered))
+        blocked_flagged = database.get_db_connection().execute(
+            "SELECT COUNT(*) FROM users WHERE blocked_bot = 1").fetchone()[0]
+        print(f"  after resume: {progress}")
+        print(f"  duplicates: {duplicates}, users flagged blocked: {blocked_flagged}")
+        print(f"\n  {total} recipients in {elapsed:.1f} s "
+              f"(rate limit {broadcast.GLOBAL_RATE}/s, {send_latency * 1000:.0f} ms per send, one 1 s flood wait)")
+        serial = 0.15 + send_latency
+        print(f"  50,000 users: old serial loop ~{50_000 * serial / 3600:.1f} h, "
+              f"engine ~{50_000 / broadcast.GLOBAL_RATE / 60:.0f} min")
+
+    with contextlib.redirect_stdout(io.StringIO()) as log:
+        asyncio.run(run())
+    print("\n".join(line for line in log.getvalue().splitlines() if line.startswith("  ")))
+
+
+@benchmark("report_render")
+def bench_report_render(categories=400, reports=3):
+    """PDF rendering: event-loop stall with reportlab on the loop vs the render pool; cache hits."""
+    print_header("Report rendering: event loop stays responsive")
+    import asyncio
+    import tempfile
+    try:
+        from reports.pdf_builder import build_sales_report_pdf
+        from reports.renderer import ReportRenderer
+    except ImportError as e:
+        print(f"❌ {e} (pip install -r requirements.txt)")
+        return
+    out_dir = tempfile.mkdtemp(prefix="whitebot_reports_")
+    jobs = [(f"day-{n}", os.path.join(out_dir, f"report_{n}.pdf"), {
+        "title": "Daily Sales Report", "date_range": f"2024-03-{n + 1:02d}", "total_orders": 1000 + n,
+        "total_sales_usd": 2500.5, "total_sales_syp": 37_500_000,
+        "category_breakdown": {f"Category {c}": c + n for c in range(categories)},
+    }) for n in range(reports)]
+
+    async def measure(render_all):
+        # Longest gap between 10 ms ticks while the reports render.
+        worst, done = 0.0, False
+
+        async def ticker():
+            nonlocal worst
+            last = time.perf_counter()
+            while not done:
+                await asyncio.sleep(0.01)
+                now = time.perf_counter()
+                worst = max(worst, now - last - 0.01)
+                last = now
+
+        tick = asyncio.create_task(ticker())
+        await asyncio.sleep(0.02)
+        start = time.perf_counter()
+        await render_all()
+        elapsed = time.perf_counter() - start
+        done = True
+        await tick
+        return elapsed, worst
+
+    async def on_loop():
+        # Behaviour before: the scheduler job called reportlab directly.
+        for _, path, data in jobs:
+            build_sales_report_pdf(path, data)
+
+    async def run():
+        renderer = ReportRenderer()
+
+        async def pooled():
+            await asyncio.gather(*(renderer.render("daily", rng, path, data) for rng, path, data in jobs))
+
+        await pooled()   # start the worker processes
+        for _, path, _ in jobs:
+            os.remove(path)
+        renderer._cache.clear()
+        results = {"before": await measure(on_loop), "after": await measure(pooled)}
+        start = time.perf_counter()
+        await pooled()
+        cached = time.perf_counter() - start
+        renderer.shutdown()
+        return results, cached, renderer.metrics
+
+    results, cached, metrics = asyncio.run(run())
+    for label, (elapsed, worst) in results.items():
+        print(f"  {reports} reports, {label:<6}  total {elapsed * 1000:7.1f} ms, longest loop stall {worst * 1000:7.1f} ms")
+    print(f"  unchanged reports again (cache):  {cached * 1000:.2f} ms  {metrics}")
+
+
+@benchmark("report_archive")
+def bench_report_archive(files=3000, calls=200):
+    """Report menus: os.listdir + sort per open vs report_archive page; file_id reuse; retention."""
+    print_header("Report archive: paginated menus, file_id reuse, retention")
+    import asyncio
+    from datetime import datetime, timedelta
+    from types import SimpleNamespace
+    try:
+        from aiogram.types import FSInputFile
+        import reports.archive as archive
+    except ImportError as e:
+        print(f"❌ {e} (pip install -r requirements.txt)")
+        return
+    import services.database as database
+
+    _temp_database()
+    cwd = os.getcwd()
+    os.chdir(tempfile.mkdtemp(prefix="whitebot_archive_"))
+    try:
+        os.makedirs(archive.report_dir("daily"))
+        first_day = datetime(2024, 1, 1)
+        for n in range(files):
+            day = (first_day + timedelta(days=n)).strftime("%Y_%m_%d")
+            with open(os.path.join(archive.report_dir("daily"), f"daily_sales_{day}.pdf"), "wb") as f:
+                f.write(b"%PDF-1.4 " + day.encode())
+        archive.index_existing_reports()
+
+        def old_page():
+            # Behaviour before: list and sort the directory on every menu open.
+            names = [f for f in os.listdir(archive.report_dir("daily")) if f.endswith('.pdf')]
+            names.sort(reverse=True)
+            return names[:20]
+
+        def new_page():
+            return database.count_report_archive("daily"), database.get_report_archive_page("daily", 10, 0)
+
+        before = print_result(f"menu open, {files} PDFs: listdir (before)", _timeit(old_page, calls), calls)
+        after = print_result("menu open: report_archive page (after)", _timeit(new_page, calls), calls)
+        newest = new_page()[1][0]['period']
+        print(f"  speed-up: x{before / after:.1f}\n")
+
+        async def run():
+            uploads, sends = [], []
+
+            async def send(document):
+                sends.append(document)
+                if isinstance(document, FSInputFile):
+                    uploads.append(document)
+                return SimpleNamespace(document=SimpleNamespace(file_id=f"tg-file-{len(uploads)}"))
+
+            for _ in range(5):
+                await archive.send_report(send, "daily", newest)
+            last = datetime.strptime(newest, "%Y_%m_%d")
+            # one old report was sent before (has a file_id), the rest never were
+            await archive.send_report(send, "daily", "2024_01_01")
+            released, removed = await archive.apply_retention(now=last)
+            return uploads, sends, released, removed
+
+        uploads, sends, released, removed = asyncio.run(run())
+        kept_files = len(os.listdir(archive.report_dir("daily")))
+        print(f"  downloads: {len(sends)} sends, {len(uploads)} uploads (others by file_id)")
+        print(f"  retention ({archive.RETENTION_DAYS['daily']} days): {released} kept as Telegram copy, "
+              f"{removed} removed, {kept_files} PDFs left on disk")
+    finally:
+        os.chdir(cwd)
+
+
+@benchmark("media")
+def bench_media_registry(clicks=200):
+    """Home/section images: upload per click (before) vs file_id registry; replaced image; stale file_id."""
+    print_header("Media registry: static images sent by file_id")
+    import asyncio
+    import shutil
+    from types import SimpleNamespace
+    try:
+        from aiogram.exceptions import TelegramBadRequest
+        from aiogram.methods import SendPhoto
+        from aiogram.types import FSInputFile
+        import services.media as media
+    except ImportError as e:
+        print(f"❌ {e} (pip install -r requirements.txt)")
+        return
+
+    _temp_database()
+    asset_dir = tempfile.mkdtemp(prefix="whitebot_assets_")
+    store = os.path.join(asset_dir, "store.jpg")
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "store.jpg"), store)
+
+    class FakeMessage:
+        """Telegram stand-in: counts uploaded bytes, hands out file_ids, rejects revoked ones."""
+
+        def __init__(self):
+            self.uploaded_bytes = 0
+            self.uploads = 0
+            self.revoked = set()
+
+        async def answer_photo(self, photo, **kwargs):
+            if isinstance(photo, FSInputFile):
+                self.uploads += 1
+                self.uploaded_bytes += os.path.getsize(photo.path)
+                return SimpleNamespace(photo=[SimpleNamespace(file_id="thumb"),
+                                              SimpleNamespace(file_id=f"photo-{self.uploads}")])
+            if photo in self.revoked:
+                raise TelegramBadRequest(SendPhoto(chat_id=1, photo=photo), "Bad Request: wrong file identifier")
+            return SimpleNamespace(photo=[SimpleNamespace(file_id=photo)])
+
+    async def run():
+        before = FakeMessage()
+        for _ in range(clicks):
+            await before.answer_photo(FSInputFile(store), caption="home")
+
+        after = FakeMessage()
+        registry = media.MediaRegistry()
+        for _ in range(clicks):
+            await registry.answer_photo(after, store, caption="home")
+        steady = (after.uploads, after.uploaded_bytes)
+
+        with open(store, "ab") as f:      # admin replaces the image
+            f.write(b"new")
+        await registry.answer_photo(after, store, caption="home")
+        replaced = after.uploads
+
+        after.revoked.add(f"photo-{after.uploads}")   # e.g. bot token changed
+        await registry.answer_photo(after, store, caption="home")
+        await registry.answer_photo(after, store, caption="home")
+        restarted = media.MediaRegistry()             # file_ids persist across restarts
+        await restarted.answer_photo(after, store, caption="home")
+        return before, after, steady, replaced, restarted
+
+    before, after, steady, replaced, restarted = asyncio.run(run())
+    print(f"  {clicks} home clicks, before: {before.uploads} uploads, {before.uploaded_bytes / 1024:.0f} KiB sent")
+    print(f"  {clicks} home clicks, after:  {steady[0]} upload,  {steady[1] / 1024:.0f} KiB sent")
+    print(f"  replaced image: {replaced - steady[0]} upload; revoked file_id: {after.uploads - replaced} upload; "
+          f"after a restart: {restarted.uploads} uploads")
+
+
+@benchmark("keyboards")
+def bench_keyboards(calls=2000):
+    """Menus: rebuilt on every call (before) vs memoized per settings version."""
+    print_header("Keyboards: prebuilt menus")
+    try:
+        import data.keyboards as kb
+    except ImportError as e:
+        print(f"❌ {e} (pip install -r requirements.txt)")
+        return
+
+    _temp_database()
+    for label, menu, args in (("main_menu", kb.main_menu, ()),
+                              ("category_menu(games)", kb.category_menu, ("games",)),
+                              ("admin_margins_menu", kb.admin_margins_menu, ())):
+        build = menu.__wrapped__
+        before = print_result(f"{label}: build (before)", _timeit(lambda: build(*args), calls), calls)
+        after = print_result(f"{label}: cached (after)", _timeit(lambda: menu(*args), calls), calls)
+        print(f"  speed-up: x{before / after:.1f}\n")
+
+
+@benchmark("browse")
+def bench_browse_index(rounds=200):
+    """Category screen (navigation.subcats): keyword search per click vs precomputed browse index."""
+    print_header("Browse index: category screens")
+    import data.mappings as mappings
+    from services.catalog import ProductCatalog
+
+    catalog = ProductCatalog(load_products_list())
+    keys = list(mappings.ALL_MAPS)
+
+    def search():
+        return [catalog.search_categories(mappings.ALL_MAPS[key]) for key in keys]
+
+    def browse():
+        return [catalog.browse(key) for key in keys]
+
+    calls = rounds * len(keys)
+    before = print_result("keyword search per screen (before)", _timeit(search, rounds), calls)
+    after = print_result("browse index lookup (after)", _timeit(browse, rounds), calls)
+    print(f"\n  speed-up: x{before / after:.1f}")
+
+
+@benchmark("balance")
+def bench_balance_debit(calls=3000, threads=8):
+    """Purchase debit: ensure + SELECT + UPDATE + re-read vs one UPDATE ... RETURNING with ledger row.
+
+    The new path is not meant to be faster: it also writes the ledger row and
+    checks the ref, so it may cost a few µs more per debit. What it buys is
+    shown by the race below (no overdraft, each ref charged once).
+    """
+    print_header("Balance debit: purchase path")
+    import threading
+    import services.database as database
+
+    _temp_database()
+    database.add_balance("3000", calls * 2.0)
+    database.add_balance("3001", calls * 2.0)
+
+    def old_debit():
+        # Behaviour before the ledger: four statements, check done in Python.
+        conn = database.get_db_connection()
+        conn.execute("SELECT * FROM users WHERE user_id = ?", ("3000",)).fetchone()   # ensure_user_exists
+        current = conn.execute("SELECT balance FROM users WHERE user_id = ?", ("3000",)).fetchone()['balance']
+        if round(current, 4) >= 1.0:
+            conn.execute("UPDATE users SET balance = ? WHERE user_id = ?", (current - 1.0, "3000"))
+            conn.commit()
+        conn.close()
+        return database.get_balance("3000")
+
+    counter = iter(range(calls * 2))
+    before = print_result("ensure+SELECT+UPDATE+get_balance", _timeit(old_debit, calls), calls)
+    after = print_result("UPDATE ... RETURNING + ledger", _timeit(
+        lambda: database.debit_balance("3001", 1.0, ref=f"bench:{next(counter)}"), calls), calls)
+    print(f"\n  speed-up: x{before / after:.1f} (the ledger write and ref check are extra work; "
+          f"the gain is correctness, below)")
+
+    # Concurrency: 8 threads race on a 100.0 balance, 40 attempts each.
+    def race(attempt):
+        outcomes = []
+        workers = [threading.Thread(target=lambda n=n: outcomes.extend(attempt(n, i) for i in range(40)))
+                   for n in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        return outcomes
+
+    def old_attempt(n, i):
+        conn = database.get_db_connection()
+        current = conn.execute("SELECT balance FROM users WHERE user_id = ?", ("3002",)).fetchone()['balance']
+        if round(current, 4) < 1.0:
+            conn.close()
+            return "insufficient"
+        time.sleep(0)
+        conn.execute("UPDATE users SET balance = ? WHERE user_id = ?", (current - 1.0, "3002"))
+        conn.commit()
+        conn.close()
+        return "ok"
+
+    database.add_balance("3002", 100.0)
+    outcomes = race(old_attempt)
+    print(f"  read-check-write (before): {outcomes.count('ok')} purchases delivered, "
+          f"balance {database.get_balance('3002'):.2f} (started at 100.00)")
+
+    # Every ref is replayed 4 times (a double-tapped purchase): charged once.
+    database.add_balance("3003", 100.0)
+    outcomes = race(lambda n, i: database.debit_balance("3003", 1.0, ref=f"race:{(n * 40 + i) % 80}")[0])
+    print(f"  conditional UPDATE + refs (after): charged {outcomes.count('ok')}, "
+          f"duplicate {outcomes.count('duplicate')}, insufficient {outcomes.count('insufficient')}, "
+          f"balance {database.get_balance('3003'):.2f}")
+
+
+@benchmark("wallet")
+def bench_wallet_read(calls=2000):
+    """handlers/shop/deposit.chk_bal: ensure_user_exists before every read vs one wallet query."""
+    print_header("Wallet screen: chk_bal DB work")
+    import asyncio
+    import types
+    import services.async_db as async_db
+    import services.database as database
+    import services.settings as settings
+    from bot.utils.helpers import smart_edit
+    from handlers.shop import deposit
+
+    _temp_database()
+    database.register_user(4000, "bench", "bench")
+    database.add_balance(4000, 12.5, is_deposit=True)
+
+    def legacy_ensure(uid):
+        # Behaviour before: own connection + SELECT * (and INSERT when missing).
+        conn = database.get_db_connection()
+        if not conn.execute("SELECT * FROM users WHERE user_id = ?", (str(uid),)).fetchone():
+            conn.execute("INSERT INTO users (user_id, balance, banned, total_deposited) VALUES (?, 0.0, 0, 0.0)",
+                         (str(uid),))
+            conn.commit()
+        conn.close()
+
+    def legacy_read(column, uid):
+        legacy_ensure(uid)
+        conn = database.get_db_connection()
+        row = conn.execute(f"SELECT {column} FROM users WHERE user_id = ?", (str(uid),)).fetchone()
+        conn.close()
+        return row[column] if row else 0.0
+
+    async def legacy_chk_bal(call):
+        u = call.from_user.id
+        b = await async_db.run_read(legacy_read, "balance", u)
+        total_deposited = await async_db.run_read(legacy_read, "total_deposited", u)
+        rate = settings.get_setting("exchange_rate")
+        await smart_edit(call, f"{b:.2f} {int(round(b * rate))} {total_deposited:.2f}", None)
+
+    class FakeMessage:
+        photo = None
+        async def edit_text(self, **kwargs):
+            self.text = kwargs['text']
+
+    call = types.SimpleNamespace(from_user=types.SimpleNamespace(id=4000), message=FakeMessage())
+
+    def run(handler):
+        async def loop():
+            start = time.perf_counter()
+            for _ in range(calls):
+                await handler(call)
+            return time.perf_counter() - start
+        return asyncio.run(loop())
+
+    statements = []
+    conn = database.get_db_connection()
+    conn.set_trace_callback(statements.append)
+    database.get_wallet(4000)
+    conn.set_trace_callback(None)
+    conn.close()
+
+    before = print_result("2 reads, ensure before each (before)", run(legacy_chk_bal), calls)
+    after = print_result("get_wallet, 1 query (after)", run(deposit.chk_bal), calls)
+    print(f"\n  statements per screen: 4 -> {len(statements)}")
+    print(f"  speed-up: x{before / after:.1f}")
+
+
+@benchmark("admin_orders")
+def bench_admin_order_page(local_orders=20000, api_orders=20000, calls=50):
+    """Order lists: load + merge + sort both stores in Python vs one order_index page."""
+    print_header("Admin orders: one page of a large history")
+    import json
+    import random
+    import services.database as database
+    from constants.orders import norm_order_status
+
+    _temp_database()
+    conn = database.get_db_connection()
+    statuses = ["completed"] * 8 + ["rejected", "pending"]
+    conn.executemany(
+        "INSERT INTO orders (id, user_id, product_json, qty, inputs_json, params_json, status, date) "
+        "VALUES (?, ?, ?, 1, '[]', '[]', ?, ?)",
+        [(str(100000 + i), str(i % 500), json.dumps({"name": f"Product {i % 40}", "price": 1.5}),
+          random.choice(statuses), f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} {1 + i % 12:02d}:{i % 60:02d} "
+          f"{'AM' if i % 2 else 'PM'}") for i in range(local_orders)]
+    )
+    conn.executemany(
+        "INSERT INTO api_orders (uuid, user_id, order_id, product_name, price, status, created_at) "
+        "VALUES (?, ?, ?, 'API Service', 2.0, ?, ?)",
+        [(f"u{i}", i % 500, str(900000 + i), random.choice(["accept", "Canceled", "pending", "Success"]),
+          f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00") for i in range(api_orders)]
+    )
+    conn.commit()
+    conn.close()
+
+    def old_page():
+        # Behaviour before: every order JSON-decoded, filtered and sorted in Python.
+        items = []
+        for o in database.get_all_api_orders(limit=api_orders):
+            if norm_order_status(o.get('status')) == "completed":
+                items.append({'id': o['uuid'], 'date': o.get('created_at', ''), 'price': o.get('price', 0)})
+        for o in database.get_all_orders():
+            if norm_order_status(o.get('status')) == "completed":
+                o['price'] = float(o['product'].get('price', 0)) * int(o.get('qty', 1))
+                items.append(o)
+        items.sort(key=lambda x: x.get('date', ''), reverse=True)
+        return len(items), items[20:30]
+
+    def new_page():
+        return database.count_orders_by_group("completed"), database.get_orders_page("completed", 10, 20)
+
+    def old_user_page():
+        # Shop "my orders" before: both stores for the user, merged and sorted in Python.
+        items = database.get_user_local_orders("7") + database.get_user_api_history("7", limit=50)
+        items.sort(key=lambda x: x.get('date', x.get('created_at', '')), reverse=True)
+        return len(items), items[:8]
+
+    def new_user_page():
+        return database.count_user_orders("7"), database.get_user_orders_page("7", 8, 0)
+
+    def old_by_id():
+        return next((o for o in database.get_all_orders() if str(o.get('id')) == "110000"), None)
+
+    total_new, _ = new_page()
+    print(f"  {local_orders} local + {api_orders} API orders, 'completed' page 3 of {total_new // 10 + 1}\n")
+    before = print_result("all orders in Python (before)", _timeit(old_page, calls), calls)
+    after = print_result("order_index page + count (after)", _timeit(new_page, calls), calls)
+    print(f"  speed-up: x{before / after:.1f}\n")
+    before = print_result("user history: merge in Python (before)", _timeit(old_user_page, calls), calls)
+    after = print_result("user history: order_index page (after)", _timeit(new_user_page, calls), calls)
+    print(f"  speed-up: x{before / after:.1f}\n")
+    before = print_result("by id: scan get_all_orders (before)", _timeit(old_by_id, calls), calls)
+    after = print_result("by id: get_pending_order_by_id (after)",
+                         _timeit(lambda: database.get_pending_order_by_id("110000"), calls), calls)
+    print(f"  speed-up: x{before / after:.1f}")
+
+
+@benchmark("date_range")
+def bench_date_range(orders=30000, calls=20):
+    """get_orders_by_date_range (reports): parse every completed order in Python vs created_ts index range."""
+    print_header("Date range: completed orders for one day / one month")
+    import random
+    from datetime import datetime, timedelta
+    import services.database as database
+
+    _temp_database()
+    base = datetime(2024, 1, 1)
+    conn = database.get_db_connection()
+    conn.executemany(
+        "INSERT INTO orders (id, user_id, product_json, qty, inputs_json, params_json, status, date) "
+        "VALUES (?, '1', '{\"name\": \"P\", \"price\": 1}', 1, '[]', '[]', ?, ?)",
+        [(str(i), random.choice(["completed"] * 4 + ["rejected"]),
+          (base + timedelta(minutes=17 * i)).strftime("%Y-%m-%d %I:%M %p")) for i in range(orders)]
+    )
+    conn.commit()
+    conn.close()
+
+    def old_range(start, end):
+        # Behaviour before: every completed order loaded, decoded and date-parsed.
+        filtered = []
+        for order in database.get_completed_orders():
+            order_date = datetime.strptime(order["date"].split()[0], "%Y-%m-%d")
+            if start.date() <= order_date.date() <= end.date():
+                filtered.append(order)
+        return filtered
+
+    for label, start, end in (("one day", datetime(2024, 3, 10), datetime(2024, 3, 10, 23, 59)),
+                              ("one month", datetime(2024, 4, 1), datetime(2024, 4, 30, 23, 59))):
+        got = database.get_orders_by_date_range(start, end)
+        before = print_result(f"{label}: parse all (before)", _timeit(lambda: old_range(start, end), calls), calls)
+        after = print_result(f"{label}: created_ts range (after)",
+                             _timeit(lambda: database.get_orders_by_date_range(start, end), calls), calls)
+        print(f"  {len(got)} orders, speed-up: x{before / after:.1f}\n")
+
+
+@benchmark("report_totals")
+def bench_report_totals(days=120, orders_per_day=250, calls=10):
+    """Report totals: load + decode + loop in Python vs SQL GROUP BY with daily rollups."""
+    print_header("Report totals: one month, local + API orders")
+    import json
+    import random
+    from datetime import datetime, timedelta
+    import services.database as database
+
+    _temp_database()
+    base = datetime(2024, 1, 1)
+    categories = ["PUBG", "Free Fire", "iTunes", "Netflix"]
+    local_rows, api_rows = [], []
+    for i in range(days * orders_per_day):
+        when = base + timedelta(seconds=i * 86400 // orders_per_day)
+        category = random.choice(categories)
+        product = {"name": f"{category} pack", "price": random.choice([1, 2.5, 10]), "category_name": category}
+        status = random.choice(["completed"] * 4 + ["rejected"])
+        if i % 2:
+            local_rows.append((str(i), json.dumps(product), random.randint(1, 3), status,
+                               when.strftime("%Y-%m-%d %I:%M %p"), int(when.timestamp())))
+        else:
+            api_rows.append((f"bench-{i}", product["name"], product["price"], status, int(when.timestamp())))
+    conn = database.get_db_connection()
+    conn.executemany(
+        "INSERT INTO orders (id, user_id, product_json, qty, inputs_json, params_json, status, date, created_ts) "
+        "VALUES (?, '1', ?, ?, '[]', '[]', ?, ?, ?)", local_rows
+    )
+    conn.executemany(
+        "INSERT INTO api_orders (uuid, user_id, product_name, price, status, created_ts) VALUES (?, '1', ?, ?, ?, ?)",
+        api_rows
+    )
+    conn.executemany("INSERT INTO products (id, name, price, category_name) VALUES (?, ?, 1, ?)",
+                     [(str(n), f"{c} pack", c) for n, c in enumerate(categories)])
+    conn.commit()
+    conn.close()
+
+    def old_totals(start, end):
+        # Behaviour before: local orders only, decoded and summed in Python.
+        total_usd, breakdown = 0.0, {}
+        orders = database.get_orders_by_date_range(start, end)
+        for order in orders:
+            total_usd += float(order.get('product', {}).get('price', 0)) * int(order.get('qty', 1))
+            category = order.get('product', {}).get('category_name', 'Unknown')
+            breakdown[category] = breakdown.get(category, 0) + 1
+        return len(orders), total_usd, breakdown
+
+    def sql_totals(start, end):
+        # GROUP BY straight over the orders, no rollup rows.
+        conn = database.get_db_connection()
+        span = {"start": int(start.timestamp()), "end": int(end.timestamp()) + 1}
+        rows = conn.execute(database._SALES_BY_DAY_SQL, span).fetchall()
+        conn.close()
+        return rows
+
+    start, end = datetime(2024, 3, 1), datetime(2024, 3, 31, 23, 59, 59)
+    cold = _timeit(lambda: database.get_sales_summary(start, end), 1)
+    summary = database.get_sales_summary(start, end)
+
+    before = print_result("month: load + decode local orders (before)", _timeit(lambda: old_totals(start, end), calls), calls)
+    sql = print_result("month: GROUP BY over both stores", _timeit(lambda: sql_totals(start, end), calls), calls)
+    print_result("month: first report (fills 31 rollup days)", cold, 1)
+    after = print_result("month: sum of daily rollups (after)",
+                         _timeit(lambda: database.get_sales_summary(start, end), calls), calls)
+    print(f"  {summary['total_orders']} orders ({summary['source_breakdown']}), "
+          f"speed-up: x{before / sql:.1f} GROUP BY, x{before / after:.1f} rollups\n")
+
+    # Completing an order only recomputes its own day.
+    conn = database.get_db_connection()
+    conn.execute("UPDATE api_orders SET status = 'completed' WHERE uuid = (SELECT uuid FROM api_orders "
+                 "WHERE status = 'rejected' AND created_ts >= ? LIMIT 1)", (int(datetime(2024, 3, 15).timestamp()),))
+    conn.commit()
+    conn.close()
+    print_result("month: after one order update (1 day recomputed)",
+                 _timeit(lambda: database.get_sales_summary(start, end), 1), 1)
+
+
+def main(argv):
+    names = argv or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"❌ Unknown benchmark: {name} (available: {', '.join(BENCHMARKS)})")
+            return 1
+    for name in names:
+        BENCHMARKS[name]()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,27 @@
+"""User provisioning middleware (first contact)."""
+from aiogram import BaseMiddleware, types
+from typing import Callable, Dict, Any, Awaitable
+import services.database as database
+import services.async_db as async_db
+
+
+class UserProvisioningMiddleware(BaseMiddleware):
+    """Create the user row on the first update from a new user.
+
+    Known users are a set lookup, so handlers can read balances and profiles
+    without provisioning the row first.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: types.TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get('event_from_user')
+        if user and not database.is_known_user(user.id):
+            try:
+                await async_db.ensure_user_exists(user.id)
+            except Exception as e:
+                print(f"⚠️ User provisioning error: {e}")
+        return await handler(event, data)
@@ -3,6 +3,12 @@ from aiogram import BaseMiddleware, types
 from typing import Callable, Dict, Any, Awaitable
 import config
 import services.database as database
+from services.subscription_cache import get_cache as get_subscription_cache
+
+
+async def _fetch_subscription(bot, user_id):
+    member = await bot.get_chat_member(chat_id=config.CHANNEL_ID, user_id=user_id)
+    return member.status not in ['left', 'kicked', 'restricted']
 
 
 class StrictSubscriptionMiddleware(BaseMiddleware):
@@ -21,12 +27,15 @@ class StrictSubscriptionMiddleware(BaseMiddleware):
         if user and database.is_user_admin(user.id):
             return await handler(event, data)
 
-        # 2. Check subscription via Telegram API
+        # 2. Check subscription (cached; the "check_sub" button always asks Telegram again)
         try:
-            member = await bot.get_chat_member(chat_id=config.CHANNEL_ID, user_id=user.id)
-            
+            cache = get_subscription_cache()
+            if isinstance(event, types.CallbackQuery) and event.data == "check_sub":
+                cache.invalidate(user.id)
+            subscribed = await cache.is_subscribed(user.id, lambda uid: _fetch_subscription(bot, uid))
+
             # User is not subscribed
-            if member.status in ['left', 'kicked', 'restricted']:
+            if not subscribed:
                 markup = types.InlineKeyboardMarkup(inline_keyboard=[
                     [types.InlineKeyboardButton(text="📢 اشترك في القناة للاستخدام", url=config.FORCE_SUB_CHANNEL_URL)],
                     [types.InlineKeyboardButton(text="✅ تم الاشتراك", callback_data="check_sub")]
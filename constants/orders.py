@@ -2,6 +2,7 @@ ORDER_SOURCE_LOCAL = "LOCAL"
 ORDER_SOURCE_API = "API"
 
 
+# Mirrored in SQL by services.migrations.ORDER_STATUS_GROUP (indexed); keep both in sync.
 def norm_order_status(s: str) -> str:
     s = (s or '').lower()
     if s in ('pending', 'processing', 'in progress'):
@@ -1,184 +1,82 @@
+import functools
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from pydantic import ConfigDict
 import config
+import data.mappings as mappings
+import services.settings as settings
 
 
-# ==================== قوائم المستخدم ====================
-
-def main_menu():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🎮 شحن ألعاب", callback_data="nav_games")],
-        [InlineKeyboardButton(text="📱 تطبيقات وخدمات", callback_data="nav_apps")],
-        [InlineKeyboardButton(text="💎 White للوساطة", callback_data="nav_white")],
-        [
-            InlineKeyboardButton(text="📦 طلباتي", callback_data="my_orders"),
-            InlineKeyboardButton(text="💰 المحفظة", callback_data="deposit_menu")
-        ],
-        [InlineKeyboardButton(text="👤 حسابي", callback_data="my_account")]  # ✅ زر حسابي الجديد
-    ])
-
-
-def white_section_menu():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="شراء USDT ₮", callback_data="w_deal:usdt")],
-        [InlineKeyboardButton(text="شراء شام كاش دولار ($)", callback_data="w_deal:sham_usd")],
-        [InlineKeyboardButton(text="شراء شام كاش سوري (SYP)", callback_data="w_deal:sham_syr")],
-        [InlineKeyboardButton(text="🔙 رجوع للرئيسية", callback_data="home")]
-    ])
-
-
-# ==================== قوائم الإيداع ====================
-
-def deposit_menu():
-    """القائمة الرئيسية طرق الإيداع"""
-    kb = InlineKeyboardBuilder()
-    kb.button(text="💰 رصيدي", callback_data="check_my_balance")
-    kb.button(text="🔴 سيريتيل كاش (Syriatel)", callback_data="dep_syriatel")
-    kb.button(text="🟣 شام كاش (Sham Cash)", callback_data="dep_sham_menu")
-    kb.button(text="🟢 USDT (Crypto)", callback_data="dep_usdt_menu")
-    kb.button(text="🔙 رجوع", callback_data="home")
-    kb.adjust(1)
-    return kb.as_markup()
-
-
-def sham_deposit_types():
-    kb = InlineKeyboardBuilder()
-    kb.button(text="🇸🇾 شام كاش (ليرة سوري)", callback_data="dep_sham_syp")
-    kb.button(text="🇺🇸 شام كاش (دولار)", callback_data="dep_sham_usd")
-    kb.button(text="🔙 رجوع", callback_data="deposit_menu")
-    kb.adjust(1)
-    return kb.as_markup()
+# ==================== ذاكرة الأزرار (keyboard cache) ====================
+# Menus that are the same for every user are built once and then reused,
+# cached by (menu id, arguments, settings version). Any settings change
+# (category names, margins...) starts a new version; call
+# invalidate_keyboards() after changing data/mappings.py at runtime.
+# Cached markups are frozen: build a new one instead of modifying them.
 
+class _FrozenButton(InlineKeyboardButton):
+    model_config = ConfigDict(frozen=True)
 
-def usdt_deposit_types():
-    kb = InlineKeyboardBuilder()
-    kb.button(text="🔸 USDT (BEP20)", callback_data="dep_usdt_bep20")
-    kb.button(text="📧 USDT (CoinEx Email)", callback_data="dep_usdt_coinex")
-    kb.button(text="🔙 رجوع", callback_data="deposit_menu")
-    kb.adjust(1)
-    return kb.as_markup()
 
+class _FrozenMarkup(InlineKeyboardMarkup):
+    model_config = ConfigDict(frozen=True)
 
-def contact_admin():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="تواصل واتساب 💬", url=config.ADMIN_WHATSAPP)],
-        [InlineKeyboardButton(text="🔙 رجوع", callback_data="home")]
-    ])
 
+class _FrozenRows(list):
+    """Read-only list for inline_keyboard and its rows.
 
-# ✅ أضف هذه الدالة في قسم لوحة الأدمن (في الأسفل)
-def admin_balance_currency(user_id):
-    """قائمة اختيار عملة الإضافة للأدمن"""
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🇸🇾 إضافة سوري (SYP)", callback_data=f"add_bal_curr:syp:{user_id}")],
-        [InlineKeyboardButton(text="🇺🇸 إضافة دولار ($)", callback_data=f"add_bal_curr:usd:{user_id}")],
-        [InlineKeyboardButton(text="🔙 إلغاء", callback_data=f"mang_usr:{user_id}")]
-    ])
-# ==================== أزرار التنقل والرجوع ====================
+    Not a tuple: aiogram serializes reply_markup as InlineKeyboardMarkup,
+    whose schema only accepts lists.
+    """
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("cached keyboards are read-only; build a new markup instead")
 
-def back_btn(target="home"):
-    return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="🔙 رجوع", callback_data=target)]])
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
 
 
-def cancel_or_back_btn(back_target="home"):
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🔙 رجوع للخلف", callback_data=back_target)],
-        [InlineKeyboardButton(text="❌ إلغاء والقائمة الرئيسية", callback_data="cancel_op")]
-    ])
+_keyboard_cache = {}
+_cache_version = None
 
 
-def cancel_btn():
-    return InlineKeyboardMarkup(
-        inline_keyboard=[[InlineKeyboardButton(text="❌ إلغاء العملية", callback_data="cancel_op")]])
+def _freeze(markup):
+    # The buttons are validated already; model_construct keeps _FrozenRows as is.
+    return _FrozenMarkup.model_construct(inline_keyboard=_FrozenRows(
+        _FrozenRows(_FrozenButton.model_validate(button, from_attributes=True) for button in row)
+        for row in markup.inline_keyboard
+    ))
 
 
-# ==================== القوائم الديناميكية ====================
+def memoized_keyboard(menu_id):
+    """Cache the decorated builder's markup per arguments."""
+    def decorator(build):
+        @functools.wraps(build)
+        def wrapper(*args, **kwargs):
+            global _cache_version
+            version = settings.get_settings_version()
+            if version != _cache_version:
+                _keyboard_cache.clear()
+                _cache_version = version
+            key = (menu_id, args, tuple(sorted(kwargs.items())), version)
+            markup = _keyboard_cache.get(key)
+            if markup is None:
+                markup = _keyboard_cache[key] = _freeze(build(*args, **kwargs))
+            return markup
+        return wrapper
+    return decorator
 
-def build_main_cats(mapping_dict, prefix):
-    builder = InlineKeyboardBuilder()
-    for name in mapping_dict.keys():
-        builder.button(text=name, callback_data=f"{prefix}:{name}")
-    builder.adjust(2)
-    builder.row(InlineKeyboardButton(text="🔙 رجوع للرئيسية", callback_data="home"))
-    return builder.as_markup()
 
-
-def build_sub_cats(cats_list, parent_key):
-    builder = InlineKeyboardBuilder()
-    for short_id, full_name in cats_list:
-        builder.button(text=full_name, callback_data=f"open:{short_id}:{parent_key}")
-    builder.adjust(1)
-    return builder
-
-
-def add_back_button(builder, target):
-    builder.row(InlineKeyboardButton(text="🔙 رجوع", callback_data=target))
-    return builder.as_markup()
-
-
-def build_products(products, back_callback):
-    builder = InlineKeyboardBuilder()
-    for p in products:
-        price_text = p.get('formatted_price', f"{p['price']}$")
-        text = f"{p['name']} | {price_text}"
-        builder.button(text=text, callback_data=f"buy:{p['id']}")
-    builder.adjust(1)
-    builder.row(InlineKeyboardButton(text="🔙 رجوع", callback_data=back_callback))
-    return builder.as_markup()
-
-
-# ==================== 👑 لوحة الأدمن ====================
-
-def admin_dashboard():
-    kb = InlineKeyboardBuilder()
-    kb.button(text="👥 إدارة المستخدمين", callback_data="admin_users")
-    kb.button(text="📦 إدارة الطلبات", callback_data="admin_orders")
-    kb.button(text="💰 طلبات الإيداع المعلقة", callback_data="admin_deposits")
-    kb.button(text="💵 تعديل سعر الصرف", callback_data="admin_edit_rate")
-    kb.button(text="🏷️ إدارة نسبة الربح", callback_data="admin_edit_margin")
-    kb.button(text="💳 عمولة الإيداع", callback_data="admin_edit_commission")
-    kb.button(text="📝 إعادة تسمية الفئات", callback_data="admin_rename_categories")
-    kb.button(text="📢 إرسال رسالة للكل", callback_data="admin_broadcast")
-    kb.button(text="📊 التقارير", callback_data="admin_reports")
-    kb.button(text="🛠 وضع الصيانة", callback_data="admin_maintenance")
-    kb.button(text="🔙 خروج", callback_data="close_admin")
-    kb.adjust(2, 1, 2, 1, 2)
-    return kb.as_markup()
-
-
-def user_manage_menu(user_id, is_banned):
-    ban_text = "🟢 فك الحظر" if is_banned else "🔴 حظر المستخدم"
-    ban_call = f"admin_unban:{user_id}" if is_banned else f"admin_ban:{user_id}"
-
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="➕ إضافة رصيد", callback_data=f"admin_add_bal:{user_id}")],
-        [InlineKeyboardButton(text="➖ خصم رصيد", callback_data=f"admin_sub_bal:{user_id}")],
-        [InlineKeyboardButton(text="📜 كشف السجل", callback_data=f"admin_history:{user_id}")],
-        [InlineKeyboardButton(text=ban_text, callback_data=ban_call)],
-        [InlineKeyboardButton(text="🔙 رجوع", callback_data="admin_users_menu")]
-    ])
-
-
-def back_to_admin():
-    return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="🔙 للأدمن", callback_data="admin_home")]])
-
-
-def admin_balance_currency(user_id):
-    """✅ قائمة اختيار عملة الإضافة للأدمن"""
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🇸🇾 إضافة سوري (SYP)", callback_data=f"add_bal_curr:syp:{user_id}")],
-        [InlineKeyboardButton(text="🇺🇸 إضافة دولار ($)", callback_data=f"add_bal_curr:usd:{user_id}")],
-        [InlineKeyboardButton(text="🔙 إلغاء", callback_data=f"mang_usr:{user_id}")]
-    ])
-
-
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.utils.keyboard import InlineKeyboardBuilder
-import config
+def invalidate_keyboards():
+    """Drop every cached keyboard."""
+    global _cache_version
+    _keyboard_cache.clear()
+    _cache_version = None
 
 
 # ==================== قوائم المستخدم ====================
 
+@memoized_keyboard("main_menu")
 def main_menu():
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="🎮 شحن ألعاب", callback_data="nav_games")],
@@ -192,6 +90,7 @@ def main_menu():
     ])
 
 
+@memoized_keyboard("white_section_menu")
 def white_section_menu():
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="شراء USDT ₮", callback_data="w_deal:usdt")],
@@ -203,6 +102,7 @@ def white_section_menu():
 
 # ==================== قوائم الإيداع ====================
 
+@memoized_keyboard("deposit_menu")
 def deposit_menu():
     kb = InlineKeyboardBuilder()
     kb.button(text="💰 رصيدي", callback_data="check_my_balance")
@@ -214,6 +114,7 @@ def deposit_menu():
     return kb.as_markup()
 
 
+@memoized_keyboard("sham_deposit_types")
 def sham_deposit_types():
     kb = InlineKeyboardBuilder()
     kb.button(text="🇸🇾 شام كاش (ليرة سوري)", callback_data="dep_sham_syp")
@@ -223,6 +124,7 @@ def sham_deposit_types():
     return kb.as_markup()
 
 
+@memoized_keyboard("usdt_deposit_types")
 def usdt_deposit_types():
     kb = InlineKeyboardBuilder()
     kb.button(text="🔸 USDT (BEP20)", callback_data="dep_usdt_bep20")
@@ -232,6 +134,7 @@ def usdt_deposit_types():
     return kb.as_markup()
 
 
+@memoized_keyboard("contact_admin")
 def contact_admin():
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="تواصل واتساب 💬", url=config.ADMIN_WHATSAPP)],
@@ -241,10 +144,12 @@ def contact_admin():
 
 # ==================== أزرار التنقل والرجوع ====================
 
+@memoized_keyboard("back_btn")
 def back_btn(target="home"):
     return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="🔙 رجوع", callback_data=target)]])
 
 
+@memoized_keyboard("cancel_or_back_btn")
 def cancel_or_back_btn(back_target="home"):
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="🔙 رجوع للخلف", callback_data=back_target)],
@@ -252,6 +157,7 @@ def cancel_or_back_btn(back_target="home"):
     ])
 
 
+@memoized_keyboard("cancel_btn")
 def cancel_btn():
     return InlineKeyboardMarkup(
         inline_keyboard=[[InlineKeyboardButton(text="❌ إلغاء العملية", callback_data="cancel_op")]])
@@ -259,6 +165,24 @@ def cancel_btn():
 
 # ==================== القوائم الديناميكية ====================
 
+@memoized_keyboard("category_menu")
+def category_menu(section):
+    """Category buttons of the games / apps section (display names from settings)."""
+    mapping = mappings.GAMES_MAP if section == "games" else mappings.APPS_MAP
+    prefix = "srch_g" if section == "games" else "srch_a"
+
+    display_mapping = {}
+    for cat_key in mapping.keys():
+        display_mapping[settings.get_category_name(cat_key)] = cat_key
+
+    builder = InlineKeyboardBuilder()
+    for display_name, original_key in display_mapping.items():
+        builder.button(text=display_name, callback_data=f"{prefix}:{original_key}")
+    builder.adjust(2)
+    builder.row(InlineKeyboardButton(text="🔙 رجوع للرئيسية", callback_data="home"))
+    return builder.as_markup()
+
+
 def build_main_cats(mapping_dict, prefix):
     builder = InlineKeyboardBuilder()
     for name in mapping_dict.keys():
@@ -270,7 +194,7 @@ def build_main_cats(mapping_dict, prefix):
 
 def build_sub_cats(cats_list, parent_key):
     builder = InlineKeyboardBuilder()
-    for short_id, full_name in cats_list:
+    for short_id, full_name, *_ in cats_list:
         builder.button(text=full_name, callback_data=f"open:{short_id}:{parent_key}")
     builder.adjust(1)
     return builder
@@ -294,6 +218,7 @@ def build_products(products, back_callback):
 
 # ==================== 👑 لوحة الأدمن ====================
 
+@memoized_keyboard("admin_dashboard")
 def admin_dashboard():
     kb = InlineKeyboardBuilder()
     kb.button(text="👥 إدارة المستخدمين", callback_data="admin_users")
@@ -311,6 +236,50 @@ def admin_dashboard():
     return kb.as_markup()
 
 
+@memoized_keyboard("admin_margins_menu")
+def admin_margins_menu():
+    """Margin per category, grouped by section."""
+    keyboard = InlineKeyboardBuilder()
+
+    def to_perc(val):
+        return round((val - 1) * 100)
+
+    current_default = settings.get_margin_for_category("default")
+    keyboard.button(
+        text=f"🌐 الربح العام ({to_perc(current_default)}%)",
+        callback_data="set_margin:default"
+    )
+
+    def add_section(title, mapping_dict):
+        keyboard.button(text=f"━━ {title} ━━", callback_data="ignore")
+        for cat in mapping_dict.keys():
+            m = settings.get_margin_for_category(cat)
+            keyboard.button(text=f"{cat} ({to_perc(m)}%)", callback_data=f"set_margin:{cat}")
+
+    add_section("🎮 الألعاب", mappings.GAMES_MAP)
+    add_section("📱 التطبيقات والخدمات", mappings.APPS_MAP)
+
+    keyboard.button(text="🔙 رجوع", callback_data="admin_home")
+    keyboard.adjust(1)
+    return keyboard.as_markup()
+
+
+@memoized_keyboard("admin_rename_categories_menu")
+def admin_rename_categories_menu():
+    """All mapping categories under their current display names."""
+    keyboard = InlineKeyboardBuilder()
+    all_categories = {}
+    all_categories.update(mappings.GAMES_MAP)
+    all_categories.update(mappings.APPS_MAP)
+
+    for cat_key in sorted(all_categories.keys()):
+        keyboard.button(text=settings.get_category_name(cat_key), callback_data=f"rename_cat:{cat_key}")
+
+    keyboard.button(text="🔙 رجوع", callback_data="admin_home")
+    keyboard.adjust(1)
+    return keyboard.as_markup()
+
+
 def user_manage_menu(user_id, is_banned):
     ban_text = "🟢 فك الحظر" if is_banned else "🔴 حظر المستخدم"
     ban_call = f"admin_unban:{user_id}" if is_banned else f"admin_ban:{user_id}"
@@ -324,6 +293,7 @@ def user_manage_menu(user_id, is_banned):
     ])
 
 
+@memoized_keyboard("back_to_admin")
 def back_to_admin():
     return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="🔙 للأدمن", callback_data="admin_home")]])
 
@@ -3,10 +3,11 @@ from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-import asyncio
 import config
 import services.settings as settings
 import services.database as database
+import services.async_db as async_db
+import services.broadcast as broadcast
 import data.keyboards as kb
 from bot.utils.helpers import smart_edit
 from states.admin import AdminState
@@ -108,36 +109,15 @@ async def execute_broadcast(msg: types.Message, state: FSMContext):
         await state.clear()
         return
 
-    users = database.get_all_user_ids()
-    if not users:
-        await msg.answer("لا يوجد مستخدمين لإرسال الرسالة لهم!")
-        await state.clear()
-        return
-
-    status_msg = await msg.answer(f"⏳ جاري الإرسال إلى {len(users)} مستخدم...\nيرجى الانتظار وعدم إيقاف البوت.")
-    
-    sent_count = 0
-    blocked_count = 0
-    
-    for user_id in users:
-        try:
-            await msg.copy_to(chat_id=user_id)
-            sent_count += 1
-            await asyncio.sleep(0.15)
-        except Exception as e:
-            blocked_count += 1
-    
-    report = (
-        f"✅ <b>تم انتهاء الحملة!</b>\n"
-        f"━━━━━━━━━━━━\n"
-        f"📨 تم الإرسال بنجاح: <b>{sent_count}</b>\n"
-        f"⛔ لم تصل (حظروا البوت): <b>{blocked_count}</b>\n"
-        f"👥 العدد الكلي: <b>{len(users)}</b>"
-    )
-    
-    await status_msg.edit_text(report, parse_mode="HTML", reply_markup=kb.back_to_admin())
+    status_msg = await msg.answer("⏳ جاري تجهيز الحملة...")
     await state.clear()
 
+    # الإرسال يتم في الخلفية (مع حفظ التقدم في القاعدة واستكماله بعد إعادة التشغيل)
+    # رسالة الحالة تُحدَّث تلقائياً بالتقدم حتى نهاية الحملة
+    job_id, total = await broadcast.start_broadcast(msg.bot, msg, status_msg)
+    if not total:
+        await status_msg.edit_text("لا يوجد مستخدمين لإرسال الرسالة لهم!", reply_markup=kb.back_to_admin())
+
 
 @router.callback_query(F.data == "admin_pending_all")
 async def show_all_pending(call: types.CallbackQuery):
@@ -148,12 +128,10 @@ async def show_all_pending(call: types.CallbackQuery):
     # 🔄 التغيير هنا: استخدام دوال قاعدة البيانات بدلاً من load_json
 
     # Get pending deposits
-    all_deposits = database.get_all_deposit_requests()
-    pending_deposits = [r for r in all_deposits if r.get('status') == 'pending']
+    pending_deposits = await async_db.get_deposit_requests_by_status('pending')
 
     # Get pending orders
-    all_orders = database.get_all_orders()
-    pending_orders = [o for o in all_orders if o.get('status') == 'pending']
+    pending_orders = await async_db.get_pending_orders()
 
     total_pending = len(pending_deposits) + len(pending_orders)
 
@@ -3,6 +3,7 @@ from aiogram import Router, types, F
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 import services.database as database
+import services.async_db as async_db
 import services.settings as settings
 import data.keyboards as kb
 from bot.utils.helpers import smart_edit, format_price
@@ -17,9 +18,7 @@ async def show_deposit_requests(call: types.CallbackQuery):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
 
     # ✅ استخدام الدالة الجديدة من قاعدة البيانات
-    all_reqs = database.get_all_deposit_requests()
-
-    pending = [r for r in all_reqs if r.get('status') == 'pending']
+    pending = await async_db.get_deposit_requests_by_status('pending')
 
     if not pending:
         return await smart_edit(call, "✅ <b>لا يوجد طلبات إيداع معلقة حالياً.</b>", kb.admin_dashboard())
@@ -50,7 +49,7 @@ async def view_deposit_details(call: types.CallbackQuery):
     if not database.is_user_admin(call.from_user.id):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
     req_id = call.data.split(":")[1]
-    req = database.get_deposit_request(req_id)
+    req = await async_db.get_deposit_request(req_id)
 
     if not req:
         return await call.answer("⚠️ الطلب غير موجود (ربما تمت معالجته)", show_alert=True)
@@ -143,7 +142,7 @@ async def approve_deposit(call: types.CallbackQuery):
     if not database.is_user_admin(call.from_user.id):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
     req_id = call.data.split(":")[1]
-    req = database.get_deposit_request(req_id)
+    req = await async_db.get_deposit_request(req_id)
 
     if not req:
         return await call.answer("الطلب غير موجود", show_alert=True)
@@ -170,8 +169,12 @@ async def approve_deposit(call: types.CallbackQuery):
     final_syp = int(round(final_usd * rate))
 
     # Add balance (mark as deposit for statistics)
-    new_bal = database.add_balance(req['user_id'], final_usd, is_deposit=True)
-    database.remove_deposit_request(req_id)
+    status, new_bal = await async_db.credit_balance(req['user_id'], final_usd, kind="deposit",
+                                                    ref=database.deposit_ref(req), is_deposit=True)
+    await async_db.remove_deposit_request(req_id)
+    if status == "duplicate":
+        # ضغطة مكررة: الطلب أُضيف للرصيد مسبقاً
+        return await call.answer("⚠️ تمت معالجة هذا الطلب مسبقاً.", show_alert=True)
 
     new_bal_syp = int(round(new_bal * rate))
 
@@ -255,12 +258,12 @@ async def reject_deposit(call: types.CallbackQuery):
     if not database.is_user_admin(call.from_user.id):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
     req_id = call.data.split(":")[1]
-    req = database.get_deposit_request(req_id)
+    req = await async_db.get_deposit_request(req_id)
 
     if not req:
         return await call.answer("الطلب غير موجود", show_alert=True)
 
-    database.remove_deposit_request(req_id)
+    await async_db.remove_deposit_request(req_id)
 
     # --- Handle Photo vs Text Message editing ---
     current_content = call.message.caption if call.message.caption else (call.message.text or "")
@@ -301,8 +304,7 @@ async def bulk_approve_deposits(call: types.CallbackQuery):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
 
     # ✅ استخدام الدالة الجديدة
-    all_reqs = database.get_all_deposit_requests()
-    pending = [r for r in all_reqs if r.get('status') == 'pending']
+    pending = await async_db.get_deposit_requests_by_status('pending')
 
     if not pending:
         return await call.answer("لا يوجد طلبات معلقة", show_alert=True)
@@ -329,8 +331,7 @@ async def confirm_bulk_approve_deposits(call: types.CallbackQuery):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
 
     # ✅ استخدام الدالة الجديدة
-    all_reqs = database.get_all_deposit_requests()
-    pending = [r for r in all_reqs if r.get('status') == 'pending']
+    pending = await async_db.get_deposit_requests_by_status('pending')
 
     rate = settings.get_setting("exchange_rate")
     commission = settings.get_deposit_commission()
@@ -356,8 +357,11 @@ async def confirm_bulk_approve_deposits(call: types.CallbackQuery):
             commission_amount = deposit_usd * (commission / 100)
             final_usd = deposit_usd - commission_amount
 
-            database.add_balance(req['user_id'], final_usd, is_deposit=True)
-            database.remove_deposit_request(req['id'])
+            status, _ = await async_db.credit_balance(req['user_id'], final_usd, kind="deposit",
+                                                      ref=database.deposit_ref(req), is_deposit=True)
+            await async_db.remove_deposit_request(req['id'])
+            if status == "duplicate":
+                continue
             approved_count += 1
 
             # Notify user
@@ -390,8 +394,7 @@ async def bulk_reject_deposits(call: types.CallbackQuery):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
 
     # ✅ استخدام الدالة الجديدة
-    all_reqs = database.get_all_deposit_requests()
-    pending = [r for r in all_reqs if r.get('status') == 'pending']
+    pending = await async_db.get_deposit_requests_by_status('pending')
 
     if not pending:
         return await call.answer("لا يوجد طلبات معلقة", show_alert=True)
@@ -418,14 +421,13 @@ async def confirm_bulk_reject_deposits(call: types.CallbackQuery):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
 
     # ✅ استخدام الدالة الجديدة
-    all_reqs = database.get_all_deposit_requests()
-    pending = [r for r in all_reqs if r.get('status') == 'pending']
+    pending = await async_db.get_deposit_requests_by_status('pending')
 
     rejected_count = 0
 
     for req in pending:
         try:
-            database.remove_deposit_request(req['id'])
+            await async_db.remove_deposit_request(req['id'])
             rejected_count += 1
 
             # Notify user
@@ -6,6 +6,7 @@ from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, BufferedIn
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 import config
 import services.database as database
+import services.async_db as async_db
 import services.api_manager as api_manager
 import data.keyboards as kb
 from bot.utils.helpers import smart_edit, format_price
@@ -132,53 +133,16 @@ def _should_show_controls(order: dict, is_api: bool = False) -> bool:
 # ==================== MAIN MENU ====================
 async def render_orders_page(call: types.CallbackQuery, status_filter: str, page: int):
     """دالة مساعدة لعرض الصفحة المطلوبة مباشرة دون تعديل كائن الحدث."""
-    # 1. جلب البيانات
-    local_orders = database.get_all_orders()
-    api_orders = database.get_all_api_orders()
-
-    # 2. الفلترة وتوحيد الشكل
-    def norm_status(s: str) -> str:
-        return _norm_order_status(s)
-
-    all_filtered = []
-
-    # معالجة طلبات API
-    for o in api_orders:
-        if norm_status(o.get('status')) == status_filter:
-            mapped = {
-                'id': o.get('uuid'),
-                'user_id': o.get('user_id'),
-                'status': o.get('status'),
-                'date': o.get('created_at', ''),
-                'order_source': ORDER_SOURCE_API,
-                'price': o.get('price', 0),
-                'product_name': o.get('product_name', 'API Service')
-            }
-            all_filtered.append(mapped)
-
-    # معالجة الطلبات المحلية
-    for o in local_orders:
-        if norm_status(o.get('status')) == status_filter:
-            total = float(o.get('product', {}).get('price', 0)) * int(o.get('qty', 1))
-            o['price'] = total
-            o['product_name'] = o.get('product', {}).get('name', 'Local Product')
-            all_filtered.append(o)
-
-    # 3. الترتيب (الأحدث أولاً)
-    all_filtered.sort(key=lambda x: x.get('date', ''), reverse=True)
-
-    # 4. منطق الصفحات (Pagination Logic)
-    total_items = len(all_filtered)
+    # 1. العدد الكلي ثم الصفحة المطلوبة فقط (الفلترة والترتيب داخل SQL)
+    total_items = await async_db.count_orders_by_group(status_filter)
     total_pages = math.ceil(total_items / PAGE_SIZE) or 1
 
     if page > total_pages: page = total_pages
     if page < 1: page = 1
 
-    start_idx = (page - 1) * PAGE_SIZE
-    end_idx = start_idx + PAGE_SIZE
-    page_items = all_filtered[start_idx:end_idx]
+    page_items = await async_db.get_orders_page(status_filter, PAGE_SIZE, (page - 1) * PAGE_SIZE)
 
-    # 5. بناء الواجهة
+    # 2. بناء الواجهة
     status_label = ADMIN_STATUS_LABELS.get(status_filter, status_filter)
 
     txt = f"📋 <b>قائمة الطلبات: {status_label}</b>\n"
@@ -299,8 +263,7 @@ async def quick_approve_order(call: types.CallbackQuery):
     order_id = call.data.split(":")[1]
 
     # Get order details
-    all_orders = database.get_all_orders()
-    order = next((o for o in all_orders if str(o.get('id')) == str(order_id)), None)
+    order = await async_db.get_pending_order_by_id(order_id)
 
     if not order:
         return await call.answer("❌ الطلب غير موجود", show_alert=True)
@@ -313,7 +276,7 @@ async def quick_approve_order(call: types.CallbackQuery):
         return await call.answer("❌ يمكن فقط قبول الطلبات المعلقة", show_alert=True)
 
     # Approve the order
-    database.update_order_status(order_id, "completed")
+    await async_db.update_order_status(order_id, "completed")
 
     # Notify user
     try:
@@ -353,8 +316,7 @@ async def quick_reject_order(call: types.CallbackQuery):
     order_id = call.data.split(":")[1]
 
     # Get order details
-    all_orders = database.get_all_orders()
-    order = next((o for o in all_orders if str(o.get('id')) == str(order_id)), None)
+    order = await async_db.get_pending_order_by_id(order_id)
 
     if not order:
         return await call.answer("❌ الطلب غير موجود", show_alert=True)
@@ -371,12 +333,17 @@ async def quick_reject_order(call: types.CallbackQuery):
     rate = settings.get_setting("exchange_rate")
 
     # Refund balance
-    new_bal = database.add_balance(order['user_id'], cost)
+    status, new_bal = await async_db.credit_balance(order['user_id'], cost, kind="refund",
+                                                    ref=database.order_refund_ref(order))
+    if status == "duplicate":
+        # ضغطة مكررة: المبلغ مسترجع مسبقاً
+        await async_db.update_order_status(order_id, "rejected")
+        return await call.answer("⚠️ تم استرجاع هذا الطلب مسبقاً.", show_alert=True)
     new_bal_syp = int(new_bal * rate)
     cost_syp = int(cost * rate)
 
     # Update order status
-    database.update_order_status(order_id, "rejected")
+    await async_db.update_order_status(order_id, "rejected")
 
     # Notify user
     try:
@@ -446,18 +413,8 @@ async def perform_order_search(msg: types.Message, state: FSMContext):
         await msg.answer("❌ الرجاء إدخال رقم صحيح.")
         return
 
-    # جلب البيانات
-    local_all = database.get_all_orders()
-    api_all = database.get_all_api_orders()
-
-    # البحث
-    local_matches = [o for o in local_all if str(o.get('id')) == search_term or str(o.get('user_id')) == search_term]
-
-    api_matches = []
-    for o in api_all:
-        if str(o.get('uuid')) == search_term or str(o.get('order_id')) == search_term or str(
-                o.get('user_id')) == search_term:
-            api_matches.append(o)
+    # البحث (مطابقة تامة داخل SQL)
+    local_matches, api_matches = await async_db.search_orders(search_term)
 
     # إذا لم توجد نتائج
     if not local_matches and not api_matches:
@@ -516,13 +473,11 @@ async def view_order_details(call: types.CallbackQuery):
     oid = call.data.split(":")[1]
 
     # البحث عن الطلب محلياً أو في API
-    all_local = database.get_all_orders()
-    order = next((o for o in all_local if str(o.get('id')) == str(oid)), None)
+    order = await async_db.get_pending_order_by_id(oid)
 
     is_api = False
     if not order:
-        all_api = database.get_all_api_orders()
-        api_order = next((o for o in all_api if str(o.get('uuid')) == str(oid)), None)
+        api_order = await async_db.get_order_by_uuid(oid)
         if api_order:
             is_api = True
             order = api_order
@@ -564,8 +519,7 @@ async def retry_order_api(call: types.CallbackQuery):
 
     oid = call.data.split(":")[1]
     # Work against full set, but ensure it's pending when performing actions
-    all_orders = database.get_all_orders()
-    o = next((x for x in all_orders if str(x.get('id')) == str(oid)), None)
+    o = await async_db.get_pending_order_by_id(oid)
     if not o:
         return await call.answer("❌ الطلب غير موجود")
 
@@ -582,7 +536,7 @@ async def retry_order_api(call: types.CallbackQuery):
     )
 
     if ok:
-        database.update_order_status(oid, "completed")
+        await async_db.update_order_status(oid, "completed")
         await call.message.answer(f"✅ <b>تم التنفيذ!</b>\n🔑 الكود: <code>{res}</code>")
         try:
             await call.bot.send_message(
@@ -593,6 +547,14 @@ async def retry_order_api(call: types.CallbackQuery):
         except:
             pass
         await list_all_orders(call)
+    elif code == api_manager.ORDER_OUTCOME_UNKNOWN:
+        # قد يكون المزود نفّذه: الطلب الآن طلب API يحسمه فحص الطلبات (مع الاسترجاع
+        # إن رُفض)، فلا يُعاد إرساله ولا يُرفض محلياً
+        await async_db.update_order_status(oid, "processing")
+        await call.message.answer(
+            f"⚠️ <b>لم يرد المزود:</b> {res}\n"
+            f"الطلب قيد المتابعة برقم <code>{uuid}</code> ولا تعِد إرساله."
+        )
     else:
         await call.message.answer(f"❌ <b>فشل التنفيذ:</b>\n{res}")
 
@@ -604,8 +566,7 @@ async def mark_manual_done(call: types.CallbackQuery):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
 
     oid = call.data.split(":")[1]
-    all_orders = database.get_all_orders()
-    order = next((x for x in all_orders if str(x.get('id')) == str(oid)), None)
+    order = await async_db.get_pending_order_by_id(oid)
 
     if not order:
         return await call.answer("❌ الطلب غير موجود")
@@ -617,7 +578,7 @@ async def mark_manual_done(call: types.CallbackQuery):
     if (order.get('status', '')).lower() != 'pending':
         return await call.answer("❌ يمكن فقط تعديل الطلبات المعلقة", show_alert=True)
 
-    database.update_order_status(oid, "completed")
+    await async_db.update_order_status(oid, "completed")
 
     try:
         msg_text = (
@@ -643,8 +604,7 @@ async def refund_order_admin(call: types.CallbackQuery):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
 
     oid = call.data.split(":")[1]
-    all_orders = database.get_all_orders()
-    order = next((x for x in all_orders if str(x.get('id')) == str(oid)), None)
+    order = await async_db.get_pending_order_by_id(oid)
 
     if not order:
         return await call.answer("❌ الطلب غير موجود")
@@ -664,11 +624,16 @@ async def refund_order_admin(call: types.CallbackQuery):
     is_pubg = 'PUBG' in category_name or 'ببجي' in category_name
 
     # Refund balance
-    new_bal = database.add_balance(order['user_id'], cost)
+    status, new_bal = await async_db.credit_balance(order['user_id'], cost, kind="refund",
+                                                    ref=database.order_refund_ref(order))
+    if status == "duplicate":
+        # ضغطة مكررة: المبلغ مسترجع مسبقاً
+        await async_db.update_order_status(oid, "rejected")
+        return await call.answer("⚠️ تم استرجاع هذا الطلب مسبقاً.", show_alert=True)
     new_bal_syp = int(new_bal * rate)
     cost_syp = int(cost * rate)
 
-    database.update_order_status(oid, "rejected")
+    await async_db.update_order_status(oid, "rejected")
 
     try:
         if is_pubg:
@@ -716,9 +681,8 @@ async def bulk_approve_orders(call: types.CallbackQuery):
     if not database.is_user_admin(call.from_user.id):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
 
-    # Only get LOCAL orders - API orders are excluded
-    local_orders = database.get_all_orders()
-    pending = [o for o in local_orders if (o.get('status') or '').lower() == 'pending' and o.get('order_source', ORDER_SOURCE_LOCAL) == ORDER_SOURCE_LOCAL]
+    # Only LOCAL orders - API orders are excluded
+    pending = await async_db.get_orders_by_status_and_source('pending', ORDER_SOURCE_LOCAL)
 
     if not pending:
         return await call.answer("❌ لا يوجد طلبات محلية معلقة", show_alert=True)
@@ -745,14 +709,14 @@ async def confirm_bulk_approve_orders(call: types.CallbackQuery):
     if not database.is_user_admin(call.from_user.id):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
 
-    all_orders = database.get_all_orders()
-    pending = [o for o in all_orders if (o.get('status') or '').lower() == 'pending' and o.get('order_source', ORDER_SOURCE_LOCAL) == ORDER_SOURCE_LOCAL]
+    # Only LOCAL orders - API orders are excluded
+    pending = await async_db.get_orders_by_status_and_source('pending', ORDER_SOURCE_LOCAL)
 
     approved_count = 0
 
     for order in pending:
         try:
-            database.update_order_status(order['id'], "completed")
+            await async_db.update_order_status(order['id'], "completed")
             try:
                 await call.bot.send_message(
                     order['user_id'],
@@ -782,9 +746,8 @@ async def bulk_reject_orders(call: types.CallbackQuery):
     if not database.is_user_admin(call.from_user.id):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
 
-    # Only get LOCAL orders - API orders are excluded
-    local_orders = database.get_all_orders()
-    pending = [o for o in local_orders if (o.get('status') or '').lower() == 'pending' and o.get('order_source', ORDER_SOURCE_LOCAL) == ORDER_SOURCE_LOCAL]
+    # Only LOCAL orders - API orders are excluded
+    pending = await async_db.get_orders_by_status_and_source('pending', ORDER_SOURCE_LOCAL)
 
     if not pending:
         return await call.answer("❌ لا يوجد طلبات محلية معلقة", show_alert=True)
@@ -811,8 +774,8 @@ async def confirm_bulk_reject_orders(call: types.CallbackQuery):
     if not database.is_user_admin(call.from_user.id):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
 
-    all_orders = database.get_all_orders()
-    pending = [o for o in all_orders if (o.get('status') or '').lower() == 'pending' and o.get('order_source', ORDER_SOURCE_LOCAL) == ORDER_SOURCE_LOCAL]
+    # Only LOCAL orders - API orders are excluded
+    pending = await async_db.get_orders_by_status_and_source('pending', ORDER_SOURCE_LOCAL)
 
     rate = settings.get_setting("exchange_rate")
     rejected_count = 0
@@ -822,10 +785,14 @@ async def confirm_bulk_reject_orders(call: types.CallbackQuery):
             cost = float(order['product']['price']) * int(order['qty'])
             cost_syp = int(cost * rate)
 
-            new_bal = database.add_balance(order['user_id'], cost)
+            status, new_bal = await async_db.credit_balance(order['user_id'], cost, kind="refund",
+                                                            ref=database.order_refund_ref(order))
+            if status == "duplicate":
+                await async_db.update_order_status(order['id'], "rejected")
+                continue
             new_bal_syp = int(new_bal * rate)
 
-            database.update_order_status(order['id'], "rejected")
+            await async_db.update_order_status(order['id'], "rejected")
             rejected_count += 1
 
             try:
@@ -867,13 +834,9 @@ async def export_categories(msg: types.Message):
 
     await msg.answer("⏳ جاري جلب الفئات من الموقع...")
 
-    api_manager.refresh_data()
+    await api_manager.refresh_data()
 
-    cats = set()
-    for p in api_manager._products_cache:
-        c_name = p.get('category_name', '').strip()
-        if c_name:
-            cats.add(c_name)
+    cats = set(api_manager.get_catalog().category_names.values())
 
     if not cats:
         return await msg.answer("❌ لم يتم العثور على فئات!")
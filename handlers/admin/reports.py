@@ -1,28 +1,25 @@
-"""Admin report download handlers."""
-import os
+"""Admin report download handlers (listed from the report_archive index)."""
+import math
 from aiogram import Router, types, F
-from aiogram.types import FSInputFile
+from aiogram.types import InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 import config
+import services.async_db as async_db
 import services.database as database
 import data.keyboards as kb
 from bot.utils.helpers import smart_edit
+from reports.archive import parse_filename, period_label, send_report
 
 router = Router()
 
-REPORTS_BASE_DIR = "reports"
-DAILY_DIR = os.path.join(REPORTS_BASE_DIR, "daily")
-WEEKLY_DIR = os.path.join(REPORTS_BASE_DIR, "weekly")
-MONTHLY_DIR = os.path.join(REPORTS_BASE_DIR, "monthly")
+PAGE_SIZE = 10
 
-
-def get_report_files(directory):
-    """Get list of report files in a directory, sorted by name (newest first)."""
-    if not os.path.exists(directory):
-        return []
-    files = [f for f in os.listdir(directory) if f.endswith('.pdf')]
-    files.sort(reverse=True)  # Newest first
-    return files
+# report_type -> (icon, list title, empty-list text)
+REPORT_MENUS = {
+    "daily": ("📅", "التقارير اليومية", "❌ <b>لا توجد تقارير يومية متاحة حالياً.</b>"),
+    "weekly": ("📆", "التقارير الأسبوعية", "❌ <b>لا توجد تقارير أسبوعية متاحة حالياً.</b>"),
+    "monthly": ("📊", "التقارير الشهرية", "❌ <b>لا توجد تقارير شهرية متاحة حالياً.</b>"),
+}
 
 
 @router.callback_query(F.data == "admin_reports")
@@ -45,151 +42,79 @@ async def show_reports_menu(call: types.CallbackQuery):
     )
 
 
-@router.callback_query(F.data == "admin_reports_daily")
-async def show_daily_reports(call: types.CallbackQuery):
-    """Show list of daily reports."""
-    if not database.is_user_admin(call.from_user.id):
-        return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
-    files = get_report_files(DAILY_DIR)
-    
-    if not files:
-        return await smart_edit(
-            call,
-            "❌ <b>لا توجد تقارير يومية متاحة حالياً.</b>",
-            kb.back_btn("admin_reports")
-        )
-    
-    keyboard = InlineKeyboardBuilder()
-    for filename in files[:20]:  # Limit to 20 most recent
-        # Extract date from filename: daily_sales_YYYY_MM_DD.pdf
-        date_str = filename.replace("daily_sales_", "").replace(".pdf", "").replace("_", "-")
-        keyboard.button(text=f"📅 {date_str}", callback_data=f"download_daily:{filename}")
-    
-    keyboard.button(text="🔙 رجوع", callback_data="admin_reports")
-    keyboard.adjust(1)
-    
-    await smart_edit(
-        call,
-        f"📅 <b>التقارير اليومية ({len(files)}):</b>\n"
-        "اختر تقرير للتحميل.",
-        keyboard.as_markup()
-    )
+async def render_reports_page(call: types.CallbackQuery, report_type: str, page: int):
+    """One page of the archive for report_type, newest first."""
+    icon, title, empty_text = REPORT_MENUS[report_type]
+    total_items = await async_db.count_report_archive(report_type)
+    if not total_items:
+        return await smart_edit(call, empty_text, kb.back_btn("admin_reports"))
 
+    total_pages = math.ceil(total_items / PAGE_SIZE)
+    page = min(max(page, 1), total_pages)
+    entries = await async_db.get_report_archive_page(report_type, PAGE_SIZE, (page - 1) * PAGE_SIZE)
 
-@router.callback_query(F.data == "admin_reports_weekly")
-async def show_weekly_reports(call: types.CallbackQuery):
-    """Show list of weekly reports."""
-    if not database.is_user_admin(call.from_user.id):
-        return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
-    files = get_report_files(WEEKLY_DIR)
-    
-    if not files:
-        return await smart_edit(
-            call,
-            "❌ <b>لا توجد تقارير أسبوعية متاحة حالياً.</b>",
-            kb.back_btn("admin_reports")
-        )
-    
     keyboard = InlineKeyboardBuilder()
-    for filename in files[:20]:  # Limit to 20 most recent
-        # Extract week from filename: weekly_sales_YYYY_WW.pdf
-        week_str = filename.replace("weekly_sales_", "").replace(".pdf", "")
-        keyboard.button(text=f"📆 Week {week_str}", callback_data=f"download_weekly:{filename}")
-    
-    keyboard.button(text="🔙 رجوع", callback_data="admin_reports")
+    for entry in entries:
+        keyboard.button(text=f"{icon} {period_label(report_type, entry['period'])}",
+                        callback_data=f"download_report:{report_type}:{entry['period']}")
     keyboard.adjust(1)
-    
-    await smart_edit(
-        call,
-        f"📆 <b>التقارير الأسبوعية ({len(files)}):</b>\n"
-        "اختر تقرير للتحميل.",
-        keyboard.as_markup()
-    )
 
+    nav_row = []
+    if page > 1:
+        nav_row.append(InlineKeyboardButton(text="⬅️ سابق", callback_data=f"reports_page:{report_type}:{page - 1}"))
+    nav_row.append(InlineKeyboardButton(text=f"📄 {page}/{total_pages}", callback_data="noop"))
+    if page < total_pages:
+        nav_row.append(InlineKeyboardButton(text="تالي ➡️", callback_data=f"reports_page:{report_type}:{page + 1}"))
+    keyboard.row(*nav_row)
+    keyboard.row(InlineKeyboardButton(text="🔙 رجوع", callback_data="admin_reports"))
 
-@router.callback_query(F.data == "admin_reports_monthly")
-async def show_monthly_reports(call: types.CallbackQuery):
-    """Show list of monthly reports."""
-    if not database.is_user_admin(call.from_user.id):
-        return await call.answer("❌ صلاحيات غير ��افية.", show_alert=True)
-    files = get_report_files(MONTHLY_DIR)
-    
-    if not files:
-        return await smart_edit(
-            call,
-            "❌ <b>لا توجد تقارير شهرية متاحة حالياً.</b>",
-            kb.back_btn("admin_reports")
-        )
-    
-    keyboard = InlineKeyboardBuilder()
-    for filename in files[:20]:  # Limit to 20 most recent
-        # Extract month from filename: monthly_sales_YYYY_MM.pdf
-        month_str = filename.replace("monthly_sales_", "").replace(".pdf", "").replace("_", "-")
-        keyboard.button(text=f"📊 {month_str}", callback_data=f"download_monthly:{filename}")
-    
-    keyboard.button(text="🔙 رجوع", callback_data="admin_reports")
-    keyboard.adjust(1)
-    
     await smart_edit(
         call,
-        f"📊 <b>التقارير الشهرية ({len(files)}):</b>\n"
+        f"{icon} <b>{title} ({total_items}):</b>\n"
         "اختر تقرير للتحميل.",
         keyboard.as_markup()
     )
 
 
-@router.callback_query(F.data.startswith("download_daily:"))
-async def download_daily_report(call: types.CallbackQuery):
-    """Download a daily report."""
+@router.callback_query(F.data.in_({f"admin_reports_{t}" for t in REPORT_MENUS}))
+async def show_report_list(call: types.CallbackQuery):
+    """Show the first page of daily / weekly / monthly reports."""
     if not database.is_user_admin(call.from_user.id):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
-    filename = call.data.split(":", 1)[1]
-    file_path = os.path.join(DAILY_DIR, filename)
-    
-    if not os.path.exists(file_path):
-        return await call.answer("❌ الملف غير موجود", show_alert=True)
-    
-    try:
-        document = FSInputFile(file_path)
-        await call.message.answer_document(document, caption=f"📅 {filename}")
-        await call.answer("✅ تم الإرسال")
-    except Exception as e:
-        await call.answer(f"❌ خطأ: {str(e)}", show_alert=True)
+    await render_reports_page(call, call.data.replace("admin_reports_", ""), 1)
 
 
-@router.callback_query(F.data.startswith("download_weekly:"))
-async def download_weekly_report(call: types.CallbackQuery):
-    """Download a weekly report."""
+@router.callback_query(F.data.startswith("reports_page:"))
+async def report_list_pagination(call: types.CallbackQuery):
     if not database.is_user_admin(call.from_user.id):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
-    filename = call.data.split(":", 1)[1]
-    file_path = os.path.join(WEEKLY_DIR, filename)
-    
-    if not os.path.exists(file_path):
-        return await call.answer("❌ الملف غير موجود", show_alert=True)
-    
-    try:
-        document = FSInputFile(file_path)
-        await call.message.answer_document(document, caption=f"📆 {filename}")
-        await call.answer("✅ تم الإرسال")
-    except Exception as e:
-        await call.answer(f"❌ خطأ: {str(e)}", show_alert=True)
+    _, report_type, page = call.data.split(":")
+    if report_type not in REPORT_MENUS:
+        return await call.answer()
+    await render_reports_page(call, report_type, int(page))
 
 
-@router.callback_query(F.data.startswith("download_monthly:"))
-async def download_monthly_report(call: types.CallbackQuery):
-    """Download a monthly report."""
+@router.callback_query(F.data.startswith("download_report:") | F.data.regexp(r"^download_(daily|weekly|monthly):"))
+async def download_report(call: types.CallbackQuery):
+    """Send a report: by its Telegram file_id when it was sent before, else upload the PDF."""
     if not database.is_user_admin(call.from_user.id):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
-    filename = call.data.split(":", 1)[1]
-    file_path = os.path.join(MONTHLY_DIR, filename)
-    
-    if not os.path.exists(file_path):
-        return await call.answer("❌ الملف غير موجود", show_alert=True)
-    
+    if call.data.startswith("download_report:"):
+        _, report_type, period = call.data.split(":", 2)
+    else:
+        # Buttons from before the archive carried the file name.
+        parsed = parse_filename(call.data.split(":", 1)[1])
+        if parsed is None:
+            return await call.answer("❌ الملف غير موجود", show_alert=True)
+        report_type, period = parsed
+
+    icon = REPORT_MENUS.get(report_type, ("📊",))[0]
+    caption = f"{icon} {report_type}_sales_{period}.pdf"
     try:
-        document = FSInputFile(file_path)
-        await call.message.answer_document(document, caption=f"📊 {filename}")
+        sent = await send_report(lambda document: call.message.answer_document(document, caption=caption),
+                                 report_type, period)
+        if sent is None:
+            return await call.answer("❌ الملف غير موجود", show_alert=True)
         await call.answer("✅ تم الإرسال")
     except Exception as e:
         await call.answer(f"❌ خطأ: {str(e)}", show_alert=True)
@@ -1,10 +1,8 @@
 """Admin settings management handlers."""
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
-from aiogram.utils.keyboard import InlineKeyboardBuilder
 import services.settings as settings
 import services.api_manager as api_manager
-import data.mappings as mappings
 import data.keyboards as kb
 from bot.utils.helpers import smart_edit
 from states.admin import AdminState
@@ -51,33 +49,10 @@ async def ignore_callback(call: types.CallbackQuery):
 async def show_margins_menu(call: types.CallbackQuery, state: FSMContext):
     """Show margins management menu."""
     await state.clear()
-    keyboard = InlineKeyboardBuilder()
-
-    def to_perc(val):
-        return round((val - 1) * 100)
-
-    current_default = settings.get_margin_for_category("default")
-    keyboard.button(
-        text=f"🌐 الربح العام ({to_perc(current_default)}%)",
-        callback_data="set_margin:default"
-    )
-
-    def add_section(title, mapping_dict):
-        keyboard.button(text=f"━━ {title} ━━", callback_data="ignore")
-        for cat in mapping_dict.keys():
-            m = settings.get_margin_for_category(cat)
-            keyboard.button(text=f"{cat} ({to_perc(m)}%)", callback_data=f"set_margin:{cat}")
-
-    add_section("🎮 الألعاب", mappings.GAMES_MAP)
-    add_section("📱 التطبيقات والخدمات", mappings.APPS_MAP)
-
-    keyboard.button(text="🔙 رجوع", callback_data="admin_home")
-    keyboard.adjust(1)
-
     await smart_edit(
         call,
         "🏷️ <b>إدارة نسب الربح:</b>\nتم تحديث الأقسام بناءً على الملف الجديد.",
-        keyboard.as_markup()
+        kb.admin_margins_menu()
     )
 
 
@@ -124,7 +99,7 @@ async def save_new_margin(msg: types.Message, state: FSMContext):
     await msg.answer("🔄 جاري تحديث الأسعار في المتجر... لحظة من فضلك.")
 
     try:
-        api_manager.refresh_data()
+        await api_manager.refresh_data()
     except Exception as e:
         print(f"Error refreshing data: {e}")
 
@@ -180,25 +155,10 @@ async def set_new_commission(msg: types.Message, state: FSMContext):
 async def show_categories_to_rename(call: types.CallbackQuery, state: FSMContext):
     """Show categories that can be renamed."""
     await state.clear()
-    keyboard = InlineKeyboardBuilder()
-    
-    # Get all categories from mappings
-    all_categories = {}
-    all_categories.update(mappings.GAMES_MAP)
-    all_categories.update(mappings.APPS_MAP)
-    
-    for cat_key in sorted(all_categories.keys()):
-        custom_name = settings.get_category_name(cat_key)
-        display_name = custom_name if custom_name != cat_key else cat_key
-        keyboard.button(text=f"{display_name}", callback_data=f"rename_cat:{cat_key}")
-    
-    keyboard.button(text="🔙 رجوع", callback_data="admin_home")
-    keyboard.adjust(1)
-    
     await smart_edit(
         call,
         "🏷️ <b>إعادة تسمية الفئات:</b>\nاختر الفئة التي تريد إعادة تسميتها:",
-        keyboard.as_markup()
+        kb.admin_rename_categories_menu()
     )
 
 
@@ -3,6 +3,7 @@ from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 import services.database as database
+import services.async_db as async_db
 import services.settings as settings
 import services.api_manager as api_manager
 import data.keyboards as kb
@@ -44,7 +45,7 @@ async def list_all_users(call: types.CallbackQuery):
         page = 0
 
     # تسريع جلب المستخدمين
-    users = await asyncio.to_thread(database.get_all_users_list)
+    users = await async_db.get_all_users_list()
 
     if not users:
         return await call.answer("لا يوجد مستخدمين!", show_alert=True)
@@ -55,9 +56,10 @@ async def list_all_users(call: types.CallbackQuery):
     current_users = users[start:end]
 
     builder = InlineKeyboardBuilder()
+    admin_ids = database.filter_admins(u['id'] for u in current_users)
     for u in current_users:
         status = "⛔" if u['banned'] else "✅"
-        is_admin = database.is_user_admin(u['id'])
+        is_admin = u['id'] in admin_ids
         admin_tag = "👮‍♂️" if is_admin else ""
 
         safe_name = html.escape(str(u['name']))
@@ -97,7 +99,7 @@ async def search_result(msg: types.Message, state: FSMContext):
     try:
         uid = msg.text.strip()
         # تسريع البحث
-        user_data = await asyncio.to_thread(database.get_user_data, uid)
+        user_data = await async_db.get_user_data(uid)
 
         if not user_data:
              await msg.answer("❌ المستخدم غير موجود.", reply_markup=kb.back_to_admin())
@@ -127,7 +129,7 @@ async def open_user_control(msg_or_call, user_id, is_edit=False):
     """Show user control panel."""
     try:
         # تسريع جلب البيانات
-        data = await asyncio.to_thread(database.get_user_data, user_id)
+        data = await async_db.get_user_data(user_id)
         markup = kb.back_to_admin()
 
         if not data:
@@ -267,7 +269,7 @@ async def perform_add_balance(msg: types.Message, state: FSMContext):
         msg_details = "($)"
 
     # تسريع الإضافة
-    new_bal = await asyncio.to_thread(database.add_balance, user_id, final_usd_amount)
+    new_bal = await async_db.add_balance(user_id, final_usd_amount, kind="admin_credit")
 
     await msg.answer(
         f"✅ <b>تمت الإضافة بنجاح!</b>\n"
@@ -362,10 +364,10 @@ async def perform_sub_balance(msg: types.Message, state: FSMContext):
         msg_details = "($)"
 
     # تنفيذ الخصم بسرعة
-    success = await asyncio.to_thread(database.deduct_balance, user_id, final_usd_amount)
+    success = await async_db.deduct_balance(user_id, final_usd_amount, kind="admin_debit")
 
     if success:
-        new_bal = await asyncio.to_thread(database.get_balance, user_id)
+        new_bal = await async_db.get_balance(user_id)
 
         await msg.answer(
             f"✅ <b>تم الخصم بنجاح!</b>\n"
@@ -398,7 +400,7 @@ async def promote_user_to_admin(call: types.CallbackQuery):
     if not database.is_super_admin(call.from_user.id):
         return await call.answer("❌ فقط السوبر أدمن يمكنه ترقية المستخدمين!", show_alert=True)
     uid = call.data.split(":")[1]
-    database.set_admin(uid, True)
+    await async_db.set_admin(uid, True)
     await call.answer("✅ تم ترقية المستخدم إلى أدمن بنجاح!", show_alert=True)
     await open_user_control(call.message, uid, is_edit=True)
 
@@ -414,7 +416,7 @@ async def demote_user_from_admin(call: types.CallbackQuery):
             return await call.answer("❌ لا يمكن إزالة سوبر أدمن!", show_alert=True)
     except: pass
 
-    database.set_admin(uid, False)
+    await async_db.set_admin(uid, False)
     await call.answer("✅ تم إزالة صلاحيات الأدمن.", show_alert=True)
     await open_user_control(call.message, uid, is_edit=True)
 
@@ -423,7 +425,7 @@ async def ban_user_exec(call: types.CallbackQuery):
     if not database.is_user_admin(call.from_user.id):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
     uid = call.data.split(":")[1]
-    database.ban_user(uid, True)
+    await async_db.ban_user(uid, True)
     await call.answer("تم الحظر ⛔")
     await open_user_control(call.message, uid, is_edit=True)
 
@@ -432,7 +434,7 @@ async def unban_user_exec(call: types.CallbackQuery):
     if not database.is_user_admin(call.from_user.id):
         return await call.answer("❌ صلاحيات غير كافية.", show_alert=True)
     uid = call.data.split(":")[1]
-    database.ban_user(uid, False)
+    await async_db.ban_user(uid, False)
     await call.answer("تم فك الحظر ✅")
     await open_user_control(call.message, uid, is_edit=True)
 
@@ -468,18 +470,20 @@ async def view_user_order_details(call: types.CallbackQuery):
     page = parts[3]  # رقم الصفحة للعودة إليها
 
     # البحث عن الطلب
-    all_local = database.get_user_local_orders(user_id)
-    target_order = next((o for o in all_local if str(o.get('id')) == str(order_id)), None)
+    target_order = await async_db.get_pending_order_by_id(order_id)
     is_api = False
 
+    if target_order and str(target_order.get('user_id')) != str(user_id):
+        target_order = None
+
     if not target_order:
-        # بحث في API
-        all_api = database.get_user_api_history(user_id, 200)
-        target_order = next(
-            (o for o in all_api if str(o.get('uuid')) == str(order_id) or str(o.get('order_id')) == str(order_id)),
-            None)
-        if target_order:
-            is_api = True
+        # بحث في API (بالـ uuid ثم برقم الطلب عند المزود)
+        target_order = await async_db.get_order_by_uuid(order_id)
+        if target_order and str(target_order.get('user_id')) != str(user_id):
+            target_order = None
+        if not target_order:
+            target_order = await async_db.get_api_order_by_provider_id(order_id, user_id)
+        is_api = target_order is not None
 
     if not target_order:
         return await call.answer("❌ الطلب غير موجود", show_alert=True)
@@ -547,45 +551,21 @@ async def render_user_history_page(call: types.CallbackQuery, user_id: str, page
     """عرض صفحة من سجل طلبات المستخدم."""
     PAGE_SIZE = 10
 
-    # 1. جلب البيانات من المصدرين
-    local_orders = await asyncio.to_thread(database.get_user_local_orders, user_id)
-    api_orders = await asyncio.to_thread(database.get_user_api_history, user_id, 100)  # جلب آخر 100 طلب API
-
-    # 2. توحيد البيانات
-    all_orders = []
-
-    for o in local_orders:
-        o['order_source'] = ORDER_SOURCE_LOCAL
-        o['sort_date'] = o.get('date', '')
-        all_orders.append(o)
-
-    for o in api_orders:
-        o['order_source'] = ORDER_SOURCE_API
-        o['sort_date'] = o.get('created_at', '')
-        # التأكد من وجود Product Name
-        if 'product' not in o:
-            o['product'] = {'name': o.get('product_name', 'API Service')}
-        all_orders.append(o)
-
-    # 3. الترتيب (الأحدث أولاً)
-    all_orders.sort(key=lambda x: x.get('sort_date', ''), reverse=True)
-
-    # 4. تقسيم الصفحات
-    if not all_orders:
+    # 1. العدد ثم الصفحة المطلوبة فقط (order_index: محلي + API)
+    total_items = await async_db.count_user_orders(user_id)
+    if not total_items:
         await call.answer("📂 السجل فارغ لهذا المستخدم.", show_alert=True)
         return
 
-    total_items = len(all_orders)
+    # 2. تقسيم الصفحات
     total_pages = math.ceil(total_items / PAGE_SIZE)
 
     if page > total_pages: page = total_pages
     if page < 1: page = 1
 
-    start_idx = (page - 1) * PAGE_SIZE
-    end_idx = start_idx + PAGE_SIZE
-    page_items = all_orders[start_idx:end_idx]
+    page_items = await async_db.get_user_orders_page(user_id, PAGE_SIZE, (page - 1) * PAGE_SIZE)
 
-    # 5. بناء القائمة
+    # 3. بناء القائمة
     txt = f"📜 <b>سجل طلبات المستخدم:</b> <code>{user_id}</code>\n"
     txt += f"📄 صفحة <b>{page}</b> من <b>{total_pages}</b>\n"
     txt += f"📦 إجمالي الطلبات: {total_items}"
@@ -595,17 +575,12 @@ async def render_user_history_page(call: types.CallbackQuery, user_id: str, page
 
     for order in page_items:
         is_api = order.get('order_source') == ORDER_SOURCE_API
-        oid = order.get('uuid') if is_api else order.get('id')
+        oid = order['id']
 
         # تحديد الأيقونة والسعر
-        if is_api:
-            icon = "🌐"
-            price = order.get('price', 0)
-            p_name = order.get('product_name', 'API')
-        else:
-            icon = "🏠"
-            price = float(order.get('product', {}).get('price', 0)) * int(order.get('qty', 1))
-            p_name = order.get('product', {}).get('name', 'Local')
+        icon = "🌐" if is_api else "🏠"
+        price = order.get('price') or 0
+        p_name = order.get('product_name') or ('API' if is_api else 'Local')
 
         # زر مختصر: أيقونة | رقم الطلب | الخدمة | السعر
         # تقصير اسم الخدمة ليناسب الزر
@@ -1,9 +1,9 @@
 from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
-from aiogram.types import FSInputFile, InputMediaPhoto  # 👈 (مهم) استدعاء InputMediaPhoto
 from contextlib import suppress
-import services.database as database
+import services.async_db as async_db
+import services.media as media
 import data.keyboards as kb
 
 router = Router()
@@ -13,7 +13,7 @@ router = Router()
 async def cmd_start(message: types.Message, state: FSMContext):
     await state.clear()
     user = message.from_user
-    database.register_user(user.id, user.first_name, user.username)
+    await async_db.register_user(user.id, user.first_name, user.username)
 
     WELCOME_MESSAGE = f"""
 🤍 مرحبًا بك{user.first_name} في متجرنا الرسمي!
@@ -25,9 +25,8 @@ async def cmd_start(message: types.Message, state: FSMContext):
     """
 
     try:
-        photo = FSInputFile("assets/store.jpg")
-        await message.answer_photo(
-            photo=photo,
+        await media.answer_photo(
+            message, media.STORE_IMAGE,
             caption=WELCOME_MESSAGE,
             reply_markup=kb.main_menu(),
             parse_mode="HTML"
@@ -50,18 +49,13 @@ async def back_to_home(call: types.CallbackQuery, state: FSMContext):
 🔸 نتمنى لك تجربة ممتعة وموفّقة!
 """
 
-    # ✅ الحل السحري: نستخدم edit_media لنغير الصورة لنوع store.jpg في نفس المكان
+    # ✅ الحل السحري: نستخدم edit_media لنغير الصورة لنوع store.jpg في نفس المكان (بالـ file_id المحفوظ)
     try:
-        media = InputMediaPhoto(
-            media=FSInputFile("assets/store.jpg"),
-            caption=WELCOME_MESSAGE,
-            parse_mode="HTML"
-        )
-        await call.message.edit_media(media=media, reply_markup=kb.main_menu())
+        await media.edit_photo(call.message, media.STORE_IMAGE, caption=WELCOME_MESSAGE, parse_mode="HTML",
+                               reply_markup=kb.main_menu())
     except Exception:
         # احتياط: لو كانت الرسالة السابقة نصية فقط ولا يمكن تعديل الميديا
         with suppress(Exception):
             await call.message.delete()
-        photo = FSInputFile("assets/store.jpg")
-        await call.message.answer_photo(photo=photo, caption=WELCOME_MESSAGE, reply_markup=kb.main_menu(),
-                                        parse_mode="HTML")
\ No newline at end of file
+        await media.answer_photo(call.message, media.STORE_IMAGE, caption=WELCOME_MESSAGE,
+                                 reply_markup=kb.main_menu(), parse_mode="HTML")
\ No newline at end of file
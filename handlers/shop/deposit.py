@@ -1,13 +1,13 @@
 """Deposit and Account handlers."""
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
-import asyncio  # ✅ 1. إضافة مكتبة asyncio
 import config
-import services.database as database
+import services.async_db as async_db
 import services.settings as settings
 import data.keyboards as kb
 from bot.utils.helpers import smart_edit, format_price
 from states.shop import DepositState
+from constants.orders import ORDER_SOURCE_LOCAL
 
 router = Router()
 
@@ -17,12 +17,10 @@ async def show_my_account(call: types.CallbackQuery):
     """Show user account details (ID, Total Deposited, Orders Count)."""
     user_id = call.from_user.id
 
-    # ✅ استخدام to_thread لتسريع الاستجابة
-    total_deposited = await asyncio.to_thread(database.get_total_deposited, user_id)
-    orders = await asyncio.to_thread(database.get_user_local_orders, user_id)
-
-    completed_orders = [o for o in orders if o['status'] == 'completed']
-    orders_count = len(completed_orders)
+    # ✅ القراءة عبر async_db حتى لا تتوقف حلقة الأحداث
+    total_deposited = await async_db.get_total_deposited(user_id)
+    # كما كان سابقاً: مشتريات المتجر المحلية المكتملة فقط (بدون طلبات API)
+    orders_count = await async_db.count_user_orders(user_id, 'completed', ORDER_SOURCE_LOCAL)
 
     txt = (
         f"👤 <b>حسابي الشخصي</b>\n"
@@ -51,8 +49,8 @@ async def chk_bal(call: types.CallbackQuery):
     u = call.from_user.id
 
     # ✅ تسريع جلب البيانات
-    b = await asyncio.to_thread(database.get_balance, u)
-    total_deposited = await asyncio.to_thread(database.get_total_deposited, u)
+    wallet = await async_db.get_wallet(u)
+    b, total_deposited = wallet['balance'], wallet['total_deposited']
 
     rate = settings.get_setting("exchange_rate")
     b_syp = int(round(b * rate))
@@ -213,10 +211,9 @@ async def process_proof_image(msg: types.Message, state: FSMContext):
     elif msg.document:
         proof_image_id = msg.document.file_id
 
-    # 🔥🔥 التغيير الجوهري: استخدام await asyncio.to_thread 🔥🔥
+    # 🔥🔥 الكتابة تمر عبر خيط الكتابة الوحيد في async_db 🔥🔥
     # هذا يمنع البوت من التجمد أثناء الكتابة في قاعدة البيانات
-    req = await asyncio.to_thread(
-        database.save_deposit_request,
+    req = await async_db.save_deposit_request(
         uid, method, txn_id, amount, proof_image_id
     )
 
@@ -246,7 +243,7 @@ async def process_proof_image(msg: types.Message, state: FSMContext):
     ])
 
     # 🔥🔥 تسريع إشعار الأدمن أيضاً 🔥🔥
-    admin_ids = await asyncio.to_thread(database.get_all_admin_ids)
+    admin_ids = await async_db.get_all_admin_ids()
 
     for aid in admin_ids:
         try:
@@ -272,8 +269,7 @@ async def skip_proof_image(msg: types.Message, state: FSMContext):
     uid = msg.from_user.id
 
     # 🔥🔥 التغيير الجوهري هنا أيضاً 🔥🔥
-    req = await asyncio.to_thread(
-        database.save_deposit_request,
+    req = await async_db.save_deposit_request(
         uid, method, txn_id, amount, None
     )
 
@@ -286,7 +282,7 @@ async def skip_proof_image(msg: types.Message, state: FSMContext):
     await state.clear()
 
     # إشعار الأدمن (نفس المنطق)
-    admin_ids = await asyncio.to_thread(database.get_all_admin_ids)
+    admin_ids = await async_db.get_all_admin_ids()
     admin_txt = f"🔔 إيداع جديد ({method}) - {amount} - {txn_id}"
     markup = types.InlineKeyboardMarkup(inline_keyboard=[
         [types.InlineKeyboardButton(text="✅ قبول", callback_data=f"approve_dep:{req['id']}")],
@@ -1,13 +1,11 @@
 """Shop navigation handlers."""
 from aiogram import Router, types, F
-from aiogram.types import InlineKeyboardButton, FSInputFile, InputMediaPhoto
-from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.fsm.context import FSMContext  # ✅ إضافة هامة
 
 import data.mappings as mappings
 import data.keyboards as kb
 import services.api_manager as api_manager
-import services.settings as settings
+import services.media as media
 from bot.utils.helpers import smart_edit
 
 router = Router()
@@ -21,30 +19,16 @@ async def navigation(call: types.CallbackQuery, state: FSMContext):
 
     if key == "white":
         txt = "💎 <b>قسم White للوساطة</b>\n━━━━━━━━━━━━\nمتوفر الآن بأفضل الأسعار.\n👇 اختر الخدمة:"
-        media = InputMediaPhoto(media=FSInputFile("assets/white.jpg"), caption=txt, parse_mode="HTML")
         try:
-            await call.message.edit_media(media=media, reply_markup=kb.white_section_menu())
+            await media.edit_photo(call.message, media.WHITE_IMAGE, caption=txt, parse_mode="HTML",
+                                   reply_markup=kb.white_section_menu())
         except:
             # في حال فشل تعديل الميديا (مثلاً الرسالة قديمة)، نرسل رسالة جديدة
             await call.message.delete()
-            await call.message.answer_photo(FSInputFile("assets/white.jpg"), caption=txt, reply_markup=kb.white_section_menu())
+            await media.answer_photo(call.message, media.WHITE_IMAGE, caption=txt, reply_markup=kb.white_section_menu())
         return
 
-    mapping = mappings.GAMES_MAP if key == "games" else mappings.APPS_MAP
-    prefix = "srch_g" if key == "games" else "srch_a"
-
-    display_mapping = {}
-    for cat_key in mapping.keys():
-        display_name = settings.get_category_name(cat_key)
-        display_mapping[display_name] = (cat_key, mapping[cat_key])
-
-    builder = InlineKeyboardBuilder()
-    for display_name, (original_key, keywords) in display_mapping.items():
-        builder.button(text=display_name, callback_data=f"{prefix}:{original_key}")
-    builder.adjust(2)
-    builder.row(InlineKeyboardButton(text="🔙 رجوع للرئيسية", callback_data="home"))
-
-    await smart_edit(call, f"📂 قسم {key}:", builder.as_markup())
+    await smart_edit(call, f"📂 قسم {key}:", kb.category_menu("games" if key == "games" else "apps"))
 
 
 @router.callback_query(F.data.contains("srch_"))
@@ -53,8 +37,8 @@ async def subcats(call: types.CallbackQuery):
     prefix = data_parts[0]
     key = data_parts[1]
 
-    kws = mappings.GAMES_MAP.get(key, []) if prefix == "srch_g" else mappings.APPS_MAP.get(key, [])
-    res = api_manager.search_subcategories(kws)
+    section_map = mappings.GAMES_MAP if prefix == "srch_g" else mappings.APPS_MAP
+    res = await api_manager.browse_categories(key) if key in section_map else []
     if not res:
         return await call.answer("غير متوفر حالياً!", show_alert=True)
 
@@ -73,14 +57,15 @@ async def go_home(call: types.CallbackQuery, state: FSMContext):
 
     # محاولة إرجاع الصورة الأصلية
     try:
-        media = InputMediaPhoto(media=FSInputFile("assets/store.jpg"), caption="🏠 <b>القائمة الرئيسية:</b>", parse_mode="HTML")
-        await call.message.edit_media(media=media, reply_markup=kb.main_menu())
+        await media.edit_photo(call.message, media.STORE_IMAGE, caption="🏠 <b>القائمة الرئيسية:</b>",
+                               parse_mode="HTML", reply_markup=kb.main_menu())
     except:
         # إذا لم نكن في وضع الميديا، نعدل النص فقط أو نرسل جديداً
         try:
             await call.message.delete()
         except: pass
-        await call.message.answer_photo(FSInputFile("assets/store.jpg"), caption="🏠 <b>القائمة الرئيسية:</b>", reply_markup=kb.main_menu())
+        await media.answer_photo(call.message, media.STORE_IMAGE, caption="🏠 <b>القائمة الرئيسية:</b>",
+                                 reply_markup=kb.main_menu())
 
 
 @router.callback_query(F.data == "cancel_op")
@@ -1,7 +1,7 @@
 """Shop orders handler (User Side) with Clean UI & Pagination."""
 from aiogram import Router, types, F
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-import services.database as database
+import services.async_db as async_db
 from bot.utils.helpers import smart_edit
 import math
 
@@ -102,55 +102,28 @@ async def render_orders_page(call: types.CallbackQuery, page: int):
     user_id = call.from_user.id
     PAGE_SIZE = 8  # عدد الطلبات في الصفحة
 
-    # 1. جلب البيانات (محلي + API)
-    # ملاحظة: نستخدم دوال قاعدة البيانات الموجودة
+    # 1. العدد ثم الصفحة المطلوبة فقط (order_index: محلي + API)
     try:
-        local_orders = database.get_user_local_orders(user_id)
-        # جلب آخر 50 طلب API لعدم التحميل الزائد
-        api_orders = database.get_user_api_history(user_id, limit=50)
+        total_items = await async_db.count_user_orders(user_id)
     except Exception as e:
         print(f"Error fetching orders: {e}")
         return await call.answer("حدث خطأ أثناء جلب البيانات", show_alert=True)
 
-    # 2. توحيد القائمة
-    all_orders = []
-
-    for o in local_orders:
-        o['source_type'] = 'local'
-        o['sort_date'] = o.get('date', '')
-        all_orders.append(o)
-
-    for o in api_orders:
-        o['source_type'] = 'api'
-        o['sort_date'] = o.get('created_at', '')
-        # توحيد اسم المنتج للعرض
-        if 'product_name' in o:
-            o['product'] = {'name': o['product_name']}
-        elif 'product' not in o:
-             o['product'] = {'name': 'خدمة API'}
-        all_orders.append(o)
-
-    # 3. الترتيب (الأحدث أولاً)
-    all_orders.sort(key=lambda x: x.get('sort_date', ''), reverse=True)
-
-    if not all_orders:
+    if not total_items:
         return await smart_edit(
             call,
             "📭 <b>سجل الطلبات فارغ</b>\n\nلم تقم بأي طلبات بعد.",
             InlineKeyboardBuilder().button(text="🔙 رجوع", callback_data="shop_main").as_markup()
         )
 
-    # 4. تقسيم الصفحات
-    total_items = len(all_orders)
+    # 2. تقسيم الصفحات
     total_pages = math.ceil(total_items / PAGE_SIZE)
     if page > total_pages: page = total_pages
     if page < 1: page = 1
 
-    start_idx = (page - 1) * PAGE_SIZE
-    end_idx = start_idx + PAGE_SIZE
-    current_items = all_orders[start_idx:end_idx]
+    current_items = await async_db.get_user_orders_page(user_id, PAGE_SIZE, (page - 1) * PAGE_SIZE)
 
-    # 5. بناء الواجهة
+    # 3. بناء الواجهة
     txt = f"📦 <b>طلباتي ({total_items})</b>\n"
     txt += f"📄 صفحة {page} من {total_pages}\n"
     txt += "━━━━━━━━━━━━━━━━"
@@ -159,8 +132,8 @@ async def render_orders_page(call: types.CallbackQuery, page: int):
 
     for order in current_items:
         # تحديد المعرف للزر
-        is_api = (order['source_type'] == 'api')
-        oid = order.get('uuid') if is_api else order.get('id')
+        is_api = (order['order_source'] == 'API')
+        oid = order['id']
 
         # أيقونة الحالة
         status = (order.get('status') or '').lower()
@@ -172,7 +145,7 @@ async def render_orders_page(call: types.CallbackQuery, page: int):
             icon = "⏳"
 
         # اسم الخدمة مختصر
-        p_name = order.get('product', {}).get('name', 'طلب')
+        p_name = order.get('product_name') or 'طلب'
         short_name = (p_name[:18] + '..') if len(p_name) > 18 else p_name
 
         # نص الزر: أيقونة | رقم | اسم
@@ -218,17 +191,12 @@ async def view_order_details(call: types.CallbackQuery):
         is_api = (type_code == "A")
 
         if is_api:
-            # بحث في API
-            # ملاحظة: نستخدم get_user_api_history ونبحث فيه لأننا لا نملك دالة get_api_order_by_uuid مباشرة للزبون
-            # أو يمكننا عمل دالة جديدة، لكن البحث في القائمة الحديثة كافٍ للسرعة
-            orders = database.get_user_api_history(user_id, limit=100)
-            target_order = next((o for o in orders if str(o.get('uuid')) == str(oid)), None)
+            target_order = await async_db.get_order_by_uuid(oid)
         else:
-            # بحث في المحلي
-            orders = database.get_user_local_orders(user_id)
-            target_order = next((o for o in orders if str(o.get('id')) == str(oid)), None)
+            target_order = await async_db.get_pending_order_by_id(oid)
 
-        if not target_order:
+        # الطلب يجب أن يكون لنفس المستخدم
+        if not target_order or str(target_order.get('user_id')) != str(user_id):
             return await call.answer("❌ لم يتم العثور على الطلب", show_alert=True)
 
         # بناء البطاقة
@@ -1,8 +1,10 @@
 """Product browsing and purchasing handlers."""
 from aiogram import Router, types, F, Bot
 from aiogram.fsm.context import FSMContext
+import uuid
+
 import config
-import services.database as database
+import services.async_db as async_db
 import services.api_manager as api_manager
 import services.settings as settings
 import data.mappings as mappings
@@ -19,7 +21,7 @@ async def products(call: types.CallbackQuery, state: FSMContext):
     pid = parts[1]
     parent_key = parts[2] if len(parts) > 2 else ""
 
-    prods = api_manager.get_products_by_cat_id(pid)
+    prods = await api_manager.get_products_by_cat_id(pid)
     if not prods:
         return await call.answer("لا يوجد منتجات", show_alert=True)
 
@@ -50,7 +52,9 @@ async def init_buy(call: types.CallbackQuery, state: FSMContext):
     back_target = data.get('back_path', 'home')
 
     await state.update_data(real_user_id=call.from_user.id)
-    await state.update_data(prod=prod, collected=[], idx=0, qty=1, params=prod.get('params', []))
+    # purchase_ref: مفتاح الخصم، يمنع خصم نفس الطلب مرتين عند تكرار الإرسال
+    await state.update_data(prod=prod, collected=[], idx=0, qty=1, params=prod.get('params', []),
+                            purchase_ref=uuid.uuid4().hex)
 
     # Check if PUBG order for currency display consistency
     category_name = prod.get('category_name', '')
@@ -210,7 +214,19 @@ async def finalize_order(msg: types.Message, state: FSMContext, bot: Bot):
     rate = settings.get_setting("exchange_rate")
     total_syp = int(total * rate)
 
-    if not database.deduct_balance(uid, total):
+    purchase_ref = d.get('purchase_ref') or uuid.uuid4().hex
+    status, new_bal = await async_db.debit_balance(uid, total, kind="purchase", ref=f"purchase:{purchase_ref}")
+    if status == "duplicate":
+        # نفس الطلب قيد التنفيذ من رسالة سابقة (لم يُخصم شيء هذه المرة)
+        await msg.answer(
+            "⏳ <b>طلبك قيد المعالجة بالفعل.</b>\n"
+            "يمكنك متابعة حالته من قسم <b>📦 طلباتي</b>.",
+            reply_markup=kb.main_menu(),
+            parse_mode="HTML"
+        )
+        await state.clear()
+        return
+    if status != "ok":
         await msg.answer(
             f"{config.MSG_NO_BALANCE}\n💰 التكلفة: {format_price(total)}",
             reply_markup=kb.main_menu(),
@@ -219,7 +235,6 @@ async def finalize_order(msg: types.Message, state: FSMContext, bot: Bot):
         await state.clear()
         return
 
-    new_bal = database.get_balance(uid)
     new_bal_syp = int(new_bal * rate)
 
     await msg.answer("⏳ جاري إرسال الطلب للمزود...")
@@ -250,7 +265,6 @@ async def finalize_order(msg: types.Message, state: FSMContext, bot: Bot):
         await msg.answer(txt, parse_mode="HTML")
 
         # 🔥🔥 3. إرسال إشعار للأدمن (هذا الجزء كان مفقوداً) 🔥🔥
-        from services.database import get_all_admin_ids
         admin_msg = (
             f"🚀 <b>طلب جديد (عبر API)</b>\n"
             f"👤 المستخدم: <code>{uid}</code>\n"
@@ -260,7 +274,7 @@ async def finalize_order(msg: types.Message, state: FSMContext, bot: Bot):
             f"🆔 رقم الطلب: <code>{res}</code>\n"
             f"✅ الحالة: تم الإرسال للموقع بنجاح"
         )
-        for aid in get_all_admin_ids():
+        for aid in await async_db.get_all_admin_ids():
             try:
                 await bot.send_message(aid, admin_msg, parse_mode="HTML")
             except:
@@ -268,7 +282,7 @@ async def finalize_order(msg: types.Message, state: FSMContext, bot: Bot):
 
     elif code == 100:
         # حالة الرصيد غير كافٍ في الموقع -> تحويل لطلب معلق
-        lid = database.save_pending_order(uid, prod, qty, d['collected'], d['params'])
+        lid = await async_db.save_pending_order(uid, prod, qty, d['collected'], d['params'])
         txt = (
             f"⏳ <b>الطلب قيد المعالجة (Processing)</b>\n"
             f"━━━━━━━━━━━━\n"
@@ -287,15 +301,25 @@ async def finalize_order(msg: types.Message, state: FSMContext, bot: Bot):
         await msg.answer(txt, parse_mode="HTML")
 
         # إشعار للأدمن بالطلب المعلق
-        from services.database import get_all_admin_ids
-        for aid in get_all_admin_ids():
+        for aid in await async_db.get_all_admin_ids():
             try:
                 await bot.send_message(aid, f"🚨 <b>طلب معلق جديد (يحتاج شحن الموقع)</b>\nمن: {uid}\nرقم: {lid}", parse_mode="HTML")
             except:
                 pass
+    elif code == api_manager.ORDER_OUTCOME_UNKNOWN:
+        # لم يرد المزود: قد يكون الطلب نُفّذ، فيبقى الرصيد مخصوماً حتى يحسمه فحص الطلبات
+        await msg.answer(
+            f"⏳ <b>تم إرسال طلبك وبانتظار تأكيد المزود.</b>\n"
+            f"━━━━━━━━━━━━\n"
+            f"🔢 رقم المتابعة: <code>{uuid}</code>\n"
+            f"💰 المبلغ المخصوم: {total:.2f} $ ({total_syp:,} ل.س)\n"
+            f"━━━━━━━━━━━━\n"
+            f"سيتم إشعارك عند اكتمال الطلب، ويُسترجع المبلغ تلقائياً إن رُفض.",
+            parse_mode="HTML"
+        )
     else:
         # فشل (خطأ آخر) -> استرجاع الرصيد
-        database.add_balance(uid, total)
+        await async_db.add_balance(uid, total, kind="refund", ref=f"refund:purchase:{purchase_ref}")
         await msg.answer(f"❌ فشل تنفيذ الطلب: {res}\n✅ تم استرجاع الرصيد لمحفظتك.", parse_mode="HTML")
 
     await state.clear()
@@ -4,6 +4,7 @@ from aiogram import Bot, Dispatcher
 import config
 from bot.middlewares.maintenance import MaintenanceMiddleware
 from bot.middlewares.subscription import StrictSubscriptionMiddleware
+from bot.middlewares.registration import UserProvisioningMiddleware
 
 # Import routers from new structure
 from handlers.common import router as common_router
@@ -12,11 +13,16 @@ from handlers.admin import router as admin_router
 
 # Import report scheduler
 from reports.scheduler import setup_scheduler, shutdown_scheduler
-from services.background_tasks import check_pending_orders_task, auto_refresh_products_task
+from services.background_tasks import check_pending_orders_task, auto_refresh_products_task, reconcile_balances_task
 
 # Import Database Init
 from services.database import init_db
 from services.settings import init_settings_table
+from services import db_pool
+import services.async_db as async_db
+import services.api_manager as api_manager
+import services.broadcast as broadcast
+from services.provider_client import close_client
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -27,6 +33,8 @@ async def main():
     print("📂 Initializing SQLite Database...")
     init_db()
     init_settings_table()
+    # ⚡ الكتالوج من آخر لقطة؛ مهمة التحديث التلقائي تتحقق منه في الخلفية
+    api_manager.warm_start()
 
     # 1. Initialize bot
     bot = Bot(token=config.BOT_TOKEN)
@@ -37,6 +45,10 @@ async def main():
     dp.include_router(shop_router)
     dp.include_router(admin_router)
 
+    # Create users on first contact (reads no longer provision the row)
+    dp.message.middleware(UserProvisioningMiddleware())
+    dp.callback_query.middleware(UserProvisioningMiddleware())
+
     # Apply Maintenance middleware
     dp.message.middleware(MaintenanceMiddleware())
     dp.callback_query.middleware(MaintenanceMiddleware())
@@ -44,14 +56,18 @@ async def main():
     # Apply subscription middleware
     dp.message.middleware(StrictSubscriptionMiddleware())
     dp.callback_query.middleware(StrictSubscriptionMiddleware())
-    asyncio.create_task(check_pending_orders_task(bot))
-    print("🚀 Bot started with background tasks...")
     # ✅ تشغيل خدمة مراقبة الطلبات
     asyncio.create_task(check_pending_orders_task(bot))
 
     # ✅ تشغيل خدمة تحديث المنتجات التلقائي (الجديدة)
     asyncio.create_task(auto_refresh_products_task())
 
+    # ✅ مطابقة الأرصدة مع سجل الحركات
+    asyncio.create_task(reconcile_balances_task(bot))
+
+    # ✅ استكمال حملات البث التي توقفت بسبب إعادة التشغيل
+    await broadcast.resume_broadcasts(bot)
+
     print("🚀 Bot started with background tasks...")
     # 3. Setup report scheduler
     setup_scheduler(bot)
@@ -65,6 +81,9 @@ async def main():
         await dp.start_polling(bot)
     finally:
         shutdown_scheduler()
+        await close_client()
+        async_db.shutdown()
+        db_pool.close_all()
 
 
 if __name__ == "__main__":
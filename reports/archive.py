@@ -0,0 +1,141 @@
+"""Index of generated report PDFs (table report_archive) and its retention.
+
+Every report gets a row keyed by (report_type, period) with its path, size,
+sha256 and, after the first send, the Telegram file_id. Admin menus page
+through the table instead of listing the reports/ directories, and sending a
+report again reuses the file_id rather than uploading the PDF once more.
+
+Retention: local PDFs older than RETENTION_DAYS are deleted. A report that
+Telegram already has (file_id) stays listed and downloadable; one that was
+never sent leaves the archive with its file.
+"""
+import asyncio
+import hashlib
+import os
+import re
+from datetime import datetime, timedelta
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile
+
+import services.async_db as async_db
+import services.database as database
+
+REPORTS_BASE_DIR = "reports"
+REPORT_TYPES = ("daily", "weekly", "monthly")
+
+# Days a local PDF is kept; None keeps it for good.
+RETENTION_DAYS = {"daily": 90, "weekly": 2 * 365, "monthly": None}
+
+# daily_sales_YYYY_MM_DD.pdf, weekly_sales_YYYY_WW.pdf, monthly_sales_YYYY_MM.pdf
+_FILENAME = re.compile(r"^(daily|weekly|monthly)_sales_(\d{4}_\d{2}(?:_\d{2})?)\.pdf$")
+
+
+def report_dir(report_type):
+    return os.path.join(REPORTS_BASE_DIR, report_type)
+
+
+def parse_filename(filename):
+    """(report_type, period) for a report file name, or None."""
+    match = _FILENAME.match(filename)
+    return (match.group(1), match.group(2)) if match else None
+
+
+def period_label(report_type, period):
+    if report_type == "weekly":
+        return f"Week {period}"
+    return period.replace("_", "-")
+
+
+def _file_info(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return os.path.getsize(file_path), digest.hexdigest()
+
+
+async def record_report(report_type, period, file_path):
+    """Index a freshly generated report."""
+    size, checksum = await asyncio.to_thread(_file_info, file_path)
+    await async_db.save_report_archive(report_type, period, file_path, size, checksum)
+
+
+def index_existing_reports():
+    """Add PDFs already on disk that have no archive row yet (reports from
+    before the index existed). Runs once at start-up; returns the count."""
+    added = 0
+    for report_type in REPORT_TYPES:
+        directory = report_dir(report_type)
+        if not os.path.isdir(directory):
+            continue
+        known = database.get_report_archive_periods(report_type)
+        for filename in os.listdir(directory):
+            parsed = parse_filename(filename)
+            if parsed is None or parsed[0] != report_type or parsed[1] in known:
+                continue
+            file_path = os.path.join(directory, filename)
+            try:
+                size, checksum = _file_info(file_path)
+            except OSError:
+                continue
+            database.save_report_archive(report_type, parsed[1], file_path, size, checksum)
+            added += 1
+    return added
+
+
+def _cutoff_period(report_type, day):
+    if report_type == "daily":
+        return day.strftime("%Y_%m_%d")
+    if report_type == "weekly":
+        return f"{day.year}_{day.isocalendar()[1]:02d}"
+    return day.strftime("%Y_%m")
+
+
+async def apply_retention(now=None):
+    """Delete local PDFs past RETENTION_DAYS; returns (released, removed) row counts."""
+    now = now or datetime.now()
+    released = removed = 0
+    for report_type, days in RETENTION_DAYS.items():
+        if days is None:
+            continue
+        cutoff = _cutoff_period(report_type, now - timedelta(days=days))
+        entries = await async_db.get_report_archive_before(report_type, cutoff)
+        if not entries:
+            continue
+        r, d = await async_db.release_report_files([(report_type, e['period']) for e in entries])
+        released += r
+        removed += d
+        for entry in entries:
+            try:
+                os.remove(entry['file_path'])
+            except OSError:
+                pass
+    return released, removed
+
+
+async def send_report(send, report_type, period, entry=None):
+    """Send an archived report with ``await send(document)``.
+
+    Uses the stored file_id when there is one; otherwise uploads the PDF and
+    stores the file_id Telegram returns. Returns the sent message, or None
+    when neither a valid file_id nor the local file is available.
+    """
+    if entry is None:
+        entry = await async_db.get_report_archive_entry(report_type, period)
+    if entry is None:
+        return None
+    if entry.get('file_id'):
+        try:
+            return await send(entry['file_id'])
+        except TelegramBadRequest:
+            pass   # file_id no longer accepted: upload the file again
+    file_path = entry.get('file_path')
+    if not file_path or not os.path.exists(file_path):
+        return None
+    message = await send(FSInputFile(file_path))
+    document = getattr(message, "document", None)
+    if document is not None:
+        await async_db.set_report_file_id(report_type, period, document.file_id)
+        entry['file_id'] = document.file_id
+    return message
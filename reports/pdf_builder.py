@@ -11,9 +11,16 @@ import os
 from datetime import datetime
 
 
+_fonts_ready = False
+
+
 # Try to use Arabic font if available, otherwise fallback to default
 def setup_fonts():
-    """Setup fonts for Arabic text support."""
+    """Setup fonts for Arabic text support (once per process)."""
+    global _fonts_ready
+    if _fonts_ready:
+        return
+    _fonts_ready = True
     try:
         # Try common Arabic fonts
         arabic_fonts = [
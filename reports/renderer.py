@@ -0,0 +1,201 @@
+"""Renders report PDFs in worker processes, off the bot's event loop.
+
+reportlab is synchronous and CPU-bound: called from a scheduler job it froze
+every handler until the PDF was written. Render jobs now go through a queue
+served by RENDER_WORKERS tasks, each handing the work to a process pool whose
+workers set fonts up once at start. A job gets RENDER_TIMEOUT seconds; after
+that the pool is replaced by a new one and the caller gets a RenderError.
+
+Finished files are cached by (report type, date range, hash of the report
+data): asking again for an unchanged report returns the existing file, and
+identical requests in flight share one render.
+
+The queue and the pool are created lazily inside the running event loop;
+call ``shutdown_renderer()`` on shutdown.
+"""
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .pdf_builder import build_sales_report_pdf, setup_fonts
+
+RENDER_WORKERS = 2
+RENDER_TIMEOUT = 120        # seconds per report
+MAX_CACHED = 256
+
+
+class RenderError(Exception):
+    """A report failed to render or timed out."""
+
+
+def _init_worker():
+    setup_fonts()
+
+
+def _render(file_path, report_data):
+    # Written next to the target and renamed, so a killed render never
+    # leaves a truncated PDF behind.
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    try:
+        build_sales_report_pdf(tmp_path, report_data)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return file_path
+
+
+def _remove_partial(file_path):
+    for tmp_path in glob.glob(f"{glob.escape(file_path)}.*.tmp"):
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def report_key(report_type, date_range, report_data):
+    digest = hashlib.sha256(json.dumps(report_data, sort_keys=True, default=str).encode()).hexdigest()
+    return report_type, date_range, digest
+
+
+class ReportRenderer:
+    def __init__(self, workers=RENDER_WORKERS, timeout=RENDER_TIMEOUT, max_cached=MAX_CACHED):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_cached = max_cached
+        self._pool = None
+        self._queue = None
+        self._tasks = []
+        self._cache = {}        # report_key -> file path
+        self._inflight = {}     # report_key -> Future shared by identical requests
+        self.metrics = {
+            "rendered": 0,
+            "cached": 0,
+            "shared": 0,
+            "timeouts": 0,
+            "errors": 0,
+            "last_render_seconds": 0.0,
+        }
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        return self._pool
+
+    def _reset_pool(self):
+        """Replace the pool; the next job starts a new one.
+
+        Queued work is cancelled. A render that is already running cannot be
+        stopped before Python 3.14 (terminate_workers): its process finishes
+        on its own, and its temp file is removed by _render either way.
+        """
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        terminate = getattr(pool, "terminate_workers", None)
+        if terminate is not None:
+            terminate()
+        else:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def render(self, report_type, date_range, file_path, report_data):
+        """Render ``report_data`` to ``file_path`` (or reuse the cached file); returns the path."""
+        key = report_key(report_type, date_range, report_data)
+        cached = self._cache.get(key)
+        if cached is not None and os.path.exists(cached):
+            self.metrics["cached"] += 1
+            return cached
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.metrics["shared"] += 1
+            return await asyncio.shield(future)
+
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self._queue.put_nowait((key, file_path, report_data, future))
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            key, file_path, report_data, future = await self._queue.get()
+            started = time.perf_counter()
+            try:
+                path = await asyncio.wait_for(
+                    loop.run_in_executor(self._get_pool(), _render, file_path, report_data), self.timeout
+                )
+            except asyncio.TimeoutError:
+                self.metrics["timeouts"] += 1
+                self._reset_pool()
+                _remove_partial(file_path)
+                self._fail(future, RenderError(f"{key[0]} {key[1]}: no result after {self.timeout}s"))
+            except BrokenProcessPool as e:
+                self.metrics["errors"] += 1
+                self._reset_pool()
+                self._fail(future, RenderError(f"{key[0]} {key[1]}: worker died ({e})"))
+            except Exception as e:
+                self.metrics["errors"] += 1
+                self._fail(future, RenderError(f"{key[0]} {key[1]}: {e!r}"))
+            else:
+                self.metrics["rendered"] += 1
+                self._store(key, path)
+                if not future.done():
+                    future.set_result(path)
+            finally:
+                self.metrics["last_render_seconds"] = time.perf_counter() - started
+                self._queue.task_done()
+
+    @staticmethod
+    def _fail(future, error):
+        if not future.done():
+            future.set_exception(error)
+            future.exception()   # mark retrieved when nobody is waiting anymore
+
+    def _store(self, key, path):
+        if len(self._cache) >= self.max_cached:
+            self._cache.pop(next(iter(self._cache)))
+        self._cache[key] = path
+
+    def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks, self._queue = [], None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_renderer = None
+
+
+def get_renderer():
+    global _renderer
+    if _renderer is None:
+        _renderer = ReportRenderer()
+    return _renderer
+
+
+async def render_report(report_type, date_range, file_path, report_data):
+    return await get_renderer().render(report_type, date_range, file_path, report_data)
+
+
+def shutdown_renderer():
+    global _renderer
+    if _renderer is not None:
+        _renderer.shutdown()
+        _renderer = None
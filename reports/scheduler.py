@@ -5,9 +5,13 @@ from datetime import datetime, timedelta
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from aiogram import Bot
+from aiogram.types import FSInputFile
 import config
+import services.async_db as async_db
 import services.database as database
+from .archive import apply_retention, index_existing_reports, parse_filename, send_report
 from .service import generate_daily_report, generate_weekly_report, generate_monthly_report
+from .renderer import shutdown_renderer
 
 logger = logging.getLogger(__name__)
 
@@ -15,10 +19,8 @@ scheduler = AsyncIOScheduler()
 
 
 async def send_report_to_admins(bot: Bot, file_path: str, report_type: str, date_range: str, total_usd: float, total_syp: int):
-    """Send generated report to all admins."""
+    """Send generated report to all admins (uploaded once, then sent by file_id)."""
     try:
-        from aiogram.types import FSInputFile
-        
         caption = (
             f"📊 <b>{report_type} Report</b>\n"
             f"━━━━━━━━━━━━\n"
@@ -27,19 +29,30 @@ async def send_report_to_admins(bot: Bot, file_path: str, report_type: str, date
             f"🇺🇸 {total_usd:.2f} $\n"
             f"🇸🇾 {total_syp:,} ل.س"
         )
-        
-        document = FSInputFile(file_path)
-        
+        archive_key = parse_filename(os.path.basename(file_path))
+        entry = {}
+        if archive_key:
+            entry = await async_db.get_report_archive_entry(*archive_key) or {'file_path': file_path}
+        # تحقق مرة واحدة قبل الحلقة: بدون file_id ولا ملف محلي لا يمكن الإرسال لأي أدمن
+        if not entry.get('file_id') and not os.path.exists(file_path):
+            logger.error(f"Report file missing: {file_path}")
+            return
+
         # إرسال إلى كل الأدمن (السوبر + الأدمن من قاعدة البيانات)
         admin_ids = database.get_all_admin_ids()
         for admin_id in admin_ids:
+            async def send(document, admin_id=admin_id):
+                return await bot.send_document(chat_id=admin_id, document=document,
+                                               caption=caption, parse_mode="HTML")
             try:
-                await bot.send_document(
-                    chat_id=admin_id,
-                    document=document,
-                    caption=caption,
-                    parse_mode="HTML"
-                )
+                if archive_key:
+                    sent = await send_report(send, *archive_key, entry=entry)
+                else:
+                    sent = await send(FSInputFile(file_path))
+                if sent is None:
+                    # file_id رُفض والملف حُذف أثناء الإرسال: نفس النتيجة لبقية الأدمن
+                    logger.error(f"Report file missing: {file_path} (not sent to the remaining admins)")
+                    break
                 logger.info(f"Report sent to admin {admin_id}")
             except Exception as e:
                 logger.error(f"Failed to send report to admin {admin_id}: {e}")
@@ -51,21 +64,20 @@ async def daily_report_job(bot: Bot):
     """Job to generate and send daily report."""
     logger.info("Starting daily report generation...")
     try:
-        file_path = generate_daily_report()
+        file_path = await generate_daily_report()
         if file_path:
             # Extract date from filename
             filename = file_path.split(os.sep)[-1]
             date_str = filename.replace("daily_sales_", "").replace(".pdf", "")
             
             # Get report totals for caption
-            from reports.service import calculate_order_totals
-            from services.database import get_orders_by_date_range
+            from reports.service import summarize_sales
             
             target_date = datetime.strptime(date_str, "%Y_%m_%d")
             start_date = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
             end_date = target_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-            orders = get_orders_by_date_range(start_date, end_date)
-            total_usd, total_syp, _ = calculate_order_totals(orders)
+            summary = await summarize_sales(start_date, end_date)
+            total_usd, total_syp = summary['total_usd'], summary['total_syp']
             
             await send_report_to_admins(
                 bot, file_path, "Daily", date_str.replace("_", "-"),
@@ -81,15 +93,14 @@ async def weekly_report_job(bot: Bot):
     """Job to generate and send weekly report."""
     logger.info("Starting weekly report generation...")
     try:
-        file_path = generate_weekly_report()
+        file_path = await generate_weekly_report()
         if file_path:
             # Extract week info from filename
             filename = file_path.split(os.sep)[-1]
             week_str = filename.replace("weekly_sales_", "").replace(".pdf", "")
             
             # Get report totals for caption
-            from reports.service import calculate_order_totals
-            from services.database import get_orders_by_date_range
+            from reports.service import summarize_sales
             
             year, week = week_str.split("_")
             # Calculate week start (Monday of that week)
@@ -103,8 +114,8 @@ async def weekly_report_job(bot: Bot):
             # Calculate target Monday
             target_date = monday_of_week1 + timedelta(weeks=week_int - 1)
             week_end = target_date + timedelta(days=6, hours=23, minutes=59, seconds=59)
-            orders = get_orders_by_date_range(target_date, week_end)
-            total_usd, total_syp, _ = calculate_order_totals(orders)
+            summary = await summarize_sales(target_date, week_end)
+            total_usd, total_syp = summary['total_usd'], summary['total_syp']
             
             date_range = f"{target_date.strftime('%Y-%m-%d')} to {week_end.strftime('%Y-%m-%d')}"
             await send_report_to_admins(
@@ -121,15 +132,14 @@ async def monthly_report_job(bot: Bot):
     """Job to generate and send monthly report."""
     logger.info("Starting monthly report generation...")
     try:
-        file_path = generate_monthly_report()
+        file_path = await generate_monthly_report()
         if file_path:
             # Extract month info from filename
             filename = file_path.split(os.sep)[-1]
             month_str = filename.replace("monthly_sales_", "").replace(".pdf", "")
             
             # Get report totals for caption
-            from reports.service import calculate_order_totals
-            from services.database import get_orders_by_date_range
+            from reports.service import summarize_sales
             
             year, month = month_str.split("_")
             month_start = datetime(int(year), int(month), 1)
@@ -138,8 +148,8 @@ async def monthly_report_job(bot: Bot):
             else:
                 month_end = month_start.replace(month=month_start.month + 1, day=1) - timedelta(days=1)
             month_end = month_end.replace(hour=23, minute=59, second=59, microsecond=999999)
-            orders = get_orders_by_date_range(month_start, month_end)
-            total_usd, total_syp, _ = calculate_order_totals(orders)
+            summary = await summarize_sales(month_start, month_end)
+            total_usd, total_syp = summary['total_usd'], summary['total_syp']
             
             date_range = f"{month_start.strftime('%Y-%m-%d')} to {month_end.strftime('%Y-%m-%d')}"
             await send_report_to_admins(
@@ -152,8 +162,22 @@ async def monthly_report_job(bot: Bot):
         logger.error(f"Error in monthly report job: {e}")
 
 
+async def archive_retention_job():
+    """Job to drop local report PDFs past their retention."""
+    try:
+        released, removed = await apply_retention()
+        if released or removed:
+            logger.info(f"Report retention: {released} kept as Telegram copies, {removed} removed")
+    except Exception as e:
+        logger.error(f"Error in report retention job: {e}")
+
+
 def setup_scheduler(bot: Bot):
     """Setup and start the scheduler."""
+    added = index_existing_reports()
+    if added:
+        logger.info(f"Report archive: indexed {added} existing PDF(s)")
+
     # Daily report at 00:00
     scheduler.add_job(
         daily_report_job,
@@ -181,11 +205,20 @@ def setup_scheduler(bot: Bot):
         replace_existing=True
     )
     
+    # Report retention every day at 00:30
+    scheduler.add_job(
+        archive_retention_job,
+        trigger=CronTrigger(hour=0, minute=30),
+        id='report_retention',
+        replace_existing=True
+    )
+    
     scheduler.start()
     logger.info("Report scheduler started")
 
 
 def shutdown_scheduler():
-    """Shutdown the scheduler."""
+    """Shutdown the scheduler and the report render pool."""
     scheduler.shutdown()
+    shutdown_renderer()
     logger.info("Report scheduler stopped")
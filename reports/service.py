@@ -2,9 +2,10 @@
 import os
 from datetime import datetime, timedelta
 import logging
-import services.database as database
+import services.async_db as async_db
 import services.settings as settings
-from .pdf_builder import build_sales_report_pdf
+from .archive import record_report
+from .renderer import render_report
 
 logger = logging.getLogger(__name__)
 
@@ -21,27 +22,18 @@ def ensure_directories():
         os.makedirs(directory, exist_ok=True)
 
 
-def calculate_order_totals(orders):
-    """Calculate total sales from orders."""
-    total_usd = 0.0
-    category_breakdown = {}
-    
-    for order in orders:
-        price = float(order.get('product', {}).get('price', 0))
-        qty = int(order.get('qty', 1))
-        total_usd += price * qty
-        
-        # Category breakdown
-        category = order.get('product', {}).get('category_name', 'Unknown')
-        category_breakdown[category] = category_breakdown.get(category, 0) + 1
-    
-    rate = settings.get_setting("exchange_rate")
-    total_syp = int(total_usd * rate)
-    
-    return total_usd, total_syp, category_breakdown
+async def summarize_sales(start_date, end_date):
+    """Report totals for whole days from start_date to end_date.
+
+    Aggregated in SQL over local and API orders (database.get_sales_summary);
+    adds total_syp at the current exchange rate.
+    """
+    summary = await async_db.get_sales_summary(start_date, end_date)
+    summary['total_syp'] = int(summary['total_usd'] * settings.get_setting("exchange_rate"))
+    return summary
 
 
-def generate_daily_report(target_date=None):
+async def generate_daily_report(target_date=None):
     """
     Generate daily report for a specific date.
     If target_date is None, uses yesterday.
@@ -57,38 +49,36 @@ def generate_daily_report(target_date=None):
     
     # Check if report already exists
     date_str = start_date.strftime("%Y_%m_%d")
-    last_report = database.get_last_report_date("daily")
+    last_report = await async_db.get_last_report_date("daily")
     if last_report == date_str:
         logger.info(f"Daily report for {date_str} already generated, skipping.")
         return None
     
-    # Get orders for the day
-    orders = database.get_orders_by_date_range(start_date, end_date)
+    # Totals from the daily rollups
+    summary = await summarize_sales(start_date, end_date)
     
-    if not orders:
+    if not summary['total_orders']:
         logger.info(f"No completed orders found for {date_str}, skipping report generation.")
         return None
     
-    # Calculate totals
-    total_usd, total_syp, category_breakdown = calculate_order_totals(orders)
-    
     # Prepare report data
     report_data = {
         'title': 'Daily Sales Report',
         'date_range': start_date.strftime("%Y-%m-%d"),
-        'total_orders': len(orders),
-        'total_sales_usd': total_usd,
-        'total_sales_syp': total_syp,
-        'category_breakdown': category_breakdown if category_breakdown else None
+        'total_orders': summary['total_orders'],
+        'total_sales_usd': summary['total_usd'],
+        'total_sales_syp': summary['total_syp'],
+        'category_breakdown': summary['category_breakdown'] or None
     }
     
-    # Generate PDF
+    # Generate PDF (worker process)
     filename = f"daily_sales_{date_str}.pdf"
     file_path = os.path.join(DAILY_DIR, filename)
     
     try:
-        build_sales_report_pdf(file_path, report_data)
-        database.update_last_report_date("daily", date_str)
+        await render_report("daily", report_data['date_range'], file_path, report_data)
+        await async_db.update_last_report_date("daily", date_str)
+        await record_report("daily", date_str, file_path)
         logger.info(f"Daily report generated: {file_path}")
         return file_path
     except Exception as e:
@@ -96,7 +86,7 @@ def generate_daily_report(target_date=None):
         return None
 
 
-def generate_weekly_report(target_week_start=None):
+async def generate_weekly_report(target_week_start=None):
     """
     Generate weekly report for a specific week.
     If target_week_start is None, uses last week (Monday to Sunday).
@@ -119,39 +109,37 @@ def generate_weekly_report(target_week_start=None):
     year = target_week_start.year
     week_num = target_week_start.isocalendar()[1]
     date_str = f"{year}_{week_num:02d}"
-    last_report = database.get_last_report_date("weekly")
+    last_report = await async_db.get_last_report_date("weekly")
     if last_report == date_str:
         logger.info(f"Weekly report for {date_str} already generated, skipping.")
         return None
     
-    # Get orders for the week
-    orders = database.get_orders_by_date_range(target_week_start, week_end)
+    # Totals from the daily rollups
+    summary = await summarize_sales(target_week_start, week_end)
     
-    if not orders:
+    if not summary['total_orders']:
         logger.info(f"No completed orders found for week {date_str}, skipping report generation.")
         return None
     
-    # Calculate totals
-    total_usd, total_syp, category_breakdown = calculate_order_totals(orders)
-    
     # Prepare report data
     date_range_str = f"{target_week_start.strftime('%Y-%m-%d')} to {week_end.strftime('%Y-%m-%d')}"
     report_data = {
         'title': 'Weekly Sales Report',
         'date_range': date_range_str,
-        'total_orders': len(orders),
-        'total_sales_usd': total_usd,
-        'total_sales_syp': total_syp,
-        'category_breakdown': category_breakdown if category_breakdown else None
+        'total_orders': summary['total_orders'],
+        'total_sales_usd': summary['total_usd'],
+        'total_sales_syp': summary['total_syp'],
+        'category_breakdown': summary['category_breakdown'] or None
     }
     
-    # Generate PDF
+    # Generate PDF (worker process)
     filename = f"weekly_sales_{date_str}.pdf"
     file_path = os.path.join(WEEKLY_DIR, filename)
     
     try:
-        build_sales_report_pdf(file_path, report_data)
-        database.update_last_report_date("weekly", date_str)
+        await render_report("weekly", report_data['date_range'], file_path, report_data)
+        await async_db.update_last_report_date("weekly", date_str)
+        await record_report("weekly", date_str, file_path)
         logger.info(f"Weekly report generated: {file_path}")
         return file_path
     except Exception as e:
@@ -159,7 +147,7 @@ def generate_weekly_report(target_week_start=None):
         return None
 
 
-def generate_monthly_report(target_month=None):
+async def generate_monthly_report(target_month=None):
     """
     Generate monthly report for a specific month.
     If target_month is None, uses last month.
@@ -187,39 +175,37 @@ def generate_monthly_report(target_month=None):
     
     # Check if report already exists
     date_str = month_start.strftime("%Y_%m")
-    last_report = database.get_last_report_date("monthly")
+    last_report = await async_db.get_last_report_date("monthly")
     if last_report == date_str:
         logger.info(f"Monthly report for {date_str} already generated, skipping.")
         return None
     
-    # Get orders for the month
-    orders = database.get_orders_by_date_range(month_start, month_end)
+    # Totals from the daily rollups
+    summary = await summarize_sales(month_start, month_end)
     
-    if not orders:
+    if not summary['total_orders']:
         logger.info(f"No completed orders found for month {date_str}, skipping report generation.")
         return None
     
-    # Calculate totals
-    total_usd, total_syp, category_breakdown = calculate_order_totals(orders)
-    
     # Prepare report data
     date_range_str = f"{month_start.strftime('%Y-%m-%d')} to {month_end.strftime('%Y-%m-%d')}"
     report_data = {
         'title': 'Monthly Sales Report',
         'date_range': date_range_str,
-        'total_orders': len(orders),
-        'total_sales_usd': total_usd,
-        'total_sales_syp': total_syp,
-        'category_breakdown': category_breakdown if category_breakdown else None
+        'total_orders': summary['total_orders'],
+        'total_sales_usd': summary['total_usd'],
+        'total_sales_syp': summary['total_syp'],
+        'category_breakdown': summary['category_breakdown'] or None
     }
     
-    # Generate PDF
+    # Generate PDF (worker process)
     filename = f"monthly_sales_{date_str}.pdf"
     file_path = os.path.join(MONTHLY_DIR, filename)
     
     try:
-        build_sales_report_pdf(file_path, report_data)
-        database.update_last_report_date("monthly", date_str)
+        await render_report("monthly", report_data['date_range'], file_path, report_data)
+        await async_db.update_last_report_date("monthly", date_str)
+        await record_report("monthly", date_str, file_path)
         logger.info(f"Monthly report generated: {file_path}")
         return file_path
     except Exception as e:
@@ -1,76 +1,189 @@
-import requests
 import config
 import uuid
 import asyncio
-import zlib
+import hashlib
 import json
 import os
+import time
 import services.settings as settings
 import services.database as database  # 🔄 استيراد قاعدة البيانات
-import data.mappings as mappings
-
-_products_cache = []
-_category_id_map = {}
-
-
-def clean_str(text):
-    if not text: return ""
-    return str(text).strip()
-
-
-def generate_stable_id(text):
-    if not text: return "0"
-    return str(zlib.crc32(clean_str(text).encode('utf-8')))
-
-
-def refresh_data():
-    global _products_cache, _category_id_map
-    url = f"{config.API_BASE_URL}/products"
-    headers = {"api-token": config.API_TOKEN}
+import services.async_db as async_db
+import services.catalog_snapshot as catalog_snapshot
+from services.catalog import ProductCatalog, clean_str, generate_stable_id, product_hash
+from services.category_classifier import get_classifier
+from services.provider_client import ProviderError, get_client
+
+# الكتالوج الحالي (يُستبدل بالكامل عند كل تحديث)
+_catalog = ProductCatalog()
+
+
+def get_catalog():
+    return _catalog
+
+
+# --- حالة آخر تحديث (للتحديث الشرطي والتزايدي) ---
+_feed_validators = {}      # ETag / Last-Modified من آخر استجابة 200
+_feed_hash = None          # بصمة جسم آخر استجابة
+_raw_products = {}         # id -> (hash, المنتج كما أرسله المزود قبل التسعير)
+_priced_margins = None     # النسب التي سُعّر بها الكتالوج الحالي
+_db_synced = False         # جدول products مطابق لـ _raw_products (وإلا مزامنة كاملة)
+_last_refresh_stats = {}
+_refresh_lock = asyncio.Lock()
+_revalidate_task = None
+_last_revalidate = 0.0
+REVALIDATE_INTERVAL = 60   # ثوانٍ بين تحديثين يطلبهما معرّف فئة غير معروف
+
+
+def get_last_refresh_stats():
+    return dict(_last_refresh_stats)
+
+
+def _price_product(p, classifier):
+    """Priced copy of a raw feed product (the raw dict is kept for the next diff)."""
+    priced = dict(p)
+    # حساب السعر
+    raw_price = p.get('price', p.get('rate', 0))
+    original_rate = float(raw_price)
+
+    # 1. تحديد الفئة (مصنف مُجمّع مسبقاً، تمريرة واحدة لكل منتج)
+    category_key = classifier.classify(
+        clean_str(p.get('category_name', '')), clean_str(p.get('name', ''))
+    )
+
+    # 2. جلب النسبة والحساب
+    margin = settings.get_margin_for_category(category_key)
+    priced['price'] = original_rate * margin
+    return priced
+
+
+def _apply_feed(data, reprice_all):
+    """Diff the feed against the current catalog and price only new/changed products.
+
+    CPU only, runs off the event loop. Returns the new raw index, the products in
+    feed order, the rows to upsert, the ids to delete and the diff stats.
+    """
+    if isinstance(data, (bytes, str)):
+        data = json.loads(data)
+    if not isinstance(data, list):
+        return None
+
+    classifier = get_classifier()
+    new_raw = {}
+    ordered = []
+    upserts = []
+    added = changed = 0
+    for p in data:
+        pid = str(p.get('id'))
+        h = product_hash(p)
+        new_raw[pid] = (h, p)
+        old = _raw_products.get(pid)
+        current = None
+        if not reprice_all and old is not None and old[0] == h:
+            current = _catalog.get_product(pid)
+        if current is None:
+            current = _price_product(p, classifier)
+            upserts.append(current)
+            if old is None:
+                added += 1
+            elif old[0] != h:
+                changed += 1
+        ordered.append(current)
+
+    removed = [pid for pid in _raw_products if pid not in new_raw]
+    stats = {"added": added, "changed": changed, "removed": len(removed), "repriced": len(upserts)}
+    return new_raw, ordered, upserts, removed, stats
+
+
+async def refresh_data(force=False):
+    """Refresh the catalog from the provider.
+
+    Sends the last ETag / Last-Modified so an unchanged feed costs one 304, and
+    skips all processing when the body hash and the margins are unchanged.
+    Otherwise only new/changed products are re-priced and written to the DB.
+    ``force`` re-prices and re-syncs everything.
+    """
+    async with _refresh_lock:
+        return await _refresh(force)
+
+
+async def _refresh(force):
+    global _catalog, _feed_hash, _raw_products, _priced_margins, _last_refresh_stats, _db_synced
+    started = time.perf_counter()
+    margins = settings.get_setting("margins", {})
+    reprice_all = force or margins != _priced_margins
+
+    headers = {}
+    if _catalog and not force:
+        if _feed_validators.get("etag"):
+            headers["If-None-Match"] = _feed_validators["etag"]
+        if _feed_validators.get("last_modified"):
+            headers["If-Modified-Since"] = _feed_validators["last_modified"]
 
     print("🔄 جاري الاتصال بالمزود لجلب المنتجات...")
     try:
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            data = response.json()
-            if isinstance(data, list):
-                for p in data:
-                    # حساب السعر
-                    raw_price = p.get('price', p.get('rate', 0))
-                    original_rate = float(raw_price)
-
-                    name = clean_str(p.get('name', ''))
-                    cat_name = clean_str(p.get('category_name', '')).lower()
-
-                    # 1. تحديد الفئة
-                    category_key = "default"
-                    all_maps = {**mappings.GAMES_MAP, **mappings.APPS_MAP}
-                    search_text = (cat_name + " " + name.lower())
-
-                    for key, keywords in all_maps.items():
-                        if any(kw in search_text for kw in keywords):
-                            category_key = key
-                            break
-
-                    # 2. جلب النسبة والحساب
-                    margin = settings.get_margin_for_category(category_key)
-                    p['price'] = original_rate * margin
-
-                _products_cache = data
-                _category_id_map = {}
-                for p in data:
-                    cat_name = clean_str(p.get('category_name', ''))
-                    if cat_name:
-                        short_id = generate_stable_id(cat_name)
-                        _category_id_map[short_id] = cat_name
-
-                # 🔥🔥 التعديل الهام هنا: حفظ البيانات في الداتابيز 🔥🔥
-                try:
-                    database.sync_products_from_api(data)
-                except Exception as db_err:
-                    print(f"⚠️ خطأ في حفظ المنتجات للقاعدة: {db_err}")
-
-                return True
+        status, body, resp_headers = await get_client().get_products(headers=headers or None)
+        if status == 304 and _catalog:
+            body_hash = _feed_hash
+            data = [raw for _, raw in _raw_products.values()]
+        elif status == 200 and body:
+            body_hash = hashlib.blake2b(body, digest_size=16).hexdigest()
+            data = body
+        else:
+            print(f"⚠️ Products API returned HTTP {status}")
+            return False
+
+        if body_hash == _feed_hash and not reprice_all:
+            # لا تغيير: طلب واحد فقط بدون أي معالجة
+            _last_refresh_stats = {"status": "not_modified" if status == 304 else "unchanged",
+                                   "added": 0, "changed": 0, "removed": 0, "repriced": 0,
+                                   "seconds": time.perf_counter() - started}
+            print(f"✅ المنتجات بدون تغيير (HTTP {status}).")
+            return True
+
+        full_sync = force or not _db_synced
+        result = await asyncio.to_thread(_apply_feed, data, reprice_all)
+        if result is None:
+            return False
+        new_raw, ordered, upserts, removed, stats = result
+
+        if upserts or removed or list(new_raw) != list(_raw_products):
+            _catalog = await asyncio.to_thread(ProductCatalog, ordered)
+
+        # 🔥🔥 حفظ المنتجات المتغيرة فقط في الداتابيز 🔥🔥
+        # (أول تحديث بعد التشغيل، التحديث الإجباري أو بعد فشل سابق: مزامنة كاملة تحذف ما اختفى من المزود)
+        try:
+            if full_sync:
+                await async_db.sync_products_from_api(ordered, prune=True)
+            else:
+                if upserts:
+                    await async_db.sync_products_from_api(upserts)
+                if removed:
+                    await async_db.delete_products(removed)
+        except Exception as db_err:
+            print(f"⚠️ خطأ في حفظ المنتجات للقاعدة: {db_err}")
+            # لا 304 ولا "بدون تغيير" في المرة القادمة: إعادة المعالجة والمزامنة الكاملة
+            _db_synced = False
+            _feed_hash = None
+            _feed_validators.clear()
+            stats["status"] = "db_error"
+        else:
+            # حالة التحديث التزايدي تُحدَّث فقط بعد نجاح الكتابة في القاعدة
+            _raw_products = new_raw
+            _feed_hash = body_hash
+            _priced_margins = margins   # read-only view from the settings cache
+            _db_synced = True
+            if status == 200:
+                _feed_validators["etag"] = resp_headers.get("ETag")
+                _feed_validators["last_modified"] = resp_headers.get("Last-Modified")
+            stats["status"] = "updated"
+            # 💾 لقطة للتشغيل السريع (فقط بعد نجاح المزامنة، لتبقى مطابقة للقاعدة)
+            await _save_snapshot()
+
+        stats["seconds"] = time.perf_counter() - started
+        _last_refresh_stats = stats
+        print(f"📦 Catalog refresh ({stats['status']}): +{stats['added']} ~{stats['changed']} -{stats['removed']}, "
+              f"repriced {stats['repriced']} in {stats['seconds'] * 1000:.0f} ms")
+        return _db_synced
     except Exception as e:
         print(f"❌ خطأ فادح: {e}")
         import traceback
@@ -78,46 +191,97 @@ def refresh_data():
     return False
 
 
-def get_products_by_cat_id(short_id):
-    if not _products_cache: refresh_data()
-    full_name = _category_id_map.get(str(short_id))
-    if not full_name:
-        refresh_data()
-        full_name = _category_id_map.get(str(short_id))
-        if not full_name: return []
-    filtered = []
-    for p in _products_cache:
-        if clean_str(p.get('category_name', '')) == full_name:
-            filtered.append(p)
-    return filtered
-
-
-def search_subcategories(keywords_list):
-    if not _products_cache: refresh_data()
-    found_cats_ids = set()
-    results = []
-    lower_keywords = [clean_str(k).lower() for k in keywords_list]
-    for p in _products_cache:
-        cat_name = clean_str(p.get('category_name', ''))
-        lower_cat = cat_name.lower()
-        for kw in lower_keywords:
-            if kw in lower_cat:
-                short_id = generate_stable_id(cat_name)
-                if short_id not in found_cats_ids:
-                    found_cats_ids.add(short_id)
-                    results.append((short_id, cat_name))
-                break
-    return results
+async def _save_snapshot():
+    raw = list(_raw_products.values())
+    prices = [_catalog.get_product(pid)['price'] for pid in _raw_products]
+    try:
+        await asyncio.to_thread(catalog_snapshot.save_snapshot, raw, prices, _feed_hash,
+                                dict(_feed_validators), settings.thaw(_priced_margins))
+    except Exception as e:
+        print(f"⚠️ Catalog snapshot not saved: {e}")
+
+
+def warm_start():
+    """Fill the catalog from the last snapshot (call at boot, before polling).
+
+    Prices are recomputed when the margins changed since the snapshot; the
+    next refresh then re-prices and re-syncs everything. Returns True when a
+    snapshot was loaded.
+    """
+    global _catalog, _feed_hash, _raw_products, _priced_margins, _db_synced
+    state = catalog_snapshot.load_snapshot()
+    if state is None:
+        return False
+    margins = settings.get_setting("margins", {})
+    same_margins = state["margins"] == margins
+    classifier = get_classifier()
+    raw = {}
+    ordered = []
+    for h, p, price in zip(state["hashes"], state["products"], state["prices"]):
+        raw[str(p.get('id'))] = (h, p)
+        if same_margins:
+            priced = dict(p)
+            priced['price'] = price
+        else:
+            priced = _price_product(p, classifier)
+        ordered.append(priced)
+
+    _catalog = ProductCatalog(ordered)
+    _raw_products = raw
+    _feed_hash = state["feed_hash"]
+    _priced_margins = state["margins"]
+    _db_synced = True   # snapshots are only written after a successful DB sync
+    _feed_validators.update(state.get("validators") or {})
+    age = (time.time() - state.get("saved_at", time.time())) / 60
+    print(f"⚡ Catalog loaded from snapshot: {len(_catalog)} products ({age:.0f} min old)")
+    return True
+
+
+async def _ensure_catalog():
+    """Only a cold start without a snapshot waits for the provider (once)."""
+    if _catalog:
+        return
+    async with _refresh_lock:
+        if not _catalog:
+            await _refresh(False)
+
+
+def _revalidate_soon():
+    """Background refresh_data(), at most once per REVALIDATE_INTERVAL."""
+    global _revalidate_task, _last_revalidate
+    if _revalidate_task is not None and not _revalidate_task.done():
+        return
+    if time.monotonic() - _last_revalidate < REVALIDATE_INTERVAL:
+        return
+    _last_revalidate = time.monotonic()
+    _revalidate_task = asyncio.create_task(refresh_data())
+
+
+async def get_products_by_cat_id(short_id):
+    await _ensure_catalog()
+    if _catalog.get_category_name(short_id) is None:
+        # معرّف غير معروف (زر قديم؟): لا ننتظر المزود، نحدّث في الخلفية
+        _revalidate_soon()
+    return _catalog.get_products_by_category(short_id)
+
+
+async def search_subcategories(keywords_list):
+    await _ensure_catalog()
+    return _catalog.search_categories(keywords_list)
+
+
+async def browse_categories(map_key):
+    """Categories listed under a GAMES_MAP / APPS_MAP key (precomputed at refresh)."""
+    await _ensure_catalog()
+    return _catalog.browse(map_key)
 
 
 def get_product_details(pid):
-    str_id = str(pid)
-    for p in _products_cache:
-        if str(p.get('id')) == str_id: return p
-    return None
+    return _catalog.get_product(pid)
 
 
-def check_orders_status(order_ids):
+async def check_orders_status(order_ids):
+    """Statuses of the given orders; None when the provider could not answer."""
     if not order_ids: return []
 
     # تحديد نوع البحث (ID vs UUID)
@@ -130,21 +294,13 @@ def check_orders_status(order_ids):
         is_search_by_uuid = False
         # لا نستخدم int() هنا، نتركها strings داخل القائمة
 
-    orders_param = json.dumps(order_ids)
-    url = f"{config.API_BASE_URL}/check"
-    headers = {"api-token": config.API_TOKEN}
-    params = {"orders": orders_param}
-
-    if is_search_by_uuid:
-        params["uuid"] = "1"
-
     try:
-        response = requests.get(url, headers=headers, params=params)
-        data = response.json()
+        data = await get_client().check_orders(order_ids, by_uuid=is_search_by_uuid)
         if data.get("status") == "OK": return data.get("data", [])
+        print(f"⚠️ Check API Error: {data.get('message') or data.get('status')}")
     except Exception as e:
         print(f"⚠️ Check API Error: {e}")
-    return []
+    return None
 
 
 
@@ -160,9 +316,19 @@ def get_user_uuids(user_id):
 
 # تأكد من وجود import services.database as database في الأعلى
 
+# رمز execute_order_dynamic عندما لا نعرف هل نُفّذ الطلب (انتهت المهلة أو انقطع
+# الاتصال بعد إرسال /newOrder): قد يكون المزود أنشأه، فيُسجَّل معلقاً بالـ uuid
+# ويحسمه order_poller (مع الاسترجاع إن رُفض). لا يُسترجع الرصيد هنا.
+ORDER_OUTCOME_UNKNOWN = 202
+
+
 async def execute_order_dynamic(product_id, qty, inputs_list, param_names_list, user_id=None):
-    url = f"{config.API_BASE_URL}/newOrder/{product_id}/params"
-    headers = {"api-token": config.API_TOKEN}
+    """Place an order; returns (ok, order id or error message, uuid, code).
+
+    ok is False with code ORDER_OUTCOME_UNKNOWN when the provider did not
+    answer: the order is then logged as pending under the returned uuid and
+    must not be refunded by the caller.
+    """
     my_uuid = str(uuid.uuid4())
     main_input = inputs_list[0] if inputs_list else ""
 
@@ -180,27 +346,35 @@ async def execute_order_dynamic(product_id, qty, inputs_list, param_names_list,
                 params[param_names_list[i]] = inputs_list[i]
 
     print(f"🚀 Sending Order: {params}")
+    prod = get_product_details(product_id)
+    p_name = prod.get('name', 'Unknown') if prod else 'Unknown'
+    p_price = prod.get('price', 0) * int(qty) if prod else 0
+
     try:
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(None, lambda: requests.post(url, headers=headers, params=params))
-        res = response.json()
+        res = await get_client().new_order(product_id, params)
+    except ProviderError as e:
+        res, error = None, str(e)
+    except Exception as e:
+        return False, str(e), None, 500
+    else:
+        error = "empty response"
 
-        if res.get("status") == "OK":
-            # ✅ نحصل على الآيدي الخارجي
-            final_id = res.get("data", {}).get("order_id")
+    if not isinstance(res, dict):
+        # لا رد مفهوم: لا نعرف هل أُنشئ الطلب، فلا رفض ولا استرجاع
+        print(f"⚠️ newOrder outcome unknown ({error}), tracking {my_uuid}")
+        await async_db.log_api_order(user_id, my_uuid, p_name, p_price, "pending")
+        return False, error, my_uuid, ORDER_OUTCOME_UNKNOWN
 
-            prod = get_product_details(product_id)
-            p_name = prod.get('name', 'Unknown') if prod else 'Unknown'
-            p_price = prod.get('price', 0) * int(qty) if prod else 0
+    if res.get("status") == "OK":
+        # ✅ نحصل على الآيدي الخارجي
+        final_id = (res.get("data") or {}).get("order_id")
 
-            # ✅ نمرر final_id (رقم الطلب الخارجي) ليتم حفظه
-            database.log_api_order(user_id, my_uuid, p_name, p_price, "pending", order_id=final_id)
+        # ✅ نمرر final_id (رقم الطلب الخارجي) ليتم حفظه
+        await async_db.log_api_order(user_id, my_uuid, p_name, p_price, "pending", order_id=final_id)
 
-            return True, final_id or my_uuid, my_uuid, 200
+        return True, final_id or my_uuid, my_uuid, 200
 
-        return False, res.get("message", "Error"), None, res.get("code", 0)
-    except Exception as e:
-        return False, str(e), None, 500
+    return False, res.get("message", "Error"), None, res.get("code", 0)
 
 def get_all_recent_uuids_with_users(limit=50):
     try:
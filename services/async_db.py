@@ -0,0 +1,157 @@
+"""Awaitable data-access API on top of services/database.py.
+
+Handlers must not call the blocking database functions on the event loop.
+Every function here runs its synchronous twin from services/database.py on a
+dedicated executor:
+
+- writes go through a single writer thread, so SQLite never sees two writers
+  from this process fighting over the write lock;
+- reads go to a small reader pool, which WAL mode lets run alongside the writer.
+
+Each executor thread gets its own pooled connection (see services/db_pool.py).
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import services.database as database
+
+READER_THREADS = 4
+
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+_readers = ThreadPoolExecutor(max_workers=READER_THREADS, thread_name_prefix="db-reader")
+
+
+async def run_read(fn, *args, **kwargs):
+    """Run a blocking read callable on the reader pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_readers, functools.partial(fn, *args, **kwargs))
+
+
+async def run_write(fn, *args, **kwargs):
+    """Run a blocking callable on the single writer thread."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_writer, functools.partial(fn, *args, **kwargs))
+
+
+def _reader(name):
+    # Resolve the database function at call time so later changes to
+    # services/database.py are picked up without touching this module.
+    async def wrapper(*args, **kwargs):
+        return await run_read(getattr(database, name), *args, **kwargs)
+    wrapper.__name__ = wrapper.__qualname__ = name
+    wrapper.__doc__ = f"Awaitable database.{name} (reader pool)."
+    return wrapper
+
+
+def _writer_fn(name):
+    async def wrapper(*args, **kwargs):
+        return await run_write(getattr(database, name), *args, **kwargs)
+    wrapper.__name__ = wrapper.__qualname__ = name
+    wrapper.__doc__ = f"Awaitable database.{name} (writer thread)."
+    return wrapper
+
+
+# --- Users ---
+get_user_data = _reader("get_user_data")
+get_balance = _reader("get_balance")
+get_total_deposited = _reader("get_total_deposited")
+get_wallet = _reader("get_wallet")
+is_banned = _reader("is_banned")
+get_all_users_list = _reader("get_all_users_list")
+get_all_user_ids = _reader("get_all_user_ids")
+get_all_admin_ids = _reader("get_all_admin_ids")
+get_ledger = _reader("get_ledger")
+reconcile_balances = _reader("reconcile_balances")
+
+register_user = _writer_fn("register_user")
+ensure_user_exists = _writer_fn("ensure_user_exists")
+update_user_info = _writer_fn("update_user_info")
+add_balance = _writer_fn("add_balance")
+deduct_balance = _writer_fn("deduct_balance")
+credit_balance = _writer_fn("credit_balance")
+debit_balance = _writer_fn("debit_balance")
+ban_user = _writer_fn("ban_user")
+set_admin = _writer_fn("set_admin")
+
+# --- Local orders ---
+get_pending_orders = _reader("get_pending_orders")
+get_all_orders = _reader("get_all_orders")
+get_user_local_orders = _reader("get_user_local_orders")
+get_pending_order_by_id = _reader("get_pending_order_by_id")
+get_orders_by_status_and_source = _reader("get_orders_by_status_and_source")
+get_all_orders_by_source = _reader("get_all_orders_by_source")
+get_orders_page = _reader("get_orders_page")
+count_orders_by_group = _reader("count_orders_by_group")
+search_orders = _reader("search_orders")
+count_user_orders = _reader("count_user_orders")
+get_user_orders_page = _reader("get_user_orders_page")
+
+save_pending_order = _writer_fn("save_pending_order")
+update_order_status = _writer_fn("update_order_status")
+remove_pending_order = _writer_fn("remove_pending_order")
+
+# --- Deposits ---
+get_deposit_request = _reader("get_deposit_request")
+get_all_deposit_requests = _reader("get_all_deposit_requests")
+get_deposit_requests_by_status = _reader("get_deposit_requests_by_status")
+
+save_deposit_request = _writer_fn("save_deposit_request")
+remove_deposit_request = _writer_fn("remove_deposit_request")
+
+# --- API orders ---
+get_pending_api_orders = _reader("get_pending_api_orders")
+get_pending_api_uuids = _reader("get_pending_api_uuids")
+get_user_api_history = _reader("get_user_api_history")
+get_all_recent_api_orders = _reader("get_all_recent_api_orders")
+get_all_api_orders = _reader("get_all_api_orders")
+count_api_orders = _reader("count_api_orders")
+search_api_orders_by_internal_or_provider_id = _reader("search_api_orders_by_internal_or_provider_id")
+get_order_by_uuid = _reader("get_order_by_uuid")
+get_api_order_by_provider_id = _reader("get_api_order_by_provider_id")
+
+log_api_order = _writer_fn("log_api_order")
+update_api_order_status = _writer_fn("update_api_order_status")
+apply_api_order_transitions = _writer_fn("apply_api_order_transitions")
+
+# --- Products ---
+sync_products_from_api = _writer_fn("sync_products_from_api")
+delete_products = _writer_fn("delete_products")
+
+
+# --- Broadcasts ---
+get_broadcast_job = _reader("get_broadcast_job")
+get_running_broadcast_jobs = _reader("get_running_broadcast_jobs")
+get_broadcast_pending_recipients = _reader("get_broadcast_pending_recipients")
+get_broadcast_progress = _reader("get_broadcast_progress")
+
+create_broadcast_job = _writer_fn("create_broadcast_job")
+save_broadcast_results = _writer_fn("save_broadcast_results")
+finish_broadcast_job = _writer_fn("finish_broadcast_job")
+
+
+# --- Reports ---
+get_last_report_date = _reader("get_last_report_date")
+count_report_archive = _reader("count_report_archive")
+get_report_archive_page = _reader("get_report_archive_page")
+get_report_archive_entry = _reader("get_report_archive_entry")
+get_report_archive_before = _reader("get_report_archive_before")
+
+get_sales_summary = _writer_fn("get_sales_summary")   # refreshes stale rollup days
+update_last_report_date = _writer_fn("update_last_report_date")
+save_report_archive = _writer_fn("save_report_archive")
+set_report_file_id = _writer_fn("set_report_file_id")
+release_report_files = _writer_fn("release_report_files")
+
+
+# --- Media ---
+get_media_file_ids = _reader("get_media_file_ids")
+
+save_media_file_id = _writer_fn("save_media_file_id")
+delete_media_file_id = _writer_fn("delete_media_file_id")
+
+
+def shutdown():
+    """Stop the executors (pending jobs are allowed to finish)."""
+    _writer.shutdown(wait=True)
+    _readers.shutdown(wait=True)
@@ -0,0 +1,202 @@
+"""Admin broadcasts: persisted, rate-limited, resumable.
+
+A job row (broadcast_jobs) stores which message to copy and where the live
+progress message is; every recipient has a row in broadcast_recipients with
+pending / sent / blocked / failed. Delivery works through the pending rows
+page by page, so after a restart ``resume_broadcasts`` simply picks up the
+remaining ones (after a hard crash, at most the unsaved part of one page is
+sent again).
+
+Sending is paced by a SendScheduler: a global token bucket below Telegram's
+~30 messages/second, at most one message per second to the same chat, and a
+global pause when Telegram answers RetryAfter. SENDERS coroutines send in
+parallel. Users who blocked the bot are flagged (users.blocked_bot) and left
+out of later broadcasts until they press /start again.
+"""
+import asyncio
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+import data.keyboards as kb
+import services.async_db as async_db
+
+GLOBAL_RATE = 25            # messages per second (Telegram allows ~30)
+PER_CHAT_INTERVAL = 1.0     # seconds between two messages to the same chat
+SENDERS = 8
+PAGE_SIZE = 100            # results are saved per page
+MAX_ATTEMPTS = 3
+PROGRESS_EVERY = 5.0        # seconds between edits of the progress message
+
+_running = {}               # job_id -> asyncio.Task
+
+
+class SendScheduler:
+    """Token bucket for the global rate plus per-chat spacing and RetryAfter pauses."""
+
+    def __init__(self, rate=GLOBAL_RATE, per_chat_interval=PER_CHAT_INTERVAL):
+        self.rate = rate
+        self.capacity = rate
+        self.per_chat_interval = per_chat_interval
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._last_by_chat = {}
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def wait(self, chat_id):
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                delay = self._paused_until - now
+                chat_ready = self._last_by_chat.get(chat_id, 0.0) + self.per_chat_interval
+                delay = max(delay, chat_ready - now)
+                if delay <= 0 and self._tokens >= 1:
+                    self._tokens -= 1
+                    if len(self._last_by_chat) > 10000:
+                        horizon = now - self.per_chat_interval
+                        self._last_by_chat = {c: t for c, t in self._last_by_chat.items() if t > horizon}
+                    self._last_by_chat[chat_id] = now
+                    return
+                if delay <= 0:
+                    delay = (1 - self._tokens) / self.rate
+            await asyncio.sleep(delay)
+
+
+async def _deliver(bot, scheduler, job, user_id):
+    """Copy the job's message to one user; returns (status, error)."""
+    error = None
+    for attempt in range(MAX_ATTEMPTS):
+        await scheduler.wait(user_id)
+        try:
+            await bot.copy_message(chat_id=user_id, from_chat_id=job['from_chat_id'],
+                                   message_id=job['message_id'])
+            return "sent", None
+        except TelegramRetryAfter as e:
+            # Flood control applies to the whole bot: every sender waits.
+            scheduler.pause(e.retry_after)
+            error = str(e)
+        except TelegramForbiddenError as e:
+            return "blocked", str(e)
+        except TelegramBadRequest as e:
+            return "failed", str(e)
+        except Exception as e:
+            error = str(e)
+            await asyncio.sleep(1 + attempt)
+    return "failed", error
+
+
+def _progress_text(job, progress, done=False):
+    handled = progress['sent'] + progress['blocked'] + progress['failed']
+    if done:
+        return (
+            f"✅ <b>تم انتهاء الحملة!</b>\n"
+            f"━━━━━━━━━━━━\n"
+            f"📨 تم الإرسال بنجاح: <b>{progress['sent']}</b>\n"
+            f"⛔ لم تصل (حظروا البوت): <b>{progress['blocked']}</b>\n"
+            f"⚠️ فشل الإرسال: <b>{progress['failed']}</b>\n"
+            f"👥 العدد الكلي: <b>{job['total']}</b>"
+        )
+    return (
+        f"⏳ <b>جاري الإرسال...</b> {handled}/{job['total']}\n"
+        f"📨 وصلت: {progress['sent']} | ⛔ محظور: {progress['blocked']} | ⚠️ فشل: {progress['failed']}"
+    )
+
+
+async def _edit_progress(bot, job, progress, done=False):
+    try:
+        await bot.edit_message_text(
+            _progress_text(job, progress, done),
+            chat_id=job['status_chat_id'], message_id=job['status_message_id'],
+            parse_mode="HTML", reply_markup=kb.back_to_admin() if done else None,
+        )
+    except Exception:
+        pass   # unchanged text or message deleted: progress is still in the DB
+
+
+async def _run_job(bot: Bot, job):
+    job_id = job['id']
+    scheduler = SendScheduler()
+    queue = asyncio.Queue()
+    results = []
+
+    async def sender():
+        while True:
+            user_id = await queue.get()
+            try:
+                status, error = await _deliver(bot, scheduler, job, user_id)
+                results.append((user_id, status, error))
+            finally:
+                queue.task_done()
+
+    await _edit_progress(bot, job, await async_db.get_broadcast_progress(job_id))
+    workers = [asyncio.create_task(sender()) for _ in range(SENDERS)]
+    last_edit = time.monotonic()
+    try:
+        while True:
+            page = await async_db.get_broadcast_pending_recipients(job_id, PAGE_SIZE)
+            if not page:
+                break
+            for user_id in page:
+                queue.put_nowait(user_id)
+            await queue.join()
+
+            batch, results[:] = list(results), []
+            await async_db.save_broadcast_results(job_id, batch)
+
+            if time.monotonic() - last_edit >= PROGRESS_EVERY:
+                last_edit = time.monotonic()
+                await _edit_progress(bot, job, await async_db.get_broadcast_progress(job_id))
+    finally:
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        if results:
+            await async_db.save_broadcast_results(job_id, list(results))
+
+    await async_db.finish_broadcast_job(job_id)
+    progress = await async_db.get_broadcast_progress(job_id)
+    await _edit_progress(bot, job, progress, done=True)
+    print(f"📢 Broadcast {job_id} finished: {progress}")
+
+
+def _spawn(bot, job):
+    if job['id'] in _running:
+        return _running[job['id']]
+    task = asyncio.create_task(_run_job(bot, job))
+    _running[job['id']] = task
+    task.add_done_callback(lambda t, job_id=job['id']: _on_job_done(job_id, t))
+    return task
+
+
+def _on_job_done(job_id, task):
+    _running.pop(job_id, None)
+    if not task.cancelled() and task.exception():
+        # The job stays 'running' in the DB and resumes on the next start.
+        print(f"⚠️ Broadcast {job_id} stopped: {task.exception()}")
+
+
+async def start_broadcast(bot: Bot, source_msg, status_msg):
+    """Persist a job for ``source_msg`` and start sending in the background."""
+    job_id, total = await async_db.create_broadcast_job(
+        source_msg.chat.id, source_msg.message_id, status_msg.chat.id, status_msg.message_id
+    )
+    job = await async_db.get_broadcast_job(job_id)
+    if total:
+        _spawn(bot, job)
+    else:
+        await async_db.finish_broadcast_job(job_id)
+    return job_id, total
+
+
+async def resume_broadcasts(bot: Bot):
+    """Continue jobs that were still running when the bot stopped."""
+    for job in await async_db.get_running_broadcast_jobs():
+        print(f"📢 Resuming broadcast {job['id']}...")
+        _spawn(bot, job)
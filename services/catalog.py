@@ -0,0 +1,104 @@
+"""Indexed, immutable snapshot of the provider's product list.
+
+A ProductCatalog is built once per refresh and then only read, so handlers
+can look products up without scanning the full list on every button press.
+api_manager swaps the module-level catalog reference in one assignment;
+readers that grabbed the old object keep a consistent view.
+"""
+import hashlib
+import json
+import zlib
+
+import data.mappings as mappings
+
+
+def clean_str(text):
+    if not text: return ""
+    return str(text).strip()
+
+
+def generate_stable_id(text):
+    if not text: return "0"
+    return str(zlib.crc32(clean_str(text).encode('utf-8')))
+
+
+def product_hash(product):
+    """Fingerprint of a product as sent by the provider (key order does not matter)."""
+    raw = json.dumps(product, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class ProductCatalog:
+    """Products plus the lookup tables the shop handlers need.
+
+    - ``by_id``: product id (str) -> product
+    - ``by_category``: category short id -> products, in feed order
+    - ``category_names``: category short id -> category name
+    - keyword -> [(short_id, category_name)] matches, precomputed for every
+      keyword in data/mappings.py and memoized for any other keyword
+    - ``browse_index``: GAMES_MAP / APPS_MAP key -> [(short_id, category_name,
+      product count)], what the category screen of that key lists
+    """
+
+    def __init__(self, products=None):
+        self.products = list(products or [])
+        self.by_id = {}
+        self.by_category = {}
+        self.category_names = {}
+        self._lower_categories = []
+        self._keyword_index = {}
+
+        for p in self.products:
+            self.by_id[str(p.get('id'))] = p
+            cat_name = clean_str(p.get('category_name', ''))
+            if not cat_name:
+                continue
+            short_id = generate_stable_id(cat_name)
+            bucket = self.by_category.get(short_id)
+            if bucket is None:
+                bucket = self.by_category[short_id] = []
+                self.category_names[short_id] = cat_name
+                self._lower_categories.append((short_id, cat_name, cat_name.lower()))
+            bucket.append(p)
+
+        self.browse_index = {}
+        for key, keywords in mappings.ALL_MAPS.items():
+            self.browse_index[key] = [(short_id, name, len(self.by_category[short_id]))
+                                      for short_id, name in self.search_categories(keywords)]
+
+    def __len__(self):
+        return len(self.products)
+
+    def __bool__(self):
+        return bool(self.products)
+
+    def get_product(self, pid):
+        return self.by_id.get(str(pid))
+
+    def get_category_name(self, short_id):
+        return self.category_names.get(str(short_id))
+
+    def get_products_by_category(self, short_id):
+        return list(self.by_category.get(str(short_id), ()))
+
+    def browse(self, map_key):
+        """[(short_id, category_name, product count)] for a mapping key, in feed order."""
+        return self.browse_index.get(map_key, [])
+
+    def _categories_for_keyword(self, keyword):
+        kw = clean_str(keyword).lower()
+        matches = self._keyword_index.get(kw)
+        if matches is None:
+            matches = [(short_id, name) for short_id, name, lower in self._lower_categories if kw in lower]
+            self._keyword_index[kw] = matches
+        return matches
+
+    def search_categories(self, keywords_list):
+        """Categories whose name contains any keyword, in feed order, without duplicates."""
+        matched = set()
+        for kw in keywords_list:
+            for short_id, _ in self._categories_for_keyword(kw):
+                matched.add(short_id)
+        if not matched:
+            return []
+        return [(short_id, name) for short_id, name, _ in self._lower_categories if short_id in matched]
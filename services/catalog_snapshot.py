@@ -0,0 +1,65 @@
+"""On-disk snapshot of the product catalog, for a warm start.
+
+After a restart the catalog used to be empty until the first provider call,
+so the first user to open a category waited on a full refresh_data(). Every
+successful refresh now writes the raw feed, the prices computed from it and
+the feed validators (hash, ETag / Last-Modified, margins) to SNAPSHOT_PATH;
+at boot api_manager loads it back and serves menus at once while the
+background refresh revalidates against the provider (usually a 304).
+
+Format: zlib-compressed JSON tagged with SNAPSHOT_VERSION, written to a temp
+file and renamed so a crash never leaves a truncated snapshot. A missing,
+corrupt or old-version file is ignored (cold start as before).
+"""
+import json
+import os
+import time
+import zlib
+
+import config
+
+SNAPSHOT_PATH = getattr(config, "CATALOG_SNAPSHOT_PATH", "catalog_snapshot.bin")
+SNAPSHOT_VERSION = 1
+
+
+def save_snapshot(raw_products, prices, feed_hash, validators, margins, path=None):
+    """Write the catalog state.
+
+    ``raw_products``: [(hash, raw product)] in feed order; ``prices``: the
+    priced value of each, same order. Returns the file size in bytes.
+    """
+    path = path or SNAPSHOT_PATH
+    state = {
+        "version": SNAPSHOT_VERSION,
+        "saved_at": time.time(),
+        "feed_hash": feed_hash,
+        "validators": validators,
+        "margins": margins,
+        "hashes": [h for h, _ in raw_products],
+        "products": [p for _, p in raw_products],
+        "prices": prices,
+    }
+    blob = zlib.compress(json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(blob)
+    os.replace(tmp_path, path)
+    return len(blob)
+
+
+def load_snapshot(path=None):
+    """The saved state as a dict, or None when there is no usable snapshot."""
+    path = path or SNAPSHOT_PATH
+    try:
+        with open(path, "rb") as f:
+            state = json.loads(zlib.decompress(f.read()))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠️ Catalog snapshot unreadable, ignoring it: {e}")
+        return None
+    if not isinstance(state, dict) or state.get("version") != SNAPSHOT_VERSION:
+        return None
+    if not (len(state.get("hashes", ())) == len(state.get("products", ())) == len(state.get("prices", ()))):
+        return None
+    return state
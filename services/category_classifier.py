@@ -0,0 +1,63 @@
+"""Map a product to its GAMES_MAP / APPS_MAP key in a single regex pass.
+
+Matching is exactly that of the old per-product loop in refresh_data
+(``any(kw in search_text for kw in keywords)`` over the merged map, with
+search_text = lowercased category name + " " + lowercased product name):
+keywords are used verbatim and the first key declared in mappings.py wins.
+Categories drive the margins, so any change here changes customer prices;
+tests/test_category_classifier.py pins the result to the old loop.
+The speed-up comes from compiling every keyword into one alternation.
+"""
+import re
+
+import data.mappings as mappings
+from services.catalog import clean_str
+
+DEFAULT_CATEGORY = "default"
+
+
+class CategoryClassifier:
+    def __init__(self, category_map):
+        self._priority = {}   # keyword -> (rank, category key)
+        for rank, (key, keywords) in enumerate(category_map.items()):
+            for kw in keywords:
+                if kw not in self._priority:
+                    self._priority[kw] = (rank, key)
+
+        # At each position the lookahead reports the best-ranked keyword starting
+        # there (alternatives are ordered by rank, longer first within a rank),
+        # so the minimum over all positions is the best-ranked match overall.
+        ordered = sorted(self._priority, key=lambda k: (self._priority[k][0], -len(k)))
+        if ordered:
+            self._pattern = re.compile("(?=(" + "|".join(re.escape(k) for k in ordered) + "))")
+        else:
+            self._pattern = None
+
+    def classify(self, category_name, product_name=""):
+        """Return the category key for a product's (clean_str'ed) category and name."""
+        if self._pattern is None:
+            return DEFAULT_CATEGORY
+        haystack = (category_name or "").lower() + " " + (product_name or "").lower()
+        best = None
+        for m in self._pattern.finditer(haystack):
+            hit = self._priority[m.group(1)]
+            if best is None or hit[0] < best[0]:
+                best = hit
+                if best[0] == 0:
+                    break
+        return best[1] if best else DEFAULT_CATEGORY
+
+
+_classifier = None
+
+
+def get_classifier():
+    """Classifier built from data/mappings.py (compiled on first use)."""
+    global _classifier
+    if _classifier is None:
+        _classifier = CategoryClassifier({**mappings.GAMES_MAP, **mappings.APPS_MAP})
+    return _classifier
+
+
+def classify_product(product):
+    return get_classifier().classify(clean_str(product.get('category_name', '')), clean_str(product.get('name', '')))
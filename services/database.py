@@ -1,18 +1,21 @@
 import sqlite3
 import json
 import os
-from datetime import datetime
+import hashlib
+import time
+from datetime import date, datetime, timedelta
 import random
 import config
+from services import db_pool
+from services import migrations
 
-DB_NAME = "whitebot.db"
+DB_NAME = db_pool.DB_NAME
 
 
 # --- Database Connection & Initialization ---
 def get_db_connection():
-    conn = sqlite3.connect(DB_NAME, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Borrow this thread's pooled connection; ``close()`` hands it back."""
+    return db_pool.get_connection(DB_NAME)
 
 
 def init_db():
@@ -97,33 +100,30 @@ def init_db():
     )
     ''')
 
-    conn.commit()
-    
-    # Run migrations
-    _migrate_add_order_source_field()
-    
-    conn.close()
+    # Products Table (نسخة من كتالوج المزود بعد التسعير)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS products (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        price REAL,
+        category_name TEXT,
+        min_qty INTEGER DEFAULT 1,
+        max_qty INTEGER DEFAULT 1000,
+        description TEXT,
+        content_hash TEXT
+    )
+    ''')
 
+    conn.commit()
 
-def _migrate_add_order_source_field():
-    """Migrate: Add order_source field to orders table if it doesn't exist."""
+    # Run migrations (schema_version); a failed migration stops start-up
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check if column exists
-        cursor.execute("PRAGMA table_info(orders)")
-        columns = {col[1] for col in cursor.fetchall()}
-        
-        if 'order_source' not in columns:
-            # Add the column
-            cursor.execute('ALTER TABLE orders ADD COLUMN order_source TEXT DEFAULT "LOCAL"')
-            conn.commit()
-            print("✅ Migration: Added order_source column to orders table")
-        
+        migrations.run_migrations(conn)
+    finally:
         conn.close()
-    except Exception as e:
-        print(f"⚠️  Migration warning: {e}")
+
+    load_admin_ids()
+    load_known_users()
 
 
 # --- Helper Functions ---
@@ -137,31 +137,44 @@ def _dict_factory_order(row):
 
 
 # --- User Management ---
-def ensure_user_exists(user_id):
+# Users are created once, on first contact (UserProvisioningMiddleware or
+# /start), with a single INSERT ... ON CONFLICT DO NOTHING. _known_users holds
+# the ids that already have a row, so reads are one query and repeated
+# ensure_user_exists calls cost a set lookup.
+_known_users = set()
+
+
+def load_known_users():
+    """(Re)load the ids of existing users (call after external DB edits)."""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    uid = str(user_id)
+    ids = {row['user_id'] for row in conn.execute("SELECT user_id FROM users").fetchall()}
+    conn.close()
+    _known_users.clear()
+    _known_users.update(ids)
+    return len(ids)
 
-    cursor.execute("SELECT * FROM users WHERE user_id = ?", (uid,))
-    user = cursor.fetchone()
 
-    if not user:
-        cursor.execute('''
-            INSERT INTO users (user_id, balance, banned, total_deposited)
-            VALUES (?, 0.0, 0, 0.0)
-        ''', (uid,))
-        conn.commit()
-        data = {uid: {"balance": 0.0, "banned": False, "total_deposited": 0.0}}
-    else:
-        data = {uid: dict(user)}
-        data[uid]['banned'] = bool(data[uid]['banned'])
+def is_known_user(user_id):
+    return str(user_id) in _known_users
+
 
+def ensure_user_exists(user_id):
+    """Create the user row if it does not exist yet."""
+    uid = str(user_id)
+    if uid in _known_users:
+        return
+    conn = get_db_connection()
+    conn.execute('''
+        INSERT INTO users (user_id, balance, banned, total_deposited)
+        VALUES (?, 0.0, 0, 0.0)
+        ON CONFLICT(user_id) DO NOTHING
+    ''', (uid,))
+    conn.commit()
     conn.close()
-    return data
+    _known_users.add(uid)
 
 
 def get_user_data(user_id):
-    ensure_user_exists(user_id)
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM users WHERE user_id = ?", (str(user_id),))
@@ -177,7 +190,6 @@ def get_user_data(user_id):
 
 
 def get_balance(user_id):
-    ensure_user_exists(user_id)
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT balance FROM users WHERE user_id = ?", (str(user_id),))
@@ -186,29 +198,113 @@ def get_balance(user_id):
     return row['balance'] if row else 0.0
 
 
-def add_balance(user_id, amount, is_deposit=False):
-    ensure_user_exists(user_id)
+def get_wallet(user_id):
+    """balance and total_deposited in one query (wallet screen)."""
+    conn = get_db_connection()
+    row = conn.execute("SELECT balance, total_deposited FROM users WHERE user_id = ?", (str(user_id),)).fetchone()
+    conn.close()
+    if row:
+        return {"balance": row['balance'] or 0.0, "total_deposited": row['total_deposited'] or 0.0}
+    return {"balance": 0.0, "total_deposited": 0.0}
+
+
+# --- Balance & Ledger ---
+# Every balance change is one transaction: a conditional UPDATE ... RETURNING
+# on users plus an append-only row in balance_ledger. ``ref`` is an idempotency
+# key (e.g. "purchase:<uuid>"): a second change with the same ref is rolled
+# back, so double clicks cannot credit or charge twice.
+# Order and deposit ids are random 5-digit numbers that come back once a row
+# is deleted, so their refs also carry the row's created_ts (deposit_ref,
+# order_refund_ref); a bare id would collide with an old ledger row.
+
+def deposit_ref(req):
+    """Ledger ref for approving the deposit request ``req``."""
+    return f"deposit:{req['id']}:{req.get('created_ts') or req.get('date')}"
+
+
+def order_refund_ref(order):
+    """Ledger ref for refunding the local order ``order``."""
+    return f"refund:order:{order['id']}:{order.get('created_ts') or order.get('date')}"
+
+
+def _ledger_entry(c, uid, amount, balance_after, kind, ref):
+    c.execute(
+        "INSERT INTO balance_ledger (user_id, amount, balance_after, kind, ref) VALUES (?, ?, ?, ?, ?)",
+        (uid, amount, balance_after, kind, ref)
+    )
+
+
+def credit_balance(user_id, amount, kind="credit", ref=None, is_deposit=False):
+    """Add to the balance; returns (status, balance) with status "ok" or "duplicate"."""
     uid = str(user_id)
     amount_float = float(amount)
 
     conn = get_db_connection()
-    cursor = conn.cursor()
+    c = conn.cursor()
+    try:
+        if uid not in _known_users:
+            c.execute("INSERT INTO users (user_id, balance, banned, total_deposited) VALUES (?, 0.0, 0, 0.0) "
+                      "ON CONFLICT(user_id) DO NOTHING", (uid,))
+        new_bal = c.execute(
+            "UPDATE users SET balance = balance + ?, total_deposited = total_deposited + ? "
+            "WHERE user_id = ? RETURNING balance",
+            (amount_float, amount_float if is_deposit else 0.0, uid)
+        ).fetchone()['balance']
+        _ledger_entry(c, uid, amount_float, new_bal, kind, ref)
+        conn.commit()
+        _known_users.add(uid)
+        return "ok", new_bal
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        row = c.execute("SELECT balance FROM users WHERE user_id = ?", (uid,)).fetchone()
+        return "duplicate", row['balance'] if row else 0.0
+    finally:
+        conn.close()
 
-    cursor.execute("UPDATE users SET balance = balance + ? WHERE user_id = ?", (amount_float, uid))
 
-    if is_deposit:
-        cursor.execute("UPDATE users SET total_deposited = total_deposited + ? WHERE user_id = ?", (amount_float, uid))
+def debit_balance(user_id, amount, kind="purchase", ref=None):
+    """Take from the balance if it covers ``amount``.
 
-    conn.commit()
+    Returns (status, balance): "ok", "insufficient" or "duplicate" (``ref``
+    was already charged — the caller must not deliver again).
+    """
+    uid = str(user_id)
+    try:
+        cost = float(amount)
+    except:
+        return "insufficient", None
+
+    conn = get_db_connection()
+    c = conn.cursor()
+    try:
+        row = c.execute(
+            "UPDATE users SET balance = balance - ? "
+            "WHERE user_id = ? AND ROUND(balance, 4) >= ROUND(?, 4) RETURNING balance",
+            (cost, uid, cost)
+        ).fetchone()
+        if row is None:
+            conn.rollback()
+            bal = c.execute("SELECT balance FROM users WHERE user_id = ?", (uid,)).fetchone()
+            return "insufficient", bal['balance'] if bal else 0.0
+        _ledger_entry(c, uid, -cost, row['balance'], kind, ref)
+        conn.commit()
+        return "ok", row['balance']
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        bal = c.execute("SELECT balance FROM users WHERE user_id = ?", (uid,)).fetchone()
+        return "duplicate", bal['balance'] if bal else 0.0
+    finally:
+        conn.close()
 
-    cursor.execute("SELECT balance FROM users WHERE user_id = ?", (uid,))
-    new_bal = cursor.fetchone()['balance']
-    conn.close()
-    return new_bal
+
+def add_balance(user_id, amount, is_deposit=False, kind=None, ref=None):
+    """Credit and return the new balance (unchanged if ``ref`` was already applied)."""
+    if kind is None:
+        kind = "deposit" if is_deposit else "credit"
+    return credit_balance(user_id, amount, kind=kind, ref=ref, is_deposit=is_deposit)[1]
 
 
 def get_total_deposited(user_id):
-    ensure_user_exists(user_id)
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT total_deposited FROM users WHERE user_id = ?", (str(user_id),))
@@ -217,32 +313,37 @@ def get_total_deposited(user_id):
     return row['total_deposited'] if row else 0.0
 
 
-def deduct_balance(user_id, amount):
-    ensure_user_exists(user_id)
-    uid = str(user_id)
-    try:
-        cost = float(amount)
-    except:
-        return False
+def deduct_balance(user_id, amount, kind="purchase", ref=None):
+    """True only if this call charged the amount.
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    A repeated ``ref`` charges nothing and returns False, like an insufficient
+    balance; use debit_balance() to tell the two apart.
+    """
+    status, _ = debit_balance(user_id, amount, kind=kind, ref=ref)
+    return status == "ok"
 
-    cursor.execute("SELECT balance FROM users WHERE user_id = ?", (uid,))
-    row = cursor.fetchone()
-    if not row:
-        conn.close()
-        return False
 
-    current = row['balance']
-    if round(current, 4) >= round(cost, 4):
-        cursor.execute("UPDATE users SET balance = balance - ? WHERE user_id = ?", (cost, uid))
-        conn.commit()
-        conn.close()
-        return True
+def get_ledger(user_id, limit=20):
+    conn = get_db_connection()
+    rows = conn.execute(
+        "SELECT * FROM balance_ledger WHERE user_id = ? ORDER BY id DESC LIMIT ?", (str(user_id), int(limit))
+    ).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
 
+
+def reconcile_balances(tolerance=0.0001):
+    """Users whose balance differs from the sum of their ledger entries."""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT u.user_id, u.balance, COALESCE(l.total, 0.0) AS ledger_total
+        FROM users u
+        LEFT JOIN (SELECT user_id, SUM(amount) AS total FROM balance_ledger GROUP BY user_id) l
+               ON l.user_id = u.user_id
+        WHERE ABS(u.balance - COALESCE(l.total, 0.0)) > ?
+    ''', (tolerance,)).fetchall()
     conn.close()
-    return False
+    return [dict(row) for row in rows]
 
 
 # --- Ban System ---
@@ -266,7 +367,7 @@ def is_banned(user_id):
 # --- Pending Orders ---
 
 def save_pending_order(user_id, product_data, qty, inputs, params):
-    now = datetime.now().strftime("%Y-%m-%d %I:%M %p")
+    now = datetime.now()
     conn = get_db_connection()
     cursor = conn.cursor()
 
@@ -277,8 +378,8 @@ def save_pending_order(user_id, product_data, qty, inputs, params):
             break
 
     cursor.execute('''
-        INSERT INTO orders (id, user_id, product_json, qty, inputs_json, params_json, status, date)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        INSERT INTO orders (id, user_id, product_json, qty, inputs_json, params_json, status, date, created_ts)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
     ''', (
         new_id,
         str(user_id),
@@ -287,7 +388,8 @@ def save_pending_order(user_id, product_data, qty, inputs, params):
         json.dumps(inputs, ensure_ascii=False),
         json.dumps(params, ensure_ascii=False),
         "pending",
-        now
+        now.strftime("%Y-%m-%d %I:%M %p"),
+        int(now.timestamp())
     ))
     conn.commit()
     conn.close()
@@ -394,23 +496,7 @@ def get_all_user_ids():
 
 
 def get_all_admin_ids():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    admin_ids = set()
-    for aid in config.ADMIN_IDS:
-        admin_ids.add(int(aid))
-
-    cursor.execute("SELECT user_id FROM users WHERE is_admin = 1")
-    rows = cursor.fetchall()
-    for row in rows:
-        try:
-            admin_ids.add(int(row['user_id']))
-        except:
-            continue
-
-    conn.close()
-    return list(admin_ids)
+    return [aid for aid in get_admin_ids() if isinstance(aid, int)]
 
 
 # --- Deposit Requests ---
@@ -425,12 +511,14 @@ def save_deposit_request(user_id, method, txn_id, amount, proof_image_id=None):
         if not cursor.fetchone():
             break
 
-    date_str = datetime.now().strftime("%Y-%m-%d %I:%M %p")
+    now = datetime.now()
+    date_str = now.strftime("%Y-%m-%d %I:%M %p")
 
     cursor.execute('''
-        INSERT INTO deposits (id, user_id, method, txn_id, amount, proof_image_id, date, status)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (req_id, str(user_id), method, txn_id, float(amount), proof_image_id, date_str, "pending"))
+        INSERT INTO deposits (id, user_id, method, txn_id, amount, proof_image_id, date, status, created_ts)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (req_id, str(user_id), method, txn_id, float(amount), proof_image_id, date_str, "pending",
+          int(now.timestamp())))
 
     conn.commit()
     conn.close()
@@ -468,6 +556,17 @@ def get_all_deposit_requests():
     return [dict(row) for row in rows]
 
 
+def get_deposit_requests_by_status(status):
+    """طلبات الإيداع بحالة معينة (مثلاً pending) بدون جلب الجدول كاملاً"""
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM deposits WHERE status = ?", (status,))
+    rows = cursor.fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
 def remove_deposit_request(req_id):
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -489,20 +588,110 @@ def get_completed_orders():
 
 
 def get_orders_by_date_range(start_date, end_date):
-    completed_orders = get_completed_orders()
-    filtered = []
-
-    for order in completed_orders:
-        order_date_str = order.get("date", "")
-        if not order_date_str:
-            continue
-        try:
-            order_date = datetime.strptime(order_date_str.split()[0], "%Y-%m-%d")
-            if start_date.date() <= order_date.date() <= end_date.date():
-                filtered.append(order)
-        except (ValueError, IndexError):
-            continue
-    return filtered
+    """Completed orders from start_date to end_date (whole days, inclusive)."""
+    start_ts = int(datetime(start_date.year, start_date.month, start_date.day).timestamp())
+    end_ts = int(datetime(end_date.year, end_date.month, end_date.day).timestamp()) + 86400
+    conn = get_db_connection()
+    rows = conn.execute(
+        "SELECT * FROM orders WHERE status = 'completed' AND created_ts >= ? AND created_ts < ? ORDER BY created_ts",
+        (start_ts, end_ts)
+    ).fetchall()
+    conn.close()
+    return [_dict_factory_order(row) for row in rows]
+
+
+# Completed sales per (local day, store, category) in [:start, :end). API
+# orders are grouped by product first, then named after its catalog category.
+_SALES_BY_DAY_SQL = f'''
+    SELECT date(created_ts, 'unixepoch', 'localtime') AS day, 'LOCAL' AS order_source,
+           COALESCE(CASE WHEN json_valid(product_json) THEN json_extract(product_json, '$.category_name') END,
+                    'Unknown') AS category,
+           COUNT(*) AS orders,
+           SUM(CASE WHEN json_valid(product_json)
+                    THEN COALESCE(json_extract(product_json, '$.price'), 0) * COALESCE(qty, 1) ELSE 0 END) AS total_usd
+    FROM orders
+    WHERE status = 'completed' AND created_ts >= :start AND created_ts < :end
+    GROUP BY day, category
+    UNION ALL
+    SELECT day, 'API',
+           COALESCE((SELECT category_name FROM products WHERE name = a.product_name LIMIT 1), 'Unknown'),
+           SUM(orders), SUM(total_usd)
+    FROM (SELECT date(created_ts, 'unixepoch', 'localtime') AS day, product_name,
+                 COUNT(*) AS orders, SUM(price) AS total_usd
+          FROM api_orders
+          WHERE {migrations.COMPLETED_API_ORDER_FILTER} AND created_ts >= :start AND created_ts < :end
+          GROUP BY day, product_name) AS a
+    GROUP BY 1, 3
+'''
+
+
+def _local_day_ts(day):
+    return int(datetime(day.year, day.month, day.day).timestamp())
+
+
+def _refresh_sales_rollup(conn, first, last):
+    """Recompute the rollup rows of the days in [first, last] that are not current."""
+    days = [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+    current = {row[0] for row in conn.execute(
+        "SELECT day FROM report_rollup_days WHERE day >= ? AND day <= ?", (days[0], days[-1])
+    )}
+    stale = [d for d in days if d not in current]
+    if not stale:
+        return 0
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # One GROUP BY over the stale span; days in it that are still current keep their rows.
+        span = {"start": _local_day_ts(date.fromisoformat(stale[0])),
+                "end": _local_day_ts(date.fromisoformat(stale[-1]) + timedelta(days=1))}
+        stale_set = set(stale)
+        rows = [tuple(r) for r in conn.execute(_SALES_BY_DAY_SQL, span) if r['day'] in stale_set]
+        conn.executemany("DELETE FROM report_daily_rollup WHERE day = ?", [(d,) for d in stale])
+        conn.executemany(
+            "INSERT INTO report_daily_rollup (day, order_source, category, orders, total_usd) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        now = int(time.time())
+        conn.executemany("INSERT OR REPLACE INTO report_rollup_days (day, computed_at) VALUES (?, ?)",
+                         [(d, now) for d in stale])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(stale)
+
+
+def get_sales_summary(start_date, end_date):
+    """Completed sales of both stores from start_date to end_date (whole local days).
+
+    Returns {total_orders, total_usd, category_breakdown {category: orders},
+    source_breakdown {LOCAL/API: orders}}. Sums report_daily_rollup; only
+    days without current rollup rows are aggregated from the orders again.
+    """
+    first = date(start_date.year, start_date.month, start_date.day)
+    last = date(end_date.year, end_date.month, end_date.day)
+    summary = {"total_orders": 0, "total_usd": 0.0, "category_breakdown": {}, "source_breakdown": {}}
+    if last < first:
+        return summary
+
+    conn = get_db_connection()
+    try:
+        _refresh_sales_rollup(conn, first, last)
+        rows = conn.execute(
+            "SELECT order_source, category, SUM(orders) AS orders, SUM(total_usd) AS total_usd "
+            "FROM report_daily_rollup WHERE day >= ? AND day <= ? GROUP BY order_source, category",
+            (first.isoformat(), last.isoformat())
+        ).fetchall()
+    finally:
+        conn.close()
+
+    categories, sources = summary["category_breakdown"], summary["source_breakdown"]
+    for row in rows:
+        summary["total_orders"] += row['orders']
+        summary["total_usd"] += row['total_usd'] or 0.0
+        categories[row['category']] = categories.get(row['category'], 0) + row['orders']
+        sources[row['order_source']] = sources.get(row['order_source'], 0) + row['orders']
+    return summary
 
 
 def load_reports_metadata():
@@ -549,37 +738,197 @@ def get_last_report_date(report_type):
     return row['value'] if row else None
 
 
-def register_user(user_id, name, username):
-    ensure_user_exists(user_id)
-    update_user_info(user_id, name, username)
+# --- Report archive ---
+
+def save_report_archive(report_type, period, file_path, size, checksum):
+    """Index a generated report; a changed checksum drops the stale Telegram file_id."""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT joined_at FROM users WHERE user_id = ?", (str(user_id),))
-    row = cursor.fetchone()
-    if row and not row['joined_at']:
-        cursor.execute("UPDATE users SET joined_at = ? WHERE user_id = ?", (str(datetime.now()), str(user_id)))
+    conn.execute(
+        "INSERT INTO report_archive (report_type, period, file_path, size, checksum, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(report_type, period) DO UPDATE SET file_path = excluded.file_path, size = excluded.size, "
+        "file_id = CASE WHEN checksum IS excluded.checksum THEN file_id END, checksum = excluded.checksum",
+        (report_type, period, file_path, size, checksum, int(time.time()))
+    )
+    conn.commit()
+    conn.close()
+
+
+def count_report_archive(report_type):
+    conn = get_db_connection()
+    row = conn.execute("SELECT COUNT(*) FROM report_archive WHERE report_type = ?", (report_type,)).fetchone()
+    conn.close()
+    return row[0]
+
+
+def get_report_archive_page(report_type, limit, offset=0):
+    """Newest first (period strings sort chronologically within a type)."""
+    conn = get_db_connection()
+    rows = conn.execute(
+        "SELECT * FROM report_archive WHERE report_type = ? ORDER BY period DESC LIMIT ? OFFSET ?",
+        (report_type, limit, offset)
+    ).fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
+
+
+def get_report_archive_entry(report_type, period):
+    conn = get_db_connection()
+    row = conn.execute("SELECT * FROM report_archive WHERE report_type = ? AND period = ?",
+                       (report_type, period)).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+
+def get_report_archive_periods(report_type):
+    conn = get_db_connection()
+    rows = conn.execute("SELECT period FROM report_archive WHERE report_type = ?", (report_type,)).fetchall()
+    conn.close()
+    return {r['period'] for r in rows}
+
+
+def get_report_archive_before(report_type, period):
+    """Entries older than ``period`` that still have a local file."""
+    conn = get_db_connection()
+    rows = conn.execute(
+        "SELECT * FROM report_archive WHERE report_type = ? AND period < ? AND file_path IS NOT NULL",
+        (report_type, period)
+    ).fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
+
+
+def set_report_file_id(report_type, period, file_id):
+    conn = get_db_connection()
+    conn.execute("UPDATE report_archive SET file_id = ? WHERE report_type = ? AND period = ?",
+                 (file_id, report_type, period))
+    conn.commit()
+    conn.close()
+
+
+def release_report_files(entries):
+    """Retention: forget the local PDF of each (report_type, period); rows without a
+    Telegram copy are removed from the archive. Returns (released, removed)."""
+    conn = get_db_connection()
+    try:
+        released = conn.executemany(
+            "UPDATE report_archive SET file_path = NULL WHERE report_type = ? AND period = ? AND file_id IS NOT NULL",
+            entries
+        ).rowcount
+        removed = conn.executemany(
+            "DELETE FROM report_archive WHERE report_type = ? AND period = ? AND file_id IS NULL",
+            entries
+        ).rowcount
         conn.commit()
+    finally:
+        conn.close()
+    return released, removed
+
+
+# --- Media (Telegram file_id per asset) ---
+
+def get_media_file_ids():
+    """{content_hash: file_id} for every asset uploaded before."""
+    conn = get_db_connection()
+    rows = conn.execute("SELECT content_hash, file_id FROM media_files").fetchall()
+    conn.close()
+    return {r['content_hash']: r['file_id'] for r in rows}
+
+
+def save_media_file_id(content_hash, path, file_id):
+    conn = get_db_connection()
+    conn.execute(
+        "INSERT OR REPLACE INTO media_files (content_hash, path, file_id, updated_at) VALUES (?, ?, ?, ?)",
+        (content_hash, path, file_id, int(time.time()))
+    )
+    conn.commit()
     conn.close()
 
 
+def delete_media_file_id(content_hash):
+    conn = get_db_connection()
+    conn.execute("DELETE FROM media_files WHERE content_hash = ?", (content_hash,))
+    conn.commit()
+    conn.close()
+
+
+def register_user(user_id, name, username):
+    """/start: create the user or refresh name/username in one upsert."""
+    uid = str(user_id)
+    conn = get_db_connection()
+    # المستخدم ضغط /start: لم يعد حاظراً للبوت
+    conn.execute('''
+        INSERT INTO users (user_id, name, username, joined_at, balance, banned, total_deposited)
+        VALUES (?, ?, ?, ?, 0.0, 0, 0.0)
+        ON CONFLICT(user_id) DO UPDATE SET
+            name = excluded.name,
+            username = excluded.username,
+            joined_at = COALESCE(users.joined_at, excluded.joined_at),
+            blocked_bot = 0
+    ''', (uid, name, username if username else "No User", str(datetime.now())))
+    conn.commit()
+    conn.close()
+    _known_users.add(uid)
+
+
 def set_admin(user_id, is_admin=True):
+    global _admin_ids
     ensure_user_exists(user_id)
     conn = get_db_connection()
     conn.execute("UPDATE users SET is_admin = ? WHERE user_id = ?", (1 if is_admin else 0, str(user_id)))
     conn.commit()
     conn.close()
 
+    # تحديث مجموعة الأدمنية في الذاكرة (نسخة جديدة بدل التعديل في المكان)
+    admins = set(get_admin_ids())
+    if is_admin:
+        admins.add(_admin_key(user_id))
+    elif not is_super_admin(_admin_key(user_id)):
+        admins.discard(_admin_key(user_id))
+    _admin_ids = frozenset(admins)
 
-def is_user_admin(user_id):
-    if user_id in config.ADMIN_IDS:
-        return True
 
+# --- Admin roles (in-memory) ---
+# config.ADMIN_IDS + users.is_admin, loaded once and kept current by set_admin,
+# so role checks on every update never touch the DB.
+_admin_ids = None
+
+
+def _admin_key(user_id):
+    try:
+        return int(user_id)
+    except (TypeError, ValueError):
+        return str(user_id)
+
+
+def load_admin_ids():
+    """(Re)load the admin set from config and the DB (call after external DB edits)."""
+    global _admin_ids
+    admins = {_admin_key(aid) for aid in config.ADMIN_IDS}
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT is_admin FROM users WHERE user_id = ?", (str(user_id),))
-    row = cursor.fetchone()
+    for row in conn.execute("SELECT user_id FROM users WHERE is_admin = 1").fetchall():
+        admins.add(_admin_key(row['user_id']))
     conn.close()
-    return bool(row['is_admin']) if row else False
+    _admin_ids = frozenset(admins)
+    return _admin_ids
+
+
+def get_admin_ids():
+    """All admin ids as a frozenset (bulk checks: ``uid in admins``)."""
+    admins = _admin_ids
+    if admins is None:
+        admins = load_admin_ids()
+    return admins
+
+
+def is_user_admin(user_id):
+    return _admin_key(user_id) in get_admin_ids()
+
+
+def filter_admins(user_ids):
+    """Subset of ``user_ids`` (as given) that are admins — one set lookup each."""
+    admins = get_admin_ids()
+    return {uid for uid in user_ids if _admin_key(uid) in admins}
 
 
 def is_super_admin(user_id):
@@ -614,9 +963,10 @@ def log_api_order(user_id, uuid, product_name, price, status="pending", order_id
         init_api_orders_table()
         # هنا التعديل المهم: إضافة order_id
         cursor.execute('''
-            INSERT OR IGNORE INTO api_orders (uuid, user_id, product_name, price, status, order_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (str(uuid), str(user_id), product_name, float(price), status, str(order_id) if order_id else None))
+            INSERT OR IGNORE INTO api_orders (uuid, user_id, product_name, price, status, order_id, created_ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (str(uuid), str(user_id), product_name, float(price), status, str(order_id) if order_id else None,
+              int(time.time())))
         conn.commit()
     except Exception as e:
         print(f"❌ DB Log Error: {e}")
@@ -630,7 +980,7 @@ def get_pending_api_orders():
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     # نجلب الطلبات التي لم تكتمل ولم يتم إلغاؤها
-    cursor.execute("SELECT * FROM api_orders WHERE status NOT IN ('completed', 'Success', 'rejected', 'Canceled', 'Fail')")
+    cursor.execute(f"SELECT * FROM api_orders WHERE {migrations.OPEN_API_ORDER_FILTER}")
     rows = cursor.fetchall()
     conn.close()
     return [dict(row) for row in rows]
@@ -654,10 +1004,7 @@ def get_pending_api_uuids():
     conn = get_db_connection()
     cursor = conn.cursor()
     # نجلب الطلبات التي ليست مكتملة وليست ملغية/مرفوضة
-    cursor.execute('''
-        SELECT uuid, user_id FROM api_orders 
-        WHERE status NOT IN ('completed', 'Success', 'accept', 'rejected', 'Canceled', 'Fail')
-    ''')
+    cursor.execute(f"SELECT uuid, user_id FROM api_orders WHERE {migrations.OPEN_API_ORDER_FILTER}")
     rows = cursor.fetchall()
     conn.close()
     return [dict(row) for row in rows]
@@ -681,6 +1028,143 @@ def update_api_order_status(uuid, status, code=None, notified=0):
     conn.close()
 
 
+# --- Broadcast Jobs ---
+
+def create_broadcast_job(from_chat_id, message_id, status_chat_id, status_message_id):
+    """إنشاء حملة وتسجيل كل المستلمين (عدا من حظروا البوت) في معاملة واحدة"""
+    conn = get_db_connection()
+    c = conn.cursor()
+    try:
+        c.execute(
+            "INSERT INTO broadcast_jobs (from_chat_id, message_id, status_chat_id, status_message_id) VALUES (?, ?, ?, ?)",
+            (str(from_chat_id), int(message_id), str(status_chat_id), int(status_message_id))
+        )
+        job_id = c.lastrowid
+        c.execute(
+            "INSERT INTO broadcast_recipients (job_id, user_id) "
+            "SELECT ?, user_id FROM users WHERE COALESCE(blocked_bot, 0) = 0",
+            (job_id,)
+        )
+        total = c.rowcount
+        c.execute("UPDATE broadcast_jobs SET total = ? WHERE id = ?", (total, job_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return job_id, total
+
+
+def get_broadcast_job(job_id):
+    conn = get_db_connection()
+    row = conn.execute("SELECT * FROM broadcast_jobs WHERE id = ?", (int(job_id),)).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+
+def get_running_broadcast_jobs():
+    conn = get_db_connection()
+    rows = conn.execute("SELECT * FROM broadcast_jobs WHERE status = 'running' ORDER BY id").fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def get_broadcast_pending_recipients(job_id, limit=200):
+    conn = get_db_connection()
+    rows = conn.execute(
+        "SELECT user_id FROM broadcast_recipients WHERE job_id = ? AND status = 'pending' LIMIT ?",
+        (int(job_id), int(limit))
+    ).fetchall()
+    conn.close()
+    return [row['user_id'] for row in rows]
+
+
+def save_broadcast_results(job_id, results):
+    """results: [(user_id, status, error)] — sent / blocked / failed. Blocked users are flagged."""
+    if not results: return
+    conn = get_db_connection()
+    c = conn.cursor()
+    try:
+        c.executemany(
+            "UPDATE broadcast_recipients SET status = ?, error = ? WHERE job_id = ? AND user_id = ?",
+            [(status, error, int(job_id), str(uid)) for uid, status, error in results]
+        )
+        blocked = [(str(uid),) for uid, status, _ in results if status == 'blocked']
+        if blocked:
+            c.executemany("UPDATE users SET blocked_bot = 1 WHERE user_id = ?", blocked)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def get_broadcast_progress(job_id):
+    """{'pending': n, 'sent': n, 'blocked': n, 'failed': n}"""
+    conn = get_db_connection()
+    rows = conn.execute(
+        "SELECT status, COUNT(*) AS n FROM broadcast_recipients WHERE job_id = ? GROUP BY status", (int(job_id),)
+    ).fetchall()
+    conn.close()
+    progress = {"pending": 0, "sent": 0, "blocked": 0, "failed": 0}
+    for row in rows:
+        progress[row['status']] = row['n']
+    return progress
+
+
+def finish_broadcast_job(job_id, status="done"):
+    conn = get_db_connection()
+    conn.execute("UPDATE broadcast_jobs SET status = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?",
+                 (status, int(job_id)))
+    conn.commit()
+    conn.close()
+
+
+def apply_api_order_transitions(transitions):
+    """تطبيق نتائج فحص الطلبات (اكتمال/رفض + الاسترجاع) في معاملة واحدة
+
+    Each transition is a dict with uuid, status, optional code and, for
+    rejections, refund (amount) and user_id. A transition only applies if the
+    order is still open, so a refund can never be paid twice. Returns the
+    applied transitions; refunds get ``new_balance``.
+    """
+    if not transitions: return []
+    for t in transitions:
+        if t.get('refund'):
+            ensure_user_exists(t['user_id'])
+
+    applied = []
+    conn = get_db_connection()
+    c = conn.cursor()
+    try:
+        for t in transitions:
+            c.execute(
+                f"UPDATE api_orders SET status = ?, code = COALESCE(?, code), notified = 1 "
+                f"WHERE uuid = ? AND {migrations.OPEN_API_ORDER_FILTER}",
+                (t['status'], t.get('code') or None, str(t['uuid']))
+            )
+            if c.rowcount != 1:
+                continue
+            result = dict(t)
+            if t.get('refund'):
+                uid = str(t['user_id'])
+                row = c.execute("UPDATE users SET balance = balance + ? WHERE user_id = ? RETURNING balance",
+                                (float(t['refund']), uid)).fetchone()
+                result['new_balance'] = row['balance'] if row else 0.0
+                if row:
+                    _ledger_entry(c, uid, float(t['refund']), row['balance'], "refund", f"refund:api:{t['uuid']}")
+            applied.append(result)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return applied
+
+
 def get_all_recent_api_orders(limit=50):
     """جلب أحدث طلبات API للوحة الأدمن"""
     conn = get_db_connection()
@@ -788,6 +1272,70 @@ def get_all_orders_by_source(source=None):
     conn.close()
     return [_dict_factory_order(row) for row in rows]
 
+# --- Order listings (order_index: local + API orders, normalized) ---
+# Rows: order_source (LOCAL/API), id (local id or API uuid), user_id, status,
+# status_group (pending/completed/rejected/unknown), created_at
+# ("YYYY-MM-DD HH:MM:SS", for display), created_ts (epoch, for sorting),
+# price (total), product_name, provider_order_id.
+# Triggers on orders and api_orders keep it current (migration 7).
+
+def _order_index_rows(where, params, limit, offset):
+    conn = get_db_connection()
+    rows = conn.execute(
+        f"SELECT *, created_at AS date FROM order_index WHERE {where} ORDER BY created_ts DESC LIMIT ? OFFSET ?",
+        (*params, int(limit), int(offset))
+    ).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def _order_index_count(where, params):
+    conn = get_db_connection()
+    count = conn.execute(f"SELECT COUNT(*) FROM order_index WHERE {where}", params).fetchone()[0]
+    conn.close()
+    return count
+
+
+def count_orders_by_group(status_group):
+    """Orders (both sources) in a normalized status: pending / completed / rejected."""
+    return _order_index_count("status_group = ?", (status_group,))
+
+
+def get_orders_page(status_group, limit=10, offset=0):
+    """One page of orders in a status group, newest first."""
+    return _order_index_rows("status_group = ?", (status_group,), limit, offset)
+
+
+def count_user_orders(user_id, status_group=None, order_source=None):
+    """A user's orders, optionally in one status group and/or one source (LOCAL / API)."""
+    where, params = "user_id = ?", [str(user_id)]
+    if status_group:
+        where += " AND status_group = ?"
+        params.append(status_group)
+    if order_source:
+        where += " AND order_source = ?"
+        params.append(order_source)
+    return _order_index_count(where, tuple(params))
+
+
+def get_user_orders_page(user_id, limit=10, offset=0):
+    """One page of a user's orders (both sources), newest first."""
+    return _order_index_rows("user_id = ?", (str(user_id),), limit, offset)
+
+
+def search_orders(term):
+    """Exact-match search: local id/user_id, API uuid/provider id/user_id. Returns (local, api)."""
+    term = str(term)
+    conn = get_db_connection()
+    local = conn.execute("SELECT * FROM orders WHERE id = ? OR user_id = ?", (term, term)).fetchall()
+    api = conn.execute(
+        "SELECT * FROM api_orders WHERE uuid = ? OR order_id = ? OR user_id = ? ORDER BY created_at DESC",
+        (term, term, term)
+    ).fetchall()
+    conn.close()
+    return [_dict_factory_order(row) for row in local], [dict(row) for row in api]
+
+
 def get_order_by_uuid(uuid):
     conn = get_db_connection()
     c = conn.cursor()
@@ -800,42 +1348,104 @@ def get_order_by_uuid(uuid):
     return None
 
 
-def sync_products_from_api(products_list):
-    """تحديث جدول المنتجات بناءً على بيانات API"""
-    if not products_list: return
+_API_ORDER_BY_PROVIDER_ID_SQL = (
+    "SELECT a.* FROM order_index i JOIN api_orders a ON a.uuid = i.id "
+    "WHERE i.provider_order_id = ? AND i.order_source = 'API' AND i.user_id = ? "
+    "ORDER BY i.created_ts DESC LIMIT 1"
+)
 
+
+def get_api_order_by_provider_id(order_id, user_id):
+    """A user's API order by the provider's order id (via order_index)."""
     conn = get_db_connection()
-    c = conn.cursor()
+    row = conn.execute(_API_ORDER_BY_PROVIDER_ID_SQL, (str(order_id), str(user_id))).fetchone()
+    conn.close()
+    return dict(row) if row else None
 
-    # التأكد من وجود الجدول بالحقول الصحيحة (للاحتياط)
-    # ملاحظة: هذا يعتمد على هيكلية جدولك، هنا نفترض الحقول الأساسية
-    c.execute('''CREATE TABLE IF NOT EXISTS products (
-        id TEXT PRIMARY KEY,
-        name TEXT,
-        price REAL,
-        category_name TEXT,
-        min_qty INTEGER DEFAULT 1,
-        max_qty INTEGER DEFAULT 1000,
-        description TEXT
-    )''')
 
+def _product_row(p):
+    """(id, name, price, category_name, min_qty, max_qty, description, content_hash)"""
+    pid = str(p.get('id'))
+    name = p.get('name', 'Unknown')
+    price = float(p.get('price', 0))  # السعر بعد إضافة النسبة
+    category = p.get('category_name', 'General')
+    min_q = int(p.get('min', 1))
+    max_q = int(p.get('max', 1000))
+    desc = p.get('description', '')
+    fields = (pid, name, price, category, min_q, max_q, desc)
+    content_hash = hashlib.blake2b("\x1f".join(map(str, fields)).encode('utf-8'), digest_size=8).hexdigest()
+    return fields + (content_hash,)
+
+
+def sync_products_from_api(products_list, prune=False):
+    """تحديث جدول المنتجات بناءً على بيانات API
+
+    Bulk upsert in one transaction. Rows whose content_hash is unchanged are
+    skipped; with ``prune=True`` (the list is the full feed) products that are
+    no longer in the list are deleted. Returns inserted/updated/unchanged/deleted
+    counts and the elapsed seconds.
+    """
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0, "seconds": 0.0}
+    if not products_list and not prune: return stats
+    started = time.perf_counter()
+
+    rows = {}
     for p in products_list:
-        # استخراج البيانات
-        pid = str(p.get('id'))
-        name = p.get('name', 'Unknown')
-        price = float(p.get('price', 0))  # السعر بعد إضافة النسبة
-        category = p.get('category_name', 'General')
-        min_q = int(p.get('min', 1))
-        max_q = int(p.get('max', 1000))
-        desc = p.get('description', '')
-
-        # إدخال أو تحديث
-        c.execute("""
-            INSERT OR REPLACE INTO products 
-            (id, name, price, category_name, min_qty, max_qty, description)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (pid, name, price, category, min_q, max_q, desc))
+        row = _product_row(p)
+        rows[row[0]] = row
 
+    conn = get_db_connection()
+    c = conn.cursor()
+    try:
+        existing = {r[0]: r[1] for r in c.execute("SELECT id, content_hash FROM products")}
+
+        to_write = []
+        for pid, row in rows.items():
+            old_hash = existing.get(pid, False)
+            if old_hash is False:
+                stats["inserted"] += 1
+            elif old_hash != row[-1]:
+                stats["updated"] += 1
+            else:
+                stats["unchanged"] += 1
+                continue
+            to_write.append(row)
+
+        if to_write:
+            c.executemany("""
+                INSERT INTO products
+                (id, name, price, category_name, min_qty, max_qty, description, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    name = excluded.name, price = excluded.price,
+                    category_name = excluded.category_name, min_qty = excluded.min_qty,
+                    max_qty = excluded.max_qty, description = excluded.description,
+                    content_hash = excluded.content_hash
+            """, to_write)
+
+        if prune:
+            vanished = [(pid,) for pid in existing if pid not in rows]
+            if vanished:
+                c.executemany("DELETE FROM products WHERE id = ?", vanished)
+                stats["deleted"] = len(vanished)
+
+        conn.commit()
+    finally:
+        conn.close()
+
+    stats["seconds"] = time.perf_counter() - started
+    print(f"💾 المنتجات: {stats['inserted']} جديد، {stats['updated']} محدّث، "
+          f"{stats['unchanged']} بدون تغيير، {stats['deleted']} محذوف ({stats['seconds'] * 1000:.0f} ms)")
+    return stats
+
+
+def delete_products(product_ids):
+    """حذف المنتجات التي اختفت من قائمة المزود"""
+    if not product_ids: return 0
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.executemany("DELETE FROM products WHERE id = ?", [(str(pid),) for pid in product_ids])
+    deleted = c.rowcount
     conn.commit()
     conn.close()
-    print(f"💾 تم حفظ {len(products_list)} منتج في قاعدة البيانات.")
\ No newline at end of file
+    return deleted
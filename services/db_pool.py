@@ -0,0 +1,265 @@
+"""Thread-affine SQLite connection pool shared by database.py and settings.py.
+
+Opening a fresh sqlite3 connection per query costs more than the query itself,
+so every thread keeps one long-lived connection per database file. Connections
+are configured once (WAL, synchronous=NORMAL, mmap, statement cache) and are
+health-checked when they are checked out after being idle.
+
+Callers keep the familiar ``conn = get_db_connection() ... conn.close()``
+pattern: ``close()`` on a pooled handle only returns the connection to its
+thread slot (rolling back anything left uncommitted) instead of closing it.
+
+A checkout nested inside another one on the same thread shares the
+connection. If the outer caller has a transaction open, the inner handle
+works inside a SAVEPOINT: its ``commit()`` releases the savepoint and its
+``rollback()`` / ``close()`` roll back to it, so an inner helper can never
+commit or discard the outer caller's unfinished work.
+"""
+import sqlite3
+import threading
+import time
+
+DB_NAME = "whitebot.db"
+
+# Per-connection tuning applied once when the connection is opened.
+BUSY_TIMEOUT_MS = 5000
+MMAP_SIZE = 64 * 1024 * 1024
+CACHE_SIZE_KB = 8 * 1024
+STATEMENT_CACHE_SIZE = 256
+
+# A connection idle for longer than this is pinged before being handed out.
+HEALTH_CHECK_AFTER = 30.0
+
+
+def _configure(conn):
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+
+
+class _Slot:
+    """One thread's connection plus its checkout bookkeeping."""
+
+    __slots__ = ("conn", "thread", "depth", "last_used", "savepoints")
+
+    def __init__(self, conn, thread):
+        self.conn = conn
+        self.thread = thread
+        self.depth = 0
+        self.last_used = time.monotonic()
+        self.savepoints = 0
+
+
+class PooledConnection:
+    """Handle returned by ``ConnectionPool.connection()``.
+
+    Behaves like ``sqlite3.Connection`` (attribute access is forwarded) but
+    ``close()`` releases the checkout instead of closing the connection.
+    Nested checkouts on the same thread share the connection; one taken
+    while a transaction is open gets its own SAVEPOINT (see module docstring).
+    """
+
+    __slots__ = ("_pool", "_slot", "_released", "_savepoint")
+
+    def __init__(self, pool, slot, savepoint=None):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_slot", slot)
+        object.__setattr__(self, "_released", False)
+        object.__setattr__(self, "_savepoint", savepoint)
+        if savepoint is not None:
+            slot.conn.execute(f"SAVEPOINT {savepoint}")
+
+    def __getattr__(self, name):
+        return getattr(self._slot.conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._slot.conn, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        self.close()
+        return False
+
+    def commit(self):
+        if self._savepoint is not None:
+            try:
+                self._slot.conn.execute(f"RELEASE SAVEPOINT {self._savepoint}")
+            except sqlite3.OperationalError:
+                # The outer transaction already ended: nothing left to nest in.
+                object.__setattr__(self, "_savepoint", None)
+            else:
+                # Keep this handle's later work undoable too.
+                self._slot.conn.execute(f"SAVEPOINT {self._savepoint}")
+                return
+        self._slot.conn.commit()
+
+    def rollback(self):
+        if self._savepoint is not None:
+            try:
+                self._slot.conn.execute(f"ROLLBACK TO SAVEPOINT {self._savepoint}")
+                return
+            except sqlite3.OperationalError:
+                object.__setattr__(self, "_savepoint", None)
+        self._slot.conn.rollback()
+
+    def close(self):
+        if self._released:
+            return
+        object.__setattr__(self, "_released", True)
+        if self._savepoint is not None:
+            # Like the outermost release: unfinished work of this handle is dropped.
+            try:
+                self._slot.conn.execute(f"ROLLBACK TO SAVEPOINT {self._savepoint}")
+                self._slot.conn.execute(f"RELEASE SAVEPOINT {self._savepoint}")
+            except sqlite3.Error:
+                pass
+        self._pool._release(self._slot)
+
+    def __del__(self):
+        # A caller that raised before close() must not pin the checkout depth.
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Keeps one configured connection per thread for a database file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._slots = []
+        self.opened = 0
+        self.reconnects = 0
+        self.checkouts = 0
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        _configure(conn)
+        return conn
+
+    def _healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _new_slot(self):
+        slot = _Slot(self._open(), threading.current_thread())
+        with self._lock:
+            # Drop connections whose threads have exited (executor threads come and go).
+            alive = []
+            for s in self._slots:
+                if s.thread.is_alive():
+                    alive.append(s)
+                else:
+                    _safe_close(s.conn)
+            alive.append(slot)
+            self._slots = alive
+            self.opened += 1
+        self._local.slot = slot
+        return slot
+
+    def connection(self):
+        """Check out this thread's connection."""
+        slot = getattr(self._local, "slot", None)
+        if slot is None:
+            slot = self._new_slot()
+        elif slot.depth == 0 and time.monotonic() - slot.last_used > HEALTH_CHECK_AFTER:
+            if not self._healthy(slot.conn):
+                _safe_close(slot.conn)
+                slot.conn = self._open()
+                with self._lock:
+                    self.reconnects += 1
+        savepoint = None
+        if slot.depth > 0 and slot.conn.in_transaction:
+            slot.savepoints += 1
+            savepoint = f"pool_nested_{slot.savepoints}"
+        slot.depth += 1
+        self.checkouts += 1
+        return PooledConnection(self, slot, savepoint)
+
+    def _release(self, slot):
+        slot.depth -= 1
+        if slot.depth > 0:
+            return
+        slot.depth = 0
+        slot.savepoints = 0
+        slot.last_used = time.monotonic()
+        conn = slot.conn
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            # Broken connection: replace it on the next checkout.
+            _safe_close(conn)
+            slot.last_used = 0.0
+
+    def close_all(self):
+        """Close every pooled connection (used on shutdown and in scripts)."""
+        with self._lock:
+            slots, self._slots = self._slots, []
+        for s in slots:
+            _safe_close(s.conn)
+        self._local = threading.local()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "path": self.path,
+                "connections": len(self._slots),
+                "opened": self.opened,
+                "reconnects": self.reconnects,
+                "checkouts": self.checkouts,
+            }
+
+
+def _safe_close(conn):
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=DB_NAME):
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                pool = ConnectionPool(path)
+                _pools[path] = pool
+    return pool
+
+
+def get_connection(path=DB_NAME):
+    return get_pool(path).connection()
+
+
+def close_all():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
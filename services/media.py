@@ -0,0 +1,129 @@
+"""Telegram file_id registry for the bot's static images (assets/*.jpg).
+
+Navigation used to send FSInputFile("assets/store.jpg") on every home or
+section click, uploading the same JPEG again each time. Now an asset is
+uploaded once; the file_id Telegram returns is kept in memory and in the
+media_files table, keyed by the file's sha256, and every later photo is sent
+by file_id. Replacing the image changes its hash, so it is uploaded again.
+
+A file_id Telegram no longer accepts (e.g. after a bot token change) is
+dropped and the file is uploaded again in the same call.
+"""
+import hashlib
+import os
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, InputMediaPhoto
+
+import services.async_db as async_db
+
+STORE_IMAGE = "assets/store.jpg"
+WHITE_IMAGE = "assets/white.jpg"
+
+
+# ردود Telegram التي تعني أن file_id المخزّن لم يعد صالحاً (فقط هذه تحذفه من الكاش)
+FILE_ID_ERRORS = (
+    "wrong file identifier",
+    "file reference expired",
+    "file_reference_expired",
+    "wrong remote file identifier",
+    "wrong file_id",
+)
+
+
+def _is_file_id_error(error):
+    text = str(error).lower()
+    return any(marker in text for marker in FILE_ID_ERRORS)
+
+
+def _is_not_modified(error):
+    return "message is not modified" in str(error).lower()
+
+
+class MediaRegistry:
+    def __init__(self):
+        self._hashes = {}       # path -> (mtime_ns, size, sha256)
+        self._file_ids = None   # sha256 -> file_id, loaded on first use
+        self.uploads = 0
+        self.reused = 0
+
+    def _content_hash(self, path):
+        st = os.stat(path)
+        cached = self._hashes.get(path)
+        if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        self._hashes[path] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    async def _lookup(self, path):
+        if self._file_ids is None:
+            self._file_ids = await async_db.get_media_file_ids()
+        content_hash = self._content_hash(path)
+        return content_hash, self._file_ids.get(content_hash)
+
+    async def _remember(self, content_hash, path, message):
+        photos = getattr(message, "photo", None)
+        if not photos:
+            return
+        file_id = photos[-1].file_id
+        if self._file_ids.get(content_hash) != file_id:
+            self._file_ids[content_hash] = file_id
+            await async_db.save_media_file_id(content_hash, path, file_id)
+
+    async def _forget(self, content_hash):
+        if self._file_ids.pop(content_hash, None) is not None:
+            await async_db.delete_media_file_id(content_hash)
+
+    async def _send(self, path, send):
+        """``await send(photo)`` with the file_id when known, else an upload."""
+        content_hash, file_id = await self._lookup(path)
+        if file_id is not None:
+            try:
+                result = await send(file_id)
+                self.reused += 1
+                return result
+            except TelegramBadRequest as e:
+                if not _is_file_id_error(e):
+                    raise
+                await self._forget(content_hash)
+        result = await send(FSInputFile(path))
+        self.uploads += 1
+        await self._remember(content_hash, path, result)
+        return result
+
+    async def answer_photo(self, message, path, **kwargs):
+        """message.answer_photo(path, **kwargs) by file_id."""
+        return await self._send(path, lambda photo: message.answer_photo(photo, **kwargs))
+
+    async def edit_photo(self, message, path, caption=None, parse_mode=None, reply_markup=None):
+        """message.edit_media() to the image at path, by file_id.
+
+        Showing the same image and caption again is not an error (Telegram
+        answers "message is not modified"); other failures propagate.
+        """
+        def send(photo):
+            media = InputMediaPhoto(media=photo, caption=caption, parse_mode=parse_mode)
+            return message.edit_media(media=media, reply_markup=reply_markup)
+        try:
+            return await self._send(path, send)
+        except TelegramBadRequest as e:
+            if _is_not_modified(e):
+                return None
+            raise
+
+
+_registry = MediaRegistry()
+
+
+def get_registry():
+    return _registry
+
+
+async def answer_photo(message, path, **kwargs):
+    return await _registry.answer_photo(message, path, **kwargs)
+
+
+async def edit_photo(message, path, caption=None, parse_mode=None, reply_markup=None):
+    return await _registry.edit_photo(message, path, caption, parse_mode, reply_markup)
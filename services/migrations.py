@@ -0,0 +1,376 @@
+"""Versioned schema migrations for whitebot.db.
+
+Each migration runs once, in order, inside its own transaction, and bumps
+``schema_version``. Migrations must also be safe on a DB that already has
+the change (e.g. columns added by the old ad-hoc migrations).
+
+To change the schema, append a new ``(version, description, function)`` to
+MIGRATIONS; never edit or reorder one that has shipped.
+"""
+
+# Shared with services/database.py: the partial index below is only used by
+# queries whose WHERE clause is exactly this expression.
+OPEN_API_ORDER_FILTER = "status NOT IN ('completed', 'Success', 'accept', 'rejected', 'Canceled', 'Fail')"
+# Completed API orders: ours ('completed') and the provider's statuses.
+COMPLETED_API_ORDER_FILTER = "status IN ('completed', 'Success', 'accept')"
+
+# constants.orders.norm_order_status in SQL (pending / completed / rejected /
+# unknown); stored as order_index.status_group.
+ORDER_STATUS_GROUP = (
+    "(CASE WHEN LOWER(status) IN ('pending', 'processing', 'in progress') THEN 'pending' "
+    "WHEN LOWER(status) IN ('completed', 'complete', 'success', 'accept') THEN 'completed' "
+    "WHEN LOWER(status) IN ('rejected', 'canceled', 'fail', 'refunded') THEN 'rejected' "
+    "ELSE 'unknown' END)"
+)
+
+# orders.date ("%Y-%m-%d %I:%M %p") as "YYYY-MM-DD HH:MM:SS", so it sorts
+# correctly and compares with api_orders.created_at.
+LOCAL_ORDER_TIME = (
+    "(CASE WHEN substr(date, 18, 2) IN ('AM', 'PM') THEN substr(date, 1, 11) || "
+    "printf('%02d', CAST(substr(date, 12, 2) AS INTEGER) % 12 + (substr(date, 18, 2) = 'PM') * 12) || "
+    "substr(date, 14, 3) || ':00' ELSE date END)"
+)
+
+
+def _columns(conn, table):
+    return {col[1] for col in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+def _m001_orders_order_source(conn):
+    if 'order_source' not in _columns(conn, "orders"):
+        conn.execute('ALTER TABLE orders ADD COLUMN order_source TEXT DEFAULT "LOCAL"')
+
+
+def _m002_products_content_hash(conn):
+    if 'content_hash' not in _columns(conn, "products"):
+        conn.execute('ALTER TABLE products ADD COLUMN content_hash TEXT')
+
+
+def _m003_hot_query_indexes(conn):
+    for ddl in (
+        # orders: pending/completed lists, per-user history, admin source filters
+        "CREATE INDEX IF NOT EXISTS idx_orders_status_source ON orders(status, order_source)",
+        "CREATE INDEX IF NOT EXISTS idx_orders_user ON orders(user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_orders_source ON orders(order_source)",
+        # deposits: pending requests
+        "CREATE INDEX IF NOT EXISTS idx_deposits_status ON deposits(status)",
+        # api_orders: user history, admin lists/counts, provider id lookup, poller
+        "CREATE INDEX IF NOT EXISTS idx_api_orders_user_created ON api_orders(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_api_orders_status_created ON api_orders(status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_api_orders_created ON api_orders(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_api_orders_order_id ON api_orders(order_id)",
+        f"CREATE INDEX IF NOT EXISTS idx_api_orders_open ON api_orders(created_at) WHERE {OPEN_API_ORDER_FILTER}",
+        # users: admin list
+        "CREATE INDEX IF NOT EXISTS idx_users_admins ON users(user_id) WHERE is_admin = 1",
+    ):
+        conn.execute(ddl)
+
+
+def _m004_broadcast_jobs(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS broadcast_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        from_chat_id TEXT,
+        message_id INTEGER,
+        status_chat_id TEXT,
+        status_message_id INTEGER,
+        status TEXT DEFAULT 'running',
+        total INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS broadcast_recipients (
+        job_id INTEGER,
+        user_id TEXT,
+        status TEXT DEFAULT 'pending',
+        error TEXT,
+        PRIMARY KEY (job_id, user_id)
+    )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_broadcast_recipients_status ON broadcast_recipients(job_id, status)")
+    if 'blocked_bot' not in _columns(conn, "users"):
+        conn.execute('ALTER TABLE users ADD COLUMN blocked_bot INTEGER DEFAULT 0')
+
+
+def _m005_balance_ledger(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS balance_ledger (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        amount REAL NOT NULL,
+        balance_after REAL,
+        kind TEXT,
+        ref TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_ledger_ref ON balance_ledger(ref) WHERE ref IS NOT NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ledger_user ON balance_ledger(user_id, id)")
+    # Balances that existed before the ledger become its opening entries.
+    conn.execute('''
+    INSERT INTO balance_ledger (user_id, amount, balance_after, kind)
+    SELECT user_id, balance, balance, 'opening' FROM users
+    WHERE balance != 0 AND user_id NOT IN (SELECT user_id FROM balance_ledger)
+    ''')
+
+
+def _m006_order_page_indexes(conn):
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_orders_group_time ON orders({ORDER_STATUS_GROUP}, {LOCAL_ORDER_TIME})")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_api_orders_group_created ON api_orders({ORDER_STATUS_GROUP}, created_at)")
+
+
+# order_index: one normalized row per order from either store, kept current by
+# triggers, so listings never merge the two tables in Python.
+_ORDER_INDEX_LOCAL_ROW = f'''
+    SELECT 'LOCAL', id, user_id, status, {ORDER_STATUS_GROUP}, {LOCAL_ORDER_TIME},
+           CASE WHEN json_valid(product_json)
+                THEN COALESCE(json_extract(product_json, '$.price'), 0) * COALESCE(qty, 1) ELSE 0 END,
+           CASE WHEN json_valid(product_json) THEN json_extract(product_json, '$.name') END, NULL
+    FROM orders'''
+_ORDER_INDEX_API_ROW = f'''
+    SELECT 'API', uuid, CAST(user_id AS TEXT), status, {ORDER_STATUS_GROUP}, created_at,
+           price, product_name, order_id
+    FROM api_orders'''
+_ORDER_INDEX_COLUMNS = "(order_source, id, user_id, status, status_group, created_at, price, product_name, provider_order_id)"
+
+
+def _m007_order_index(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS order_index (
+        order_source TEXT NOT NULL,
+        id TEXT NOT NULL,
+        user_id TEXT,
+        status TEXT,
+        status_group TEXT,
+        created_at TEXT,
+        price REAL,
+        product_name TEXT,
+        provider_order_id TEXT,
+        PRIMARY KEY (order_source, id)
+    )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_index_group ON order_index(status_group, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_index_user ON order_index(user_id, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_index_provider ON order_index(provider_order_id) "
+                 "WHERE provider_order_id IS NOT NULL")
+
+    for table, source, key, row in (("orders", "LOCAL", "id", _ORDER_INDEX_LOCAL_ROW),
+                                    ("api_orders", "API", "uuid", _ORDER_INDEX_API_ROW)):
+        for event in ("INSERT", "UPDATE"):
+            conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_order_index_{event.lower()} AFTER {event} ON {table}
+            BEGIN
+                INSERT OR REPLACE INTO order_index {_ORDER_INDEX_COLUMNS} {row} WHERE rowid = NEW.rowid;
+            END
+            ''')
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_order_index_delete AFTER DELETE ON {table}
+        BEGIN
+            DELETE FROM order_index WHERE order_source = '{source}' AND id = OLD.{key};
+        END
+        ''')
+        conn.execute(f"INSERT OR REPLACE INTO order_index {_ORDER_INDEX_COLUMNS} {row}")
+
+    # Superseded by order_index
+    conn.execute("DROP INDEX IF EXISTS idx_orders_group_time")
+    conn.execute("DROP INDEX IF EXISTS idx_api_orders_group_created")
+
+
+# created_ts: Unix time (UTC seconds) of creation. orders.date / deposits.date
+# are server-local "%Y-%m-%d %I:%M %p"; api_orders.created_at is UTC.
+LOCAL_DATE_TS = f"CAST(strftime('%s', {LOCAL_ORDER_TIME}, 'utc') AS INTEGER)"
+API_CREATED_TS = "CAST(strftime('%s', created_at) AS INTEGER)"
+
+_ORDER_INDEX_LOCAL_ROW_TS = f'''
+    SELECT 'LOCAL', id, user_id, status, {ORDER_STATUS_GROUP}, {LOCAL_ORDER_TIME}, created_ts,
+           CASE WHEN json_valid(product_json)
+                THEN COALESCE(json_extract(product_json, '$.price'), 0) * COALESCE(qty, 1) ELSE 0 END,
+           CASE WHEN json_valid(product_json) THEN json_extract(product_json, '$.name') END, NULL
+    FROM orders'''
+_ORDER_INDEX_API_ROW_TS = f'''
+    SELECT 'API', uuid, CAST(user_id AS TEXT), status, {ORDER_STATUS_GROUP}, created_at, created_ts,
+           price, product_name, order_id
+    FROM api_orders'''
+_ORDER_INDEX_COLUMNS_TS = ("(order_source, id, user_id, status, status_group, created_at, created_ts, "
+                           "price, product_name, provider_order_id)")
+
+
+def _m008_created_ts(conn):
+    for table, ts_expr in (("orders", LOCAL_DATE_TS), ("deposits", LOCAL_DATE_TS), ("api_orders", API_CREATED_TS)):
+        if 'created_ts' not in _columns(conn, table):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN created_ts INTEGER")
+        conn.execute(f"UPDATE {table} SET created_ts = {ts_expr} WHERE created_ts IS NULL")
+        # Inserts write created_ts; this covers any writer that does not.
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_created_ts AFTER INSERT ON {table}
+        WHEN NEW.created_ts IS NULL
+        BEGIN
+            UPDATE {table} SET created_ts = {ts_expr} WHERE rowid = NEW.rowid;
+        END
+        ''')
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_status_ts ON orders(status, created_ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_deposits_ts ON deposits(created_ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_api_orders_ts ON api_orders(created_ts)")
+
+    # order_index sorts by created_ts: local and API times are now comparable.
+    if 'created_ts' not in _columns(conn, "order_index"):
+        conn.execute("ALTER TABLE order_index ADD COLUMN created_ts INTEGER")
+    for table, row in (("orders", _ORDER_INDEX_LOCAL_ROW_TS), ("api_orders", _ORDER_INDEX_API_ROW_TS)):
+        for event in ("INSERT", "UPDATE"):
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_order_index_{event.lower()}")
+            conn.execute(f'''
+            CREATE TRIGGER trg_{table}_order_index_{event.lower()} AFTER {event} ON {table}
+            BEGIN
+                INSERT OR REPLACE INTO order_index {_ORDER_INDEX_COLUMNS_TS} {row} WHERE rowid = NEW.rowid;
+            END
+            ''')
+        conn.execute(f"INSERT OR REPLACE INTO order_index {_ORDER_INDEX_COLUMNS_TS} {row}")
+    conn.execute("DROP INDEX IF EXISTS idx_order_index_group")
+    conn.execute("DROP INDEX IF EXISTS idx_order_index_user")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_index_group_ts ON order_index(status_group, created_ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_index_user_ts ON order_index(user_id, created_ts)")
+
+
+
+def _m009_report_rollup(conn):
+    # One row per (local day, store, category); weekly/monthly reports sum these.
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS report_daily_rollup (
+        day TEXT NOT NULL,
+        order_source TEXT NOT NULL,
+        category TEXT NOT NULL,
+        orders INTEGER NOT NULL,
+        total_usd REAL NOT NULL,
+        PRIMARY KEY (day, order_source, category)
+    ) WITHOUT ROWID
+    ''')
+    # Days whose rollup rows are current. Any write to an order of that day
+    # removes the marker, and the next report recomputes just that day.
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS report_rollup_days (
+        day TEXT PRIMARY KEY,
+        computed_at INTEGER NOT NULL
+    )
+    ''')
+    for table in ("orders", "api_orders"):
+        for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_rollup_{event.lower()} AFTER {event} ON {table}
+            WHEN {row}.created_ts IS NOT NULL
+            BEGIN
+                DELETE FROM report_rollup_days WHERE day = date({row}.created_ts, 'unixepoch', 'localtime');
+            END
+            ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_api_orders_status_ts ON api_orders(status, created_ts)")
+    # API orders only keep the product name; reports look the category up by it.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_name ON products(name)")
+
+
+def _m010_report_archive(conn):
+    # One row per generated report; the admin menus page through it instead
+    # of listing the reports/ directories. file_path is NULL once retention
+    # removed the local PDF and only the Telegram copy (file_id) remains.
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS report_archive (
+        report_type TEXT NOT NULL,
+        period TEXT NOT NULL,
+        file_path TEXT,
+        size INTEGER,
+        checksum TEXT,
+        file_id TEXT,
+        created_at INTEGER NOT NULL,
+        PRIMARY KEY (report_type, period)
+    ) WITHOUT ROWID
+    ''')
+
+
+def _m011_media_files(conn):
+    # Telegram file_id of each uploaded asset, keyed by the file's sha256 so a
+    # replaced image is uploaded again.
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS media_files (
+        content_hash TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        file_id TEXT NOT NULL,
+        updated_at INTEGER NOT NULL
+    )
+    ''')
+
+
+def _m012_rollup_product_triggers(conn):
+    # API rollup rows take their category from products by name, so adding,
+    # removing, renaming or re-categorising a product invalidates every day
+    # with an API order for that name.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_api_orders_product_ts ON api_orders(product_name, created_ts)")
+    for event, when, names in (
+        ("INSERT", "", "NEW.name"),
+        ("DELETE", "", "OLD.name"),
+        ("UPDATE OF name, category_name",
+         "WHEN OLD.name IS NOT NEW.name OR OLD.category_name IS NOT NEW.category_name", "OLD.name, NEW.name"),
+    ):
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_products_rollup_{event.split()[0].lower()} AFTER {event} ON products
+        {when}
+        BEGIN
+            DELETE FROM report_rollup_days WHERE day IN (
+                SELECT date(created_ts, 'unixepoch', 'localtime') FROM api_orders
+                WHERE product_name IN ({names}) AND created_ts IS NOT NULL
+            );
+        END
+        ''')
+
+
+MIGRATIONS = [
+    (1, "orders.order_source column", _m001_orders_order_source),
+    (2, "products.content_hash column", _m002_products_content_hash),
+    (3, "indexes for hot queries", _m003_hot_query_indexes),
+    (4, "broadcast job tables, users.blocked_bot", _m004_broadcast_jobs),
+    (5, "balance_ledger with opening balances", _m005_balance_ledger),
+    (6, "status-group indexes for order pages", _m006_order_page_indexes),
+    (7, "order_index table kept in sync by triggers", _m007_order_index),
+    (8, "created_ts epoch columns with backfill", _m008_created_ts),
+    (9, "daily report rollup with invalidation triggers", _m009_report_rollup),
+    (10, "report_archive index of generated PDFs", _m010_report_archive),
+    (11, "media_files: Telegram file_id per asset hash", _m011_media_files),
+    (12, "invalidate report rollups on product changes", _m012_rollup_product_triggers),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def run_migrations(conn):
+    """Apply pending migrations; returns the schema version reached.
+
+    Each migration runs in its own transaction. A failing one is rolled back
+    and its exception re-raised: the bot must not start on a half-migrated
+    schema that later code (triggers, order_index, created_ts...) relies on.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    version = get_schema_version(conn)
+    conn.commit()
+
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        try:
+            conn.execute("BEGIN")
+            migrate(conn)
+            conn.execute("INSERT INTO schema_version (version) VALUES (?)", (number,))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ Migration {number} ({description}) failed: {e}")
+            raise
+        version = number
+        print(f"✅ Migration {number}: {description}")
+    return version
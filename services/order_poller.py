@@ -0,0 +1,170 @@
+"""Polls the provider for the status of open api_orders.
+
+Each cycle:
+1. loads the open orders and keeps the ones that are due (fresh orders are
+   checked every few seconds, old ones rarely — see BACKOFF);
+2. sends them to /check in batches of BATCH_SIZE, up to MAX_CONCURRENT_BATCHES
+   at a time; only orders whose batch got an answer are scheduled for their
+   next check, the others stay due and are retried on the next tick;
+3. matches the results by uuid or provider order id (dict lookups);
+4. applies every completed/rejected transition, refunds included, in one
+   DB transaction (database.apply_api_order_transitions).
+
+The caller (background_tasks) notifies users about the transitions returned.
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import services.api_manager as api_manager
+import services.async_db as async_db
+
+TICK_SECONDS = 15
+BATCH_SIZE = 50
+MAX_CONCURRENT_BATCHES = 4
+
+# (order age below N seconds, poll every M seconds); the last tier has no limit
+BACKOFF = [
+    (5 * 60, 15),
+    (60 * 60, 60),
+    (6 * 60 * 60, 5 * 60),
+    (None, 30 * 60),
+]
+
+COMPLETED_STATUSES = {'completed', 'Success', 'accept'}
+REJECTED_STATUSES = {'Canceled', 'Fail', 'rejected', 'reject'}
+
+
+def _order_age(order, now):
+    try:
+        created = datetime.strptime(str(order.get('created_at'))[:19], "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return 0
+    # created_at is SQLite CURRENT_TIMESTAMP (UTC)
+    return max(0.0, now - created.replace(tzinfo=timezone.utc).timestamp())
+
+
+def poll_interval(age_seconds):
+    for limit, interval in BACKOFF:
+        if limit is None or age_seconds < limit:
+            return interval
+    return BACKOFF[-1][1]
+
+
+def _stat_uuid(stat):
+    s_uuid = stat.get('order_uuid') or stat.get('custom_uuid')
+    if not s_uuid:
+        api_data = stat.get('data')
+        if isinstance(api_data, dict):
+            s_uuid = api_data.get('custom_uuid') or api_data.get('order_uuid')
+    return s_uuid
+
+
+class OrderPoller:
+    def __init__(self, batch_size=BATCH_SIZE, max_concurrent_batches=MAX_CONCURRENT_BATCHES):
+        self.batch_size = batch_size
+        self.max_concurrent_batches = max_concurrent_batches
+        self._next_check = {}      # uuid -> time.time() when it is due again
+        self.metrics = {
+            "cycles": 0,
+            "last_cycle_seconds": 0.0,
+            "last_polled": 0,
+            "last_batches": 0,
+            "completed": 0,
+            "rejected": 0,
+            "open_orders": 0,
+        }
+
+    def _due(self, orders, now):
+        return [o for o in orders if self._next_check.get(o['uuid'], 0) <= now]
+
+    def _schedule(self, orders, now):
+        """Push the next check of orders that were just polled successfully."""
+        for o in orders:
+            self._next_check[o['uuid']] = now + poll_interval(_order_age(o, now))
+
+    async def _fetch(self, uuids):
+        """Returns (stats, number of batches, uuids whose batch was answered)."""
+        semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+        batches = [uuids[i:i + self.batch_size] for i in range(0, len(uuids), self.batch_size)]
+
+        async def fetch_batch(batch):
+            async with semaphore:
+                return await api_manager.check_orders_status(batch)
+
+        results = await asyncio.gather(*(fetch_batch(b) for b in batches))
+        stats, answered = [], set()
+        for batch, batch_result in zip(batches, results):
+            if batch_result is None:      # provider unreachable: retry next tick
+                continue
+            answered.update(batch)
+            stats.extend(batch_result)
+        return stats, len(batches), answered
+
+    @staticmethod
+    def _transitions(due, stats):
+        by_uuid = {o['uuid']: o for o in due}
+        by_order_id = {str(o['order_id']): o for o in due if o.get('order_id')}
+
+        transitions = {}
+        for stat in stats:
+            local_order = by_uuid.get(_stat_uuid(stat))
+            if local_order is None:
+                ext_id = stat.get('order_id') or stat.get('id')
+                local_order = by_order_id.get(str(ext_id)) if ext_id else None
+            if local_order is None or local_order['uuid'] in transitions:
+                continue
+
+            new_status = stat.get('status')
+            if new_status in COMPLETED_STATUSES:
+                codes = stat.get('replay_api')
+                code_txt = codes[0] if (codes and isinstance(codes, list) and len(codes) > 0) else ""
+                transitions[local_order['uuid']] = {
+                    "uuid": local_order['uuid'], "status": "completed", "code": code_txt,
+                    "order": local_order, "stat": stat,
+                }
+            elif new_status in REJECTED_STATUSES:
+                transitions[local_order['uuid']] = {
+                    "uuid": local_order['uuid'], "status": "rejected",
+                    "refund": float(local_order['price']), "user_id": local_order['user_id'],
+                    "order": local_order, "stat": stat,
+                }
+        return list(transitions.values())
+
+    async def run_cycle(self):
+        """Poll due orders once; returns the transitions that were applied."""
+        started = time.perf_counter()
+        now = time.time()
+        pending_orders = await async_db.get_pending_api_orders()
+        open_uuids = {o['uuid'] for o in pending_orders}
+        for stale in [u for u in self._next_check if u not in open_uuids]:
+            del self._next_check[stale]
+
+        due = self._due(pending_orders, now)
+        applied, batches = [], 0
+        if due:
+            stats, batches, answered = await self._fetch([o['uuid'] for o in due])
+            self._schedule([o for o in due if o['uuid'] in answered], now)
+            transitions = self._transitions(due, stats)
+            if transitions:
+                applied = await async_db.apply_api_order_transitions(transitions)
+
+        m = self.metrics
+        m["cycles"] += 1
+        m["last_cycle_seconds"] = time.perf_counter() - started
+        m["last_polled"] = len(due)
+        m["last_batches"] = batches
+        m["completed"] += sum(1 for t in applied if t['status'] == 'completed')
+        m["rejected"] += sum(1 for t in applied if t['status'] == 'rejected')
+        m["open_orders"] = len(pending_orders) - len(applied)
+        if due:
+            print(f"👀 Order poll: {len(due)}/{len(pending_orders)} due, {batches} batch(es), "
+                  f"{len(applied)} resolved in {m['last_cycle_seconds'] * 1000:.0f} ms")
+        return applied
+
+
+_poller = OrderPoller()
+
+
+def get_poller():
+    return _poller
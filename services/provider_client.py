@@ -0,0 +1,123 @@
+"""Async client for the provider API (/products, /check, /newOrder).
+
+One aiohttp session is shared by the whole bot, so TCP/TLS connections are
+kept alive and reused instead of being opened for every call. Responses are
+requested gzip/deflate-compressed, each endpoint has its own timeout, and a
+semaphore caps how many requests are in flight at once.
+
+The session is created lazily inside the running event loop; call
+``close_client()`` on shutdown.
+"""
+import asyncio
+import json
+
+import aiohttp
+
+import config
+
+MAX_CONNECTIONS = 10        # connections kept in the pool
+MAX_CONCURRENT = 8          # requests in flight at the same time
+KEEPALIVE_SECONDS = 60
+
+# Total seconds per request, by endpoint
+TIMEOUTS = {
+    "products": 30,
+    "check": 15,
+    "newOrder": 45,
+}
+DEFAULT_TIMEOUT = 20
+
+
+class ProviderError(Exception):
+    """Network failure or a response that is not valid JSON."""
+
+
+class ProviderClient:
+    def __init__(self, base_url=None, token=None, max_connections=MAX_CONNECTIONS,
+                 max_concurrent=MAX_CONCURRENT):
+        self.base_url = (base_url or config.API_BASE_URL).rstrip("/")
+        self.token = token if token is not None else config.API_TOKEN
+        self.max_connections = max_connections
+        self.max_concurrent = max_concurrent
+        self._session = None
+        self._semaphore = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=KEEPALIVE_SECONDS,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"api-token": self.token, "Accept-Encoding": "gzip, deflate"},
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._session
+
+    async def request(self, method, endpoint, path="", params=None, headers=None, decode=True):
+        """Send a request and return ``(status, payload, response_headers)``.
+
+        ``payload`` is the decoded JSON, or the raw body bytes when ``decode`` is
+        False, and None for a 304 Not Modified.
+        """
+        session = self._get_session()
+        url = f"{self.base_url}/{endpoint}{path}"
+        timeout = aiohttp.ClientTimeout(total=TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT))
+        async with self._semaphore:
+            try:
+                async with session.request(method, url, params=params, headers=headers,
+                                           timeout=timeout) as response:
+                    if response.status == 304:
+                        return response.status, None, response.headers
+                    body = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise ProviderError(f"{method} /{endpoint}: {e!r}") from e
+        if not decode:
+            return response.status, body, response.headers
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError as e:
+            raise ProviderError(f"{method} /{endpoint}: invalid JSON (HTTP {response.status})") from e
+        return response.status, payload, response.headers
+
+    # --- Endpoints ---
+    async def get_products(self, headers=None):
+        """Raw /products body; pass If-None-Match / If-Modified-Since in ``headers``."""
+        return await self.request("GET", "products", headers=headers, decode=False)
+
+    async def check_orders(self, order_ids, by_uuid=False):
+        params = {"orders": json.dumps(order_ids)}
+        if by_uuid:
+            params["uuid"] = "1"
+        _, payload, _ = await self.request("GET", "check", params=params)
+        return payload
+
+    async def new_order(self, product_id, params):
+        # Never retried here: a second POST could place the order twice.
+        _, payload, _ = await self.request("POST", "newOrder", f"/{product_id}/params", params=params)
+        return payload
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+_client = None
+
+
+def get_client():
+    """Shared client used by api_manager."""
+    global _client
+    if _client is None:
+        _client = ProviderClient()
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -1,21 +1,59 @@
 import sqlite3
 import json
 import os
-
-# reuse DB name from logic, but to keep files decoupled we redefine or import.
-# importing from database avoids circular imports if database doesn't import settings.
-# database imports config, but not settings. So it is safe to act independently or share const.
-DB_NAME = "whitebot.db"
+import copy
+import threading
+from collections.abc import Mapping
+from types import MappingProxyType
+from services import db_pool
+
+# Shares the connection pool with services/database.py (db_pool imports neither
+# module, so there is no circular import).
+DB_NAME = db_pool.DB_NAME
+
+DEFAULT_SETTINGS = {
+    "exchange_rate": 15000,
+    "deposit_commission": 0.0,
+    "margins": {"default": 1.0},
+    "category_names": {}
+}
+
+# --- Process-wide settings cache ---
+# Loaded from the DB once, then kept up to date by every write in this module
+# (write-through). Hot paths (format_price, middlewares) read it without I/O.
+# Container values are stored read-only (MappingProxyType / tuple) so a caller
+# cannot change the shared cache behind everyone's back.
+_cache = None
+_version = 0
+_table_ready = False
+_lock = threading.RLock()
+_subscribers = []
 
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_NAME, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return db_pool.get_connection(DB_NAME)
+
+
+def _freeze(value):
+    if isinstance(value, Mapping):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """Mutable (JSON-serializable) copy of a value returned by get_setting()."""
+    if isinstance(value, Mapping):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(v) for v in value]
+    return copy.deepcopy(value)
 
 
 def init_settings_table():
     """Ensure settings table exists."""
+    global _table_ready
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute('''
@@ -26,10 +64,16 @@ def init_settings_table():
     ''')
     conn.commit()
     conn.close()
+    _table_ready = True
 
 
-def load_settings():
-    init_settings_table()  # Ensure table exists
+def _ensure_table():
+    if not _table_ready:
+        init_settings_table()
+
+
+def _read_from_db():
+    _ensure_table()
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT key, value FROM settings")
@@ -37,12 +81,7 @@ def load_settings():
     conn.close()
 
     # Default values logic
-    data = {
-        "exchange_rate": 15000,
-        "deposit_commission": 0.0,
-        "margins": {"default": 1.0},
-        "category_names": {}
-    }
+    data = copy.deepcopy(DEFAULT_SETTINGS)
 
     # Update with DB values
     for row in rows:
@@ -54,14 +93,73 @@ def load_settings():
         except:
             continue
 
-    return data
+    return {key: _freeze(value) for key, value in data.items()}
+
+
+def _get_cache():
+    global _cache
+    cache = _cache
+    if cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = _read_from_db()
+            cache = _cache
+    return cache
+
+
+def _publish(changed_keys):
+    """Bump the version and tell subscribers which keys changed (None = all)."""
+    global _version
+    with _lock:
+        _version += 1
+        version = _version
+        subscribers = list(_subscribers)
+    for callback in subscribers:
+        try:
+            callback(changed_keys, version)
+        except Exception as e:
+            print(f"⚠️ Settings subscriber error: {e}")
+
+
+def get_settings_version():
+    """Monotonic counter bumped on every settings change or invalidation."""
+    return _version
+
+
+def subscribe(callback):
+    """Register ``callback(changed_keys, version)``; changed_keys is None on invalidate()."""
+    with _lock:
+        if callback not in _subscribers:
+            _subscribers.append(callback)
+    return callback
+
+
+def unsubscribe(callback):
+    with _lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+
+def invalidate():
+    """Drop the cache so the next read reloads from the DB (e.g. after an external edit)."""
+    global _cache
+    with _lock:
+        _cache = None
+    _publish(None)
+
+
+def load_settings():
+    """Return a private copy of all settings (safe to mutate and pass to save_settings)."""
+    return thaw(_get_cache())
 
 
 def save_settings(data):
-    init_settings_table()
+    global _cache
+    _ensure_table()
     conn = get_db_connection()
     cursor = conn.cursor()
 
+    data = thaw(data)
     for key, value in data.items():
         val_json = json.dumps(value, ensure_ascii=False)
         cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, val_json))
@@ -69,22 +167,41 @@ def save_settings(data):
     conn.commit()
     conn.close()
 
+    with _lock:
+        cache = dict(_get_cache())
+        for key, value in data.items():
+            cache[key] = _freeze(value)
+        _cache = cache
+    _publish(set(data.keys()))
+
 
 def get_setting(key, default=None):
-    data = load_settings()
-    return data.get(key, default)
+    """Read a setting from the in-memory cache.
+
+    Dicts come back as read-only MappingProxyType and lists as tuples; use
+    dict(...) / thaw(...) for a copy to change and pass to update_setting().
+    """
+    return _get_cache().get(key, default)
 
 
 def update_setting(key, value):
     # Optimization: Direct DB update
-    init_settings_table()
+    global _cache
+    _ensure_table()
     conn = get_db_connection()
     cursor = conn.cursor()
+    value = thaw(value)
     val_json = json.dumps(value, ensure_ascii=False)
     cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, val_json))
     conn.commit()
     conn.close()
 
+    with _lock:
+        cache = dict(_get_cache())
+        cache[key] = _freeze(value)
+        _cache = cache
+    _publish({key})
+
 
 # --- دوال النسب الجديدة (Logic preserved) ---
 def get_margin_for_category(category_name):
@@ -95,10 +212,9 @@ def get_margin_for_category(category_name):
 
 
 def set_category_margin(category_name, value):
-    data = load_settings()
-    if "margins" not in data: data["margins"] = {}
-    data["margins"][category_name] = float(value)
-    save_settings(data)
+    margins = dict(get_setting("margins", {}))
+    margins[category_name] = float(value)
+    update_setting("margins", margins)
 
 
 def get_deposit_commission():
@@ -115,8 +231,6 @@ def get_category_name(category_key):
 
 
 def set_category_name(category_key, custom_name):
-    data = load_settings()
-    if "category_names" not in data:
-        data["category_names"] = {}
-    data["category_names"][category_key] = custom_name
-    save_settings(data)
\ No newline at end of file
+    category_names = dict(get_setting("category_names", {}))
+    category_names[category_key] = custom_name
+    update_setting("category_names", category_names)
@@ -0,0 +1,102 @@
+"""TTL cache for channel-subscription checks (StrictSubscriptionMiddleware).
+
+Without it every message and button press of every user cost a
+get_chat_member round trip to Telegram. Results are kept for
+SUB_CACHE_POSITIVE_TTL seconds when the user is subscribed and
+SUB_CACHE_NEGATIVE_TTL when not (both overridable in config.py). Concurrent
+lookups for the same user share one request (single-flight). The "check_sub"
+button invalidates the user's entry so a fresh subscription counts at once.
+"""
+import asyncio
+import time
+
+import config
+
+POSITIVE_TTL = getattr(config, "SUB_CACHE_POSITIVE_TTL", 600)
+NEGATIVE_TTL = getattr(config, "SUB_CACHE_NEGATIVE_TTL", 20)
+MAX_ENTRIES = 50000
+
+
+class SubscriptionCache:
+    def __init__(self, positive_ttl=POSITIVE_TTL, negative_ttl=NEGATIVE_TTL, max_entries=MAX_ENTRIES):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries = {}      # user_id -> (is_subscribed, expires_at)
+        self._inflight = {}     # user_id -> Future shared by concurrent lookups
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0         # lookups that joined an in-flight request
+        self.errors = 0
+
+    async def is_subscribed(self, user_id, fetch):
+        """Cached result of ``await fetch(user_id)`` (True when subscribed).
+
+        Errors from ``fetch`` are not cached and propagate to every waiter;
+        if the leading lookup is cancelled, the waiters are cancelled too.
+        """
+        entry = self._entries.get(user_id)
+        now = time.monotonic()
+        if entry is not None and entry[1] > now:
+            self.hits += 1
+            return entry[0]
+
+        future = self._inflight.get(user_id)
+        if future is not None:
+            self.shared += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[user_id] = future
+        try:
+            result = bool(await fetch(user_id))
+        except Exception as e:
+            self.errors += 1
+            future.set_exception(e)
+            future.exception()   # mark retrieved when nobody else is waiting
+            raise
+        except BaseException:
+            # Leader cancelled (or exiting): waiters must not hang on the future.
+            future.cancel()
+            raise
+        else:
+            ttl = self.positive_ttl if result else self.negative_ttl
+            self._store(user_id, result, time.monotonic() + ttl)
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(user_id, None)
+
+    def _store(self, user_id, result, expires_at):
+        if len(self._entries) >= self.max_entries:
+            now = time.monotonic()
+            self._entries = {uid: e for uid, e in self._entries.items() if e[1] > now}
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+        self._entries[user_id] = (result, expires_at)
+
+    def invalidate(self, user_id=None):
+        """Forget one user (or everyone when ``user_id`` is None)."""
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.shared
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+            "errors": self.errors,
+            "hit_rate": (self.hits + self.shared) / lookups if lookups else 0.0,
+        }
+
+
+_cache = SubscriptionCache()
+
+
+def get_cache():
+    return _cache
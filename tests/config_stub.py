@@ -0,0 +1,38 @@
+"""Stand-in for the private config.py, for tests and benchmark.py.
+
+The real config.py (bot token, provider credentials) is not in the repo.
+``install()`` registers a ``config`` module built from WHITEBOT_* environment
+variables when no config.py can be imported; a real one always wins.
+"""
+import importlib
+import os
+import sys
+import types
+
+
+def _env_ids(name):
+    return [int(x) for x in os.environ.get(name, "1").split(",") if x.strip()]
+
+
+def install():
+    """Make ``import config`` work; returns the config module in use."""
+    if "config" in sys.modules:
+        return sys.modules["config"]
+    try:
+        return importlib.import_module("config")
+    except ModuleNotFoundError as e:
+        if e.name != "config":
+            raise
+    config = types.ModuleType("config")
+    config.__file__ = __file__
+    config.BOT_TOKEN = os.environ.get("WHITEBOT_BOT_TOKEN", "0:test")
+    config.ADMIN_IDS = _env_ids("WHITEBOT_ADMIN_IDS")
+    config.API_BASE_URL = os.environ.get("WHITEBOT_API_BASE_URL", "http://127.0.0.1:9")
+    config.API_TOKEN = os.environ.get("WHITEBOT_API_TOKEN", "test")
+    config.CHANNEL_ID = int(os.environ.get("WHITEBOT_CHANNEL_ID", "0"))
+    config.FORCE_SUB_CHANNEL_URL = os.environ.get("WHITEBOT_FORCE_SUB_CHANNEL_URL", "https://t.me/")
+    config.ADMIN_WHATSAPP = os.environ.get("WHITEBOT_ADMIN_WHATSAPP", "https://wa.me/")
+    config.MSG_MAINTENANCE = "maintenance"
+    config.MSG_NO_BALANCE = "no balance"
+    sys.modules["config"] = config
+    return config
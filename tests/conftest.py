@@ -0,0 +1,94 @@
+import asyncio
+import contextlib
+import io
+import os
+
+import pytest
+
+from tests import config_stub
+
+config_stub.install()
+
+import services.catalog_snapshot as catalog_snapshot  # noqa: E402
+import services.database as database  # noqa: E402
+import services.settings as settings  # noqa: E402
+from services import migrations  # noqa: E402
+from tests.stub_provider import load_products_list, start_stub_provider  # noqa: E402
+
+
+def use_database(path, monkeypatch=None):
+    """Point database.py / settings.py (and the catalog snapshot) at ``path``."""
+    targets = [(database, "DB_NAME", path), (settings, "DB_NAME", path), (settings, "_table_ready", False),
+               (catalog_snapshot, "SNAPSHOT_PATH", os.path.join(os.path.dirname(path), "catalog_snapshot.bin"))]
+    for module, name, value in targets:
+        if monkeypatch is not None:
+            monkeypatch.setattr(module, name, value)
+        else:
+            setattr(module, name, value)
+    settings.invalidate()
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh database file, schema built by init_db() -> run_migrations()."""
+    path = str(tmp_path / "test.db")
+    use_database(path, monkeypatch)
+    with contextlib.redirect_stdout(io.StringIO()):   # migration messages
+        database.init_db()
+        settings.init_settings_table()
+    conn = database.get_db_connection()
+    assert migrations.get_schema_version(conn) == migrations.LATEST_VERSION
+    conn.close()
+    yield path
+    settings.invalidate()
+
+
+@pytest.fixture(scope="session")
+def products():
+    return load_products_list()
+
+
+@pytest.fixture
+def provider(products, monkeypatch):
+    """Stub provider serving products_list.txt; config.API_BASE_URL points at it."""
+    import config
+    server = start_stub_provider(products)
+    monkeypatch.setattr(config, "API_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def run():
+    """asyncio.run(coro), closing the shared provider session inside the same loop."""
+    def runner(coro):
+        async def main():
+            from services.provider_client import close_client
+            try:
+                return await coro
+            finally:
+                await close_client()
+        with contextlib.redirect_stdout(io.StringIO()):
+            return asyncio.run(main())
+    return runner
+
+
+@pytest.fixture
+def restart(monkeypatch):
+    """Give api_manager the empty state of a new process; call again to "restart"."""
+    import services.api_manager as api_manager
+    from services.catalog import ProductCatalog
+
+    def reset():
+        monkeypatch.setattr(api_manager, "_catalog", ProductCatalog())
+        monkeypatch.setattr(api_manager, "_raw_products", {})
+        monkeypatch.setattr(api_manager, "_feed_hash", None)
+        monkeypatch.setattr(api_manager, "_priced_margins", None)
+        monkeypatch.setattr(api_manager, "_db_synced", False)
+        monkeypatch.setattr(api_manager, "_feed_validators", {})
+        monkeypatch.setattr(api_manager, "_refresh_lock", asyncio.Lock())
+        monkeypatch.setattr(api_manager, "_revalidate_task", None)
+        monkeypatch.setattr(api_manager, "_last_revalidate", 0.0)
+
+    reset()
+    return reset
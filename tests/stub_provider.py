@@ -0,0 +1,90 @@
+"""Local HTTP/1.1 stand-in for the provider API (tests and benchmark.py)."""
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PRODUCTS_LIST = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "products_list.txt")
+
+
+def load_products_list():
+    """The provider feed sample shipped with the repo."""
+    with open(PRODUCTS_LIST, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def start_stub_provider(products):
+    """Serve /products (with ETag / 304), /check and /newOrder; counts accepted TCP connections.
+
+    ``server.set_products(items)`` changes the feed, ``server.check_status(uuid)``
+    decides each /check answer and ``server.check_delay(n)`` adds latency.
+    /newOrder answers ``server.new_order_response`` after ``new_order_delay``
+    seconds and records the query params in ``server.new_orders``.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True   # headers and body are separate writes
+
+        def setup(self):
+            super().setup()
+            self.server.connections += 1
+
+        def do_GET(self):
+            etag = None
+            if self.path.startswith("/products"):
+                body = self.server.products_body
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+            else:
+                # /check: every requested uuid gets server.check_status(uuid)
+                query = parse_qs(urlparse(self.path).query)
+                uuids = json.loads(query.get("orders", ["[]"])[0])
+                if self.server.check_delay:
+                    time.sleep(self.server.check_delay(len(uuids)))
+                data = [{"order_uuid": u, "status": self.server.check_status(u), "replay_api": ["CODE"]}
+                        for u in uuids]
+                body = json.dumps({"status": "OK", "data": data}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            if etag:
+                self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            self.server.new_orders.append({k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()})
+            time.sleep(self.server.new_order_delay)
+            body = json.dumps(self.server.new_order_response).encode("utf-8")
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except ConnectionError:      # the client gave up (timeout)
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.check_delay = None           # callable: number of ids -> seconds
+    server.check_status = lambda uuid: "pending"
+    server.new_orders = []
+    server.new_order_delay = 0
+    server.new_order_response = {"status": "OK", "data": {"order_id": "1"}}
+    server.set_products = lambda items: setattr(server, "products_body", json.dumps(items).encode("utf-8"))
+    server.set_products(products)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,72 @@
+import threading
+
+import services.database as database
+
+
+def _race(attempt, threads=8, per_thread=40):
+    outcomes = []
+    lock = threading.Lock()
+
+    def worker(n):
+        for i in range(per_thread):
+            result = attempt(n, i)
+            with lock:
+                outcomes.append(result)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return outcomes
+
+
+def test_concurrent_debits_never_overdraw_and_charge_each_ref_once(db):
+    database.add_balance("3003", 100.0)
+    # 320 attempts over 80 refs: every purchase is double-tapped four times.
+    outcomes = _race(lambda n, i: database.debit_balance("3003", 1.0, ref=f"race:{(n * 40 + i) % 80}")[0])
+    assert outcomes.count("ok") == 80
+    assert outcomes.count("duplicate") == 240
+    assert abs(database.get_balance("3003") - 20.0) < 1e-9
+    assert not database.reconcile_balances()
+
+
+def test_insufficient_balance_is_not_charged(db):
+    database.add_balance("3004", 1.0)
+    assert database.debit_balance("3004", 2.0, ref="big")[0] == "insufficient"
+    assert database.debit_balance("3004", 1.0, ref="small")[0] == "ok"
+    assert database.get_balance("3004") == 0.0
+    assert not database.reconcile_balances()
+
+
+def test_repeated_credit_ref_applies_once(db):
+    assert database.credit_balance("3005", 5.0, ref="refund:1")[0] == "ok"
+    assert database.credit_balance("3005", 5.0, ref="refund:1")[0] == "duplicate"
+    assert database.get_balance("3005") == 5.0
+
+
+def test_deduct_balance_is_true_only_when_it_charged(db):
+    database.add_balance("3006", 5.0)
+    assert database.deduct_balance("3006", 2.0, ref="admin:1")
+    assert not database.deduct_balance("3006", 2.0, ref="admin:1")
+    assert not database.deduct_balance("3006", 10.0)
+    assert database.get_balance("3006") == 3.0
+
+
+def test_reused_deposit_id_is_credited_again(db, monkeypatch):
+    monkeypatch.setattr(database.random, "randint", lambda a, b: 12345)
+    first = database.get_deposit_request(database.save_deposit_request("3007", "syriatel", "t1", 5.0)["id"])
+    assert database.credit_balance("3007", 5.0, ref=database.deposit_ref(first), is_deposit=True)[0] == "ok"
+    database.remove_deposit_request(first["id"])
+
+    # Same 5-digit id, a later request.
+    database.save_deposit_request("3007", "syriatel", "t2", 7.0)
+    conn = database.get_db_connection()
+    conn.execute("UPDATE deposits SET created_ts = created_ts + 60 WHERE id = '12345'")
+    conn.commit()
+    conn.close()
+    second = database.get_deposit_request("12345")
+    assert database.deposit_ref(second) != database.deposit_ref(first)
+    assert database.credit_balance("3007", 7.0, ref=database.deposit_ref(second), is_deposit=True)[0] == "ok"
+    assert database.credit_balance("3007", 7.0, ref=database.deposit_ref(second), is_deposit=True)[0] == "duplicate"
+    assert database.get_balance("3007") == 12.0
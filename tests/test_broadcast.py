@@ -0,0 +1,53 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aiogram")
+from aiogram.exceptions import TelegramForbiddenError  # noqa: E402
+from aiogram.methods import CopyMessage  # noqa: E402
+
+import services.broadcast as broadcast  # noqa: E402
+import services.database as database  # noqa: E402
+
+
+class FakeBot:
+    """Every 10th user blocked the bot."""
+
+    def __init__(self):
+        self.delivered = []
+
+    async def copy_message(self, chat_id, from_chat_id, message_id):
+        await asyncio.sleep(0.001)
+        if int(chat_id) % 10 == 0:
+            method = CopyMessage(chat_id=chat_id, from_chat_id=from_chat_id, message_id=message_id)
+            raise TelegramForbiddenError(method, "Forbidden: bot was blocked by the user")
+        self.delivered.append(chat_id)
+
+    async def edit_message_text(self, *args, **kwargs):
+        pass
+
+
+def test_resumed_broadcast_reaches_everyone_once(db):
+    users = 60
+    for i in range(users):
+        database.ensure_user_exists(str(10_000 + i))
+    source = SimpleNamespace(chat=SimpleNamespace(id=1), message_id=1)
+
+    async def scenario():
+        bot = FakeBot()
+        job_id, total = await broadcast.start_broadcast(bot, source, source)
+        await asyncio.sleep(0.2)
+        task = broadcast._running[job_id]     # simulated crash mid-way
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await broadcast.resume_broadcasts(bot)
+        await asyncio.gather(*broadcast._running.values())
+        return bot, total
+
+    bot, total = asyncio.run(scenario())
+    assert total == users
+    assert len(bot.delivered) == len(set(bot.delivered)) == users - users // 10
+    conn = database.get_db_connection()
+    assert conn.execute("SELECT COUNT(*) FROM users WHERE blocked_bot = 1").fetchone()[0] == users // 10
+    conn.close()
@@ -0,0 +1,125 @@
+import contextlib
+import copy
+import io
+import os
+
+import data.mappings as mappings
+import services.api_manager as api_manager
+import services.catalog_snapshot as catalog_snapshot
+import services.database as database
+import services.settings as settings
+from services.catalog import ProductCatalog
+
+
+def _stats():
+    stats = api_manager.get_last_refresh_stats()
+    return stats["status"], stats["added"], stats["changed"], stats["removed"], stats["repriced"]
+
+
+def test_refresh_is_conditional_and_incremental(db, provider, products, restart, run):
+    async def scenario():
+        seen = []
+        await api_manager.refresh_data()
+        seen.append(_stats())
+        await api_manager.refresh_data()
+        seen.append(_stats())
+
+        edited = copy.deepcopy(products[:-3])
+        for p in edited[:5]:
+            p['price'] = float(p.get('price') or 0) + 1
+        provider.set_products(edited)
+        await api_manager.refresh_data()
+        seen.append(_stats())
+
+        margins = dict(settings.get_setting("margins", {}))
+        margins["default"] = float(margins.get("default", 1.0)) + 0.05
+        settings.update_setting("margins", margins)
+        await api_manager.refresh_data()
+        seen.append(_stats())
+        return seen
+
+    first, same, diff, margin = run(scenario())
+    assert first == ("updated", len(products), 0, 0, len(products))
+    assert same == ("not_modified", 0, 0, 0, 0)
+    assert diff == ("updated", 0, 5, 3, 5)
+    assert margin[0] == "updated" and margin[4] == len(products) - 3
+    assert len(api_manager.get_catalog()) == len(products) - 3
+
+
+def test_product_sync_writes_only_changes(db, products):
+    def sync(items):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return database.sync_products_from_api(items, prune=True)
+
+    def counts(stats):
+        return stats["inserted"], stats["updated"], stats["deleted"]
+
+    assert counts(sync(products)) == (len(products), 0, 0)
+    assert counts(sync(products)) == (0, 0, 0)
+    edited = copy.deepcopy(products[:-3])
+    for p in edited[:5]:
+        p['price'] = float(p.get('price') or 0) + 1
+    assert counts(sync(edited)) == (0, 5, 3)
+
+
+def test_browse_index_matches_keyword_search(products):
+    catalog = ProductCatalog(products)
+    for key, keywords in mappings.ALL_MAPS.items():
+        listed = catalog.browse(key)
+        assert [(sid, name) for sid, name, _ in listed] == catalog.search_categories(keywords)
+        assert all(count == len(catalog.by_category[sid]) for sid, _, count in listed)
+    assert catalog.browse("no such key") == []
+
+
+def test_warm_start_serves_snapshot_without_provider_call(db, provider, restart, run):
+    run(api_manager.refresh_data())
+    reference = api_manager.get_catalog()
+    short_id = next(iter(reference.by_category))
+    assert os.path.exists(catalog_snapshot.SNAPSHOT_PATH)
+
+    restart()
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert api_manager.warm_start()
+    assert api_manager.get_catalog().products == reference.products
+
+    async def clicks():
+        connections = provider.connections
+        prods = await api_manager.get_products_by_cat_id(short_id)
+        blocked = provider.connections != connections
+        await api_manager.get_products_by_cat_id("no-such-category")   # background revalidation
+        await api_manager._revalidate_task
+        return prods, blocked
+
+    prods, blocked = run(clicks())
+    assert prods == reference.get_products_by_category(short_id)
+    assert not blocked
+    assert api_manager.get_last_refresh_stats()["status"] == "not_modified"
+
+
+def test_corrupt_snapshot_is_ignored(db, restart):
+    with open(catalog_snapshot.SNAPSHOT_PATH, "wb") as f:
+        f.write(b"not a snapshot")
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert not api_manager.warm_start()
+    assert not api_manager.get_catalog()
+
+
+def test_failed_db_write_is_retried_in_full(db, provider, products, restart, run, monkeypatch):
+    import services.async_db as async_db
+    real_sync = async_db.sync_products_from_api
+
+    async def broken_sync(*args, **kwargs):
+        raise RuntimeError("database is locked")
+
+    async def scenario():
+        monkeypatch.setattr(async_db, "sync_products_from_api", broken_sync)
+        failed = await api_manager.refresh_data()
+        status = _stats()[0]
+        monkeypatch.setattr(async_db, "sync_products_from_api", real_sync)
+        retried = await api_manager.refresh_data()
+        return failed, status, retried, _stats()[0]
+
+    assert run(scenario()) == (False, "db_error", True, "updated")
+    conn = database.get_db_connection()
+    assert conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] == len(products)
+    conn.close()
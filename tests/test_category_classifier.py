@@ -0,0 +1,31 @@
+import data.mappings as mappings
+from services.catalog import clean_str
+from services.category_classifier import CategoryClassifier, classify_product
+
+
+def old_loop(product):
+    """Category assignment of refresh_data before the compiled classifier."""
+    name = clean_str(product.get('name', ''))
+    cat_name = clean_str(product.get('category_name', '')).lower()
+    all_maps = {**mappings.GAMES_MAP, **mappings.APPS_MAP}
+    search_text = (cat_name + " " + name.lower())
+    for key, keywords in all_maps.items():
+        if any(kw in search_text for kw in keywords):
+            return key
+    return "default"
+
+
+def test_same_categories_as_old_loop_over_feed(products):
+    mismatches = [(p['id'], old_loop(p), classify_product(p)) for p in products
+                  if old_loop(p) != classify_product(p)]
+    assert not mismatches
+    assert sum(1 for p in products if classify_product(p) != "default") == 262
+
+
+def test_first_declared_key_wins_and_keywords_are_verbatim():
+    classifier = CategoryClassifier({"A": ["pubg uc"], "B": ["pubg", "Netflix"], "C": [""]})
+    assert classifier.classify("PUBG UC", "60 uc") == "A"
+    assert classifier.classify("PUBG Lite", "") == "B"
+    # keywords are not lowercased: "Netflix" never matches the lowercased text
+    assert classifier.classify("Netflix", "1 month") == "C"
+    assert CategoryClassifier({"A": ["x"]}).classify("", "") == "default"
@@ -0,0 +1,76 @@
+import pytest
+
+from services import db_pool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = db_pool.ConnectionPool(str(tmp_path / "pool.db"))
+    conn = pool.connection()
+    conn.execute("CREATE TABLE t (v INTEGER)")
+    conn.commit()
+    conn.close()
+    yield pool
+    pool.close_all()
+
+
+def _values(pool):
+    conn = pool.connection()
+    values = [row[0] for row in conn.execute("SELECT v FROM t ORDER BY v")]
+    conn.close()
+    return values
+
+
+def test_nested_commit_does_not_commit_outer_transaction(pool):
+    outer = pool.connection()
+    outer.execute("INSERT INTO t VALUES (1)")
+
+    inner = pool.connection()            # e.g. a helper called mid-transaction
+    inner.execute("INSERT INTO t VALUES (2)")
+    inner.commit()
+    inner.close()
+
+    assert outer.in_transaction
+    outer.rollback()                     # the outer caller can still undo everything
+    outer.close()
+    assert _values(pool) == []
+
+
+def test_nested_work_commits_with_outer(pool):
+    outer = pool.connection()
+    outer.execute("INSERT INTO t VALUES (1)")
+    inner = pool.connection()
+    inner.execute("INSERT INTO t VALUES (2)")
+    inner.commit()
+    inner.close()
+    outer.commit()
+    outer.close()
+    assert _values(pool) == [1, 2]
+
+
+def test_nested_close_without_commit_drops_only_inner_work(pool):
+    outer = pool.connection()
+    outer.execute("INSERT INTO t VALUES (1)")
+    inner = pool.connection()
+    inner.execute("INSERT INTO t VALUES (2)")
+    inner.close()
+    outer.commit()
+    outer.close()
+    assert _values(pool) == [1]
+
+
+def test_nested_checkout_without_open_transaction_commits(pool):
+    outer = pool.connection()
+    inner = pool.connection()
+    inner.execute("INSERT INTO t VALUES (3)")
+    inner.commit()
+    inner.close()
+    outer.close()
+    assert _values(pool) == [3]
+
+
+def test_outermost_release_rolls_back(pool):
+    conn = pool.connection()
+    conn.execute("INSERT INTO t VALUES (4)")
+    conn.close()
+    assert _values(pool) == []
@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("aiogram")
+import data.keyboards as kb  # noqa: E402
+import services.settings as settings  # noqa: E402
+
+
+@pytest.mark.parametrize("menu, args", [(kb.main_menu, ()), (kb.category_menu, ("games",)),
+                                        (kb.admin_margins_menu, ())])
+def test_memoized_menu_equals_fresh_build(db, menu, args):
+    assert menu(*args) is menu(*args)
+    assert menu(*args).model_dump() == menu.__wrapped__(*args).model_dump()
+
+
+def test_category_rename_rebuilds(db):
+    first = kb.category_menu("games")
+    settings.set_category_name("PUBG Mobile", "PUBG ⭐")
+    renamed = kb.category_menu("games")
+    assert renamed is not first
+    assert any(b.text == "PUBG ⭐" for row in renamed.inline_keyboard for b in row)
+
+
+def test_cached_markup_is_frozen(db):
+    markup = kb.main_menu()
+    with pytest.raises(Exception):
+        markup.inline_keyboard[0][0].text = "changed"
+
+
+def test_cached_rows_cannot_be_changed(db):
+    markup = kb.main_menu()
+    for change in (lambda: markup.inline_keyboard.append([]),
+                   lambda: markup.inline_keyboard[0].append(markup.inline_keyboard[1][0]),
+                   lambda: markup.inline_keyboard.__setitem__(0, []),
+                   lambda: markup.inline_keyboard[0].pop()):
+        with pytest.raises(TypeError):
+            change()
+    assert markup.model_dump() == kb.main_menu.__wrapped__().model_dump()
+
+
+def test_keyword_arguments_are_cached(db):
+    assert kb.category_menu(section="games") is kb.category_menu(section="games")
+    assert kb.category_menu(section="games").model_dump() == kb.category_menu("games").model_dump()
+    assert kb.back_btn(target="admin") is not kb.back_btn(target="home")
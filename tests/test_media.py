@@ -0,0 +1,81 @@
+import asyncio
+import os
+import shutil
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aiogram")
+from aiogram.exceptions import TelegramBadRequest  # noqa: E402
+from aiogram.methods import SendPhoto  # noqa: E402
+from aiogram.types import FSInputFile  # noqa: E402
+
+import services.media as media  # noqa: E402
+
+ASSET = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "store.jpg")
+
+
+class FakeMessage:
+    """Telegram stand-in: hands out file_ids for uploads, rejects revoked ones."""
+
+    def __init__(self):
+        self.uploads = 0
+        self.revoked = set()
+        self.error = None
+
+    async def answer_photo(self, photo, **kwargs):
+        if isinstance(photo, FSInputFile):
+            self.uploads += 1
+            return SimpleNamespace(photo=[SimpleNamespace(file_id="thumb"),
+                                          SimpleNamespace(file_id=f"photo-{self.uploads}")])
+        if self.error:
+            raise TelegramBadRequest(SendPhoto(chat_id=1, photo=photo), self.error)
+        if photo in self.revoked:
+            raise TelegramBadRequest(SendPhoto(chat_id=1, photo=photo), "Bad Request: wrong file identifier")
+        return SimpleNamespace(photo=[SimpleNamespace(file_id=photo)])
+
+
+@pytest.fixture
+def store(db, tmp_path):
+    path = str(tmp_path / "store.jpg")
+    shutil.copy(ASSET, path)
+    return path
+
+
+def test_one_upload_per_image_version(store):
+    async def scenario():
+        message, registry = FakeMessage(), media.MediaRegistry()
+        for _ in range(20):
+            await registry.answer_photo(message, store, caption="home")
+        steady = message.uploads
+
+        with open(store, "ab") as f:      # admin replaces the image
+            f.write(b"new")
+        await registry.answer_photo(message, store, caption="home")
+        replaced = message.uploads
+
+        message.revoked.add(f"photo-{message.uploads}")   # e.g. bot token changed
+        await registry.answer_photo(message, store, caption="home")
+        await registry.answer_photo(message, store, caption="home")
+        restarted = media.MediaRegistry()                # file_ids persist across restarts
+        await restarted.answer_photo(message, store, caption="home")
+        return steady, replaced, message.uploads, restarted.uploads
+
+    assert asyncio.run(scenario()) == (1, 2, 3, 0)
+
+
+def test_unrelated_errors_keep_the_cached_file_id(store):
+    async def scenario():
+        message, registry = FakeMessage(), media.MediaRegistry()
+        await registry.answer_photo(message, store)
+        message.error = "Bad Request: message caption is too long"   # mentions nothing about the file
+        with pytest.raises(TelegramBadRequest):
+            await registry.answer_photo(message, store)
+        message.error = "Bad Request: file is too big"
+        with pytest.raises(TelegramBadRequest):
+            await registry.answer_photo(message, store)
+        message.error = None
+        await registry.answer_photo(message, store)
+        return message.uploads
+
+    assert asyncio.run(scenario()) == 1
@@ -0,0 +1,59 @@
+import contextlib
+import io
+import sqlite3
+
+import pytest
+
+import services.database as database
+from services import migrations
+
+
+def _tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_fresh_database_reaches_latest_version(db):
+    conn = database.get_db_connection()
+    assert migrations.get_schema_version(conn) == migrations.LATEST_VERSION
+    assert {"order_index", "report_daily_rollup", "report_archive", "media_files"} <= _tables(conn)
+    conn.close()
+
+
+def test_rerun_is_a_no_op(db):
+    conn = database.get_db_connection()
+    assert migrations.run_migrations(conn) == migrations.LATEST_VERSION
+    assert conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0] == migrations.LATEST_VERSION
+    conn.close()
+
+
+def test_failing_migration_rolls_back_and_raises(db, monkeypatch):
+    def broken(conn):
+        conn.execute("CREATE TABLE half_done (id INTEGER)")
+        conn.execute("INSERT INTO missing_table VALUES (1)")
+
+    number = migrations.LATEST_VERSION + 1
+    after = migrations.LATEST_VERSION + 2
+    ran = []
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS + [
+        (number, "broken", broken),
+        (after, "must not run", lambda conn: ran.append(after)),
+    ])
+
+    conn = database.get_db_connection()
+    with pytest.raises(sqlite3.OperationalError), contextlib.redirect_stdout(io.StringIO()):
+        migrations.run_migrations(conn)
+    assert migrations.get_schema_version(conn) == migrations.LATEST_VERSION
+    assert "half_done" not in _tables(conn)
+    assert not ran and not conn.in_transaction
+    conn.close()
+
+
+def test_init_db_refuses_to_start_on_failed_migration(db, monkeypatch):
+    def broken(conn):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS + [
+        (migrations.LATEST_VERSION + 1, "broken", broken),
+    ])
+    with pytest.raises(RuntimeError), contextlib.redirect_stdout(io.StringIO()):
+        database.init_db()
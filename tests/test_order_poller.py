@@ -0,0 +1,73 @@
+import time
+
+import services.database as database
+from services.order_poller import BACKOFF, TICK_SECONDS, OrderPoller, poll_interval
+
+
+def test_cycle_applies_transitions_once(db, provider, run):
+    # a third of the orders get rejected, a third completed, the rest stay pending
+    provider.check_status = lambda u: ("rejected", "completed", "pending")[int(u.split("-")[1]) % 3]
+    for i in range(120):
+        database.log_api_order(str(1000 + i % 4), f"poll-{i}", "Product", 1.5, "pending", order_id=str(i))
+
+    async def scenario():
+        poller = OrderPoller(batch_size=50)
+        first = await poller.run_cycle()
+        batches = poller.metrics["last_batches"]
+        second = await poller.run_cycle()       # nothing is due again yet
+        return first, batches, second, poller.metrics
+
+    first, batches, second, metrics = run(scenario())
+    assert sum(1 for t in first if t['status'] == "completed") == 40
+    assert sum(1 for t in first if t['status'] == "rejected") == 40
+    assert batches == 3 and second == [] and metrics["last_polled"] == 0
+    assert len(database.get_pending_api_orders()) == 40
+    assert sum(database.get_balance(str(1000 + u)) for u in range(4)) == 40 * 1.5
+
+
+def test_old_orders_are_polled_less_often(db):
+    assert poll_interval(0) == BACKOFF[0][1]
+    assert poll_interval(2 * 86400) == BACKOFF[-1][1]
+    for i in range(100):
+        database.log_api_order("1000", f"age-{i}", "Product", 1.0, "pending", order_id=str(i))
+    conn = database.get_db_connection()
+    conn.execute("UPDATE api_orders SET created_at = datetime('now', '-2 days') WHERE CAST(order_id AS INTEGER) >= 10")
+    conn.commit()
+    conn.close()
+
+    pending = database.get_pending_api_orders()
+    poller, now, polled = OrderPoller(), time.time(), 0
+    for tick in range(3600 // TICK_SECONDS):
+        due = poller._due(pending, now + tick * TICK_SECONDS)
+        poller._schedule(due, now + tick * TICK_SECONDS)
+        polled += len(due)
+    # 90 old orders twice an hour; 10 fresh ones every 15 s, then every minute
+    assert 90 * 2 < polled < 90 * 2 + 10 * 3600 // TICK_SECONDS
+
+
+def test_new_order_timeout_is_left_to_the_poller(db, provider, run, monkeypatch):
+    import services.api_manager as api_manager
+    import services.provider_client as provider_client
+    monkeypatch.setitem(provider_client.TIMEOUTS, "newOrder", 0.2)
+    monkeypatch.setattr(api_manager, "get_product_details", lambda pid: {"name": "Product", "price": 2.0})
+    provider.new_order_delay = 1.0
+
+    ok, _, order_uuid, code = run(api_manager.execute_order_dynamic("p1", 1, ["player"], ["playerId"], "4001"))
+    # The provider may have placed it: no failure, no refund, tracked by uuid.
+    assert not ok and code == api_manager.ORDER_OUTCOME_UNKNOWN
+    assert provider.new_orders[0]["order_uuid"] == order_uuid
+    assert [o['uuid'] for o in database.get_pending_api_orders()] == [order_uuid]
+
+    provider.check_status = lambda u: "rejected"
+    applied = run(OrderPoller().run_cycle())
+    assert [t['uuid'] for t in applied] == [order_uuid]
+    assert database.get_balance("4001") == 2.0
+
+
+def test_rejected_new_order_is_not_tracked(db, provider, run, monkeypatch):
+    import services.api_manager as api_manager
+    provider.new_order_response = {"status": "ERROR", "message": "invalid player", "code": 5}
+
+    assert run(api_manager.execute_order_dynamic("p1", 1, ["player"], ["playerId"], "4002")) == \
+        (False, "invalid player", None, 5)
+    assert database.get_pending_api_orders() == []
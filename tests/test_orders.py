@@ -0,0 +1,102 @@
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+import services.api_manager as api_manager
+import services.database as database
+from constants.orders import ORDER_SOURCE_LOCAL, norm_order_status
+
+
+def _seed_orders(local_orders=600, api_orders=600):
+    rng = random.Random(3)
+    conn = database.get_db_connection()
+    conn.executemany(
+        "INSERT INTO orders (id, user_id, product_json, qty, inputs_json, params_json, status, date) "
+        "VALUES (?, ?, ?, 1, '[]', '[]', ?, ?)",
+        [(str(100000 + i), str(i % 50), json.dumps({"name": f"Product {i % 40}", "price": 1.5}),
+          rng.choice(["completed"] * 8 + ["rejected", "pending"]),
+          f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} {1 + i % 12:02d}:{i % 60:02d} {'AM' if i % 2 else 'PM'}")
+         for i in range(local_orders)]
+    )
+    conn.executemany(
+        "INSERT INTO api_orders (uuid, user_id, order_id, product_name, price, status, created_at) "
+        "VALUES (?, ?, ?, 'API Service', 2.0, ?, ?)",
+        [(f"u{i}", i % 50, str(900000 + i), rng.choice(["accept", "Canceled", "pending", "Success"]),
+          f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00") for i in range(api_orders)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_order_pages_match_both_stores(db):
+    _seed_orders()
+    completed = [o for o in database.get_all_api_orders(limit=10000) if norm_order_status(o['status']) == "completed"]
+    completed += [o for o in database.get_all_orders() if norm_order_status(o['status']) == "completed"]
+    assert database.count_orders_by_group("completed") == len(completed)
+
+    page = database.get_orders_page("completed", 10, 20)
+    stamps = [o['created_ts'] for o in page]
+    assert len(page) == 10 and stamps == sorted(stamps, reverse=True)
+
+    user_total = len(database.get_user_local_orders("7")) + len(database.get_user_api_history("7", limit=1000))
+    assert database.count_user_orders("7") == user_total
+    # "my account" counts completed local purchases only, as before order_index
+    local_done = [o for o in database.get_user_local_orders("7") if o['status'] == "completed"]
+    assert database.count_user_orders("7", "completed", ORDER_SOURCE_LOCAL) == len(local_done)
+    assert len(database.get_user_orders_page("7", 8, 0)) == min(8, user_total)
+
+
+def test_date_range_matches_string_parser(db):
+    base = datetime(2024, 1, 1)
+    conn = database.get_db_connection()
+    conn.executemany(
+        "INSERT INTO orders (id, user_id, product_json, qty, inputs_json, params_json, status, date) "
+        "VALUES (?, '1', '{\"name\": \"P\", \"price\": 1}', 1, '[]', '[]', ?, ?)",
+        [(str(i), "rejected" if i % 5 == 0 else "completed",
+          (base + timedelta(minutes=170 * i)).strftime("%Y-%m-%d %I:%M %p")) for i in range(3000)]
+    )
+    conn.commit()
+    assert conn.execute("SELECT COUNT(*) FROM orders WHERE created_ts IS NULL").fetchone()[0] == 0
+    conn.close()
+
+    def parsed(start, end):
+        return sorted(o['id'] for o in database.get_completed_orders()
+                      if start.date() <= datetime.strptime(o['date'].split()[0], "%Y-%m-%d").date() <= end.date())
+
+    for start, end in ((datetime(2024, 3, 10), datetime(2024, 3, 10, 23, 59)),
+                       (datetime(2024, 4, 1), datetime(2024, 4, 30, 23, 59))):
+        got = sorted(o['id'] for o in database.get_orders_by_date_range(start, end))
+        assert got and got == parsed(start, end)
+
+
+def test_failed_check_keeps_orders_due(db, provider, run, monkeypatch):
+    from services.order_poller import OrderPoller
+
+    for i in range(3):
+        database.log_api_order("1000", f"poll-{i}", "Product", 1.0, "pending", order_id=str(i))
+    pending = database.get_pending_api_orders()
+    real_check = api_manager.check_orders_status
+
+    async def unreachable(order_ids):
+        return None
+
+    async def scenario():
+        poller = OrderPoller()
+        monkeypatch.setattr(api_manager, "check_orders_status", unreachable)
+        await poller.run_cycle()
+        after_failure = len(poller._due(pending, time.time() + 1))
+        monkeypatch.setattr(api_manager, "check_orders_status", real_check)
+        await poller.run_cycle()
+        after_success = len(poller._due(pending, time.time() + 1))
+        return after_failure, poller.metrics["last_polled"], after_success
+
+    assert run(scenario()) == (3, 3, 0)
+
+
+def test_api_order_found_by_provider_id(db):
+    _seed_orders(local_orders=0, api_orders=20)
+    order = database.get_api_order_by_provider_id("900007", 7)
+    assert order['uuid'] == "u7"
+    assert database.get_api_order_by_provider_id("900007", 8) is None
+    assert database.get_api_order_by_provider_id("nope", 7) is None
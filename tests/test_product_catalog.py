@@ -0,0 +1,44 @@
+import data.mappings as mappings
+from services.catalog import ProductCatalog, clean_str, generate_stable_id
+
+
+def _linear_category(products, short_id):
+    """The scan get_products_by_cat_id() did before the catalog."""
+    names = {generate_stable_id(clean_str(p.get('category_name', ''))): clean_str(p.get('category_name', ''))
+             for p in products if clean_str(p.get('category_name', ''))}
+    full_name = names.get(str(short_id))
+    return [p for p in products if full_name and clean_str(p.get('category_name', '')) == full_name]
+
+
+def _linear_search(products, keywords):
+    """The scan search_categories() did before the catalog."""
+    found, results = set(), []
+    lower_keywords = [clean_str(k).lower() for k in keywords]
+    for p in products:
+        cat_name = clean_str(p.get('category_name', ''))
+        for kw in lower_keywords:
+            if kw in cat_name.lower():
+                short_id = generate_stable_id(cat_name)
+                if short_id not in found:
+                    found.add(short_id)
+                    results.append((short_id, cat_name))
+                break
+    return results
+
+
+def test_lookups_match_linear_scans(products):
+    catalog = ProductCatalog(products)
+    assert len(catalog) == len(products)
+    for p in products[::25]:
+        assert catalog.get_product(p['id']) is next(q for q in products if str(q.get('id')) == str(p['id']))
+    for short_id in catalog.by_category:
+        assert catalog.get_products_by_category(short_id) == _linear_category(products, short_id)
+    assert catalog.get_products_by_category("no-such-id") == []
+    for keywords in mappings.ALL_MAPS.values():
+        assert catalog.search_categories(keywords) == _linear_search(products, keywords)
+    assert catalog.search_categories(["PUBG", "no such keyword"]) == _linear_search(products, ["PUBG", "no such keyword"])
+
+
+def test_empty_catalog():
+    catalog = ProductCatalog()
+    assert not catalog and catalog.get_product(1) is None and catalog.search_categories(["x"]) == []
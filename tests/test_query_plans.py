@@ -0,0 +1,51 @@
+import pytest
+
+import services.database as database
+from services import migrations
+
+# Queries the handlers and background tasks run all the time; none may full-scan.
+HOT_QUERIES = [
+    ("pending local orders", "SELECT * FROM orders WHERE status = 'pending'", ()),
+    ("orders by status+source", "SELECT * FROM orders WHERE status = ? AND order_source = ?", ("pending", "LOCAL")),
+    ("orders by source", "SELECT * FROM orders WHERE order_source = ?", ("LOCAL",)),
+    ("user local orders", "SELECT * FROM orders WHERE user_id = ?", ("1",)),
+    ("pending deposits", "SELECT * FROM deposits WHERE status = ?", ("pending",)),
+    ("open api orders", lambda m: f"SELECT * FROM api_orders WHERE {m.OPEN_API_ORDER_FILTER}", ()),
+    ("user api history", "SELECT * FROM api_orders WHERE user_id = ? ORDER BY created_at DESC LIMIT ?", ("1", 20)),
+    ("recent api orders", "SELECT * FROM api_orders ORDER BY created_at DESC LIMIT ?", (50,)),
+    ("api orders by status", "SELECT * FROM api_orders WHERE status = ? ORDER BY created_at DESC LIMIT ? OFFSET ?",
+     ("pending", 50, 0)),
+    ("count api orders by status", "SELECT COUNT(*) FROM api_orders WHERE status = ?", ("pending",)),
+    ("api order by uuid/provider id", "SELECT * FROM api_orders WHERE uuid = ? OR order_id = ?", ("x", "x")),
+    ("user api order by provider id", lambda m: database._API_ORDER_BY_PROVIDER_ID_SQL, ("900001", "1")),
+    ("admin ids", "SELECT user_id FROM users WHERE is_admin = 1", ()),
+    ("order page by status group", "SELECT * FROM order_index WHERE status_group = ? "
+                                   "ORDER BY created_ts DESC LIMIT ? OFFSET ?", ("completed", 10, 20)),
+    ("count orders by status group", "SELECT COUNT(*) FROM order_index WHERE status_group = ?", ("completed",)),
+    ("user order history page", "SELECT * FROM order_index WHERE user_id = ? "
+                                "ORDER BY created_ts DESC LIMIT ? OFFSET ?", ("1", 8, 0)),
+    ("completed orders by date range", "SELECT * FROM orders WHERE status = 'completed' "
+                                       "AND created_ts >= ? AND created_ts < ? ORDER BY created_ts", (0, 86400)),
+    ("deposits by date range", "SELECT * FROM deposits WHERE created_ts >= ? AND created_ts < ?", (0, 86400)),
+    ("order search, local", "SELECT * FROM orders WHERE id = ? OR user_id = ?", ("1", "1")),
+    ("order search, api", "SELECT * FROM api_orders WHERE uuid = ? OR order_id = ? OR user_id = ?", ("1", "1", "1")),
+    ("sales by day, both stores", lambda m: database._SALES_BY_DAY_SQL, {"start": 0, "end": 86400}),
+    ("report archive page", "SELECT * FROM report_archive WHERE report_type = ? ORDER BY period DESC LIMIT ? OFFSET ?",
+     ("daily", 10, 0)),
+    ("report rollup range", "SELECT order_source, category, SUM(orders), SUM(total_usd) FROM report_daily_rollup "
+                            "WHERE day >= ? AND day <= ? GROUP BY order_source, category", ("2024-01-01", "2024-01-31")),
+]
+
+
+@pytest.mark.parametrize("label, sql, params", HOT_QUERIES, ids=[q[0] for q in HOT_QUERIES])
+def test_hot_query_uses_an_index(db, label, sql, params):
+    if callable(sql):
+        sql = sql(migrations)
+    conn = database.get_db_connection()
+    plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    conn.close()
+    # Reading back a subquery's own rows ("SCAN a" after "CO-ROUTINE a") is not a table scan.
+    subqueries = {step.split()[-1] for step in plan if step.startswith(("CO-ROUTINE", "MATERIALIZE"))}
+    full_scans = [step for step in plan if step.startswith("SCAN") and "INDEX" not in step
+                  and step.split()[1] not in subqueries]
+    assert not full_scans, " | ".join(plan)
@@ -0,0 +1,36 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+pytest.importorskip("reportlab")
+import reports.renderer as renderer  # noqa: E402
+
+
+def _slow_render(file_path, report_data):
+    time.sleep(report_data["sleep"])
+    with open(file_path, "w") as f:
+        f.write("pdf")
+    return file_path
+
+
+def test_timed_out_render_gets_a_fresh_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(renderer, "_render", _slow_render)
+    monkeypatch.setattr(renderer, "_init_worker", lambda: None)
+
+    async def scenario():
+        r = renderer.ReportRenderer(workers=1, timeout=0.5)
+        try:
+            with pytest.raises(renderer.RenderError):
+                await r.render("daily", "stuck", str(tmp_path / "stuck.pdf"), {"sleep": 3})
+            first_pool = r._pool
+            path = await r.render("daily", "ok", str(tmp_path / "ok.pdf"), {"sleep": 0})
+            return first_pool, path, r._pool, r.metrics
+        finally:
+            r.shutdown()
+
+    first_pool, path, pool, metrics = asyncio.run(scenario())
+    assert first_pool is None and pool is not None
+    assert os.path.exists(path)
+    assert metrics["timeouts"] == 1 and metrics["rendered"] == 1
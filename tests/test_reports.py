@@ -0,0 +1,184 @@
+import asyncio
+import json
+import os
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import services.database as database
+
+CATEGORIES = ["PUBG", "Free Fire", "iTunes", "Netflix"]
+
+
+def _seed_sales(days=40, per_day=30):
+    rng = random.Random(5)
+    base = datetime(2024, 2, 20)
+    local_rows, api_rows = [], []
+    for i in range(days * per_day):
+        when = base + timedelta(seconds=i * 86400 // per_day)
+        category = rng.choice(CATEGORIES)
+        product = {"name": f"{category} pack", "price": rng.choice([1, 2.5, 10]), "category_name": category}
+        status = rng.choice(["completed"] * 4 + ["rejected"])
+        if i % 2:
+            local_rows.append((str(i), json.dumps(product), rng.randint(1, 3), status,
+                               when.strftime("%Y-%m-%d %I:%M %p"), int(when.timestamp())))
+        else:
+            api_rows.append((f"t-{i}", product["name"], product["price"], status, int(when.timestamp())))
+    conn = database.get_db_connection()
+    conn.executemany(
+        "INSERT INTO orders (id, user_id, product_json, qty, inputs_json, params_json, status, date, created_ts) "
+        "VALUES (?, '1', ?, ?, '[]', '[]', ?, ?, ?)", local_rows
+    )
+    conn.executemany(
+        "INSERT INTO api_orders (uuid, user_id, product_name, price, status, created_ts) VALUES (?, '1', ?, ?, ?, ?)",
+        api_rows
+    )
+    conn.executemany("INSERT INTO products (id, name, price, category_name) VALUES (?, ?, 1, ?)",
+                     [(str(n), f"{c} pack", c) for n, c in enumerate(CATEGORIES)])
+    conn.commit()
+    conn.close()
+
+
+def _expected(start, end):
+    """Completed orders of both stores, summed in Python."""
+    lo, hi = int(start.timestamp()), int(end.timestamp()) + 1
+    conn = database.get_db_connection()
+    local = conn.execute("SELECT product_json, qty FROM orders WHERE status = 'completed' "
+                         "AND created_ts >= ? AND created_ts < ?", (lo, hi)).fetchall()
+    api = conn.execute("SELECT product_name, price FROM api_orders WHERE status IN ('completed', 'Success', 'accept') "
+                       "AND created_ts >= ? AND created_ts < ?", (lo, hi)).fetchall()
+    conn.close()
+    total, breakdown = 0.0, {}
+    for row in local:
+        product = json.loads(row['product_json'])
+        total += product['price'] * row['qty']
+        breakdown[product['category_name']] = breakdown.get(product['category_name'], 0) + 1
+    for row in api:
+        total += row['price']
+        category = row['product_name'].replace(" pack", "")
+        breakdown[category] = breakdown.get(category, 0) + 1
+    return len(local) + len(api), round(total, 6), breakdown
+
+
+def test_sales_summary_matches_python_totals(db):
+    _seed_sales()
+    start, end = datetime(2024, 3, 1), datetime(2024, 3, 20, 23, 59, 59)
+    count, total, breakdown = _expected(start, end)
+    for _ in range(2):   # cold (fills the rollup days), then from the rollups
+        summary = database.get_sales_summary(start, end)
+        assert summary["total_orders"] == count
+        assert round(summary["total_usd"], 6) == total
+        assert summary["category_breakdown"] == breakdown
+
+
+def test_order_change_recomputes_only_its_day(db):
+    _seed_sales()
+    start, end = datetime(2024, 3, 1), datetime(2024, 3, 20, 23, 59, 59)
+    before = database.get_sales_summary(start, end)
+    conn = database.get_db_connection()
+    conn.execute("UPDATE api_orders SET status = 'completed' WHERE uuid = (SELECT uuid FROM api_orders "
+                 "WHERE status = 'rejected' AND created_ts >= ? LIMIT 1)", (int(datetime(2024, 3, 15).timestamp()),))
+    conn.commit()
+    cached_days = conn.execute("SELECT COUNT(*) FROM report_rollup_days WHERE day >= '2024-03-01' "
+                               "AND day <= '2024-03-20'").fetchone()[0]
+    conn.close()
+    assert cached_days == 19
+    assert database.get_sales_summary(start, end)["total_orders"] == before["total_orders"] + 1
+
+
+
+def test_product_category_change_recomputes_its_days(db, products):
+    _seed_sales()
+    start, end = datetime(2024, 3, 1), datetime(2024, 3, 20, 23, 59, 59)
+    before = database.get_sales_summary(start, end)["category_breakdown"]
+
+    def cached_days():
+        conn = database.get_db_connection()
+        n = conn.execute("SELECT COUNT(*) FROM report_rollup_days").fetchone()[0]
+        conn.close()
+        return n
+
+    cached = cached_days()
+    database.sync_products_from_api(products[:50])          # unrelated products
+    conn = database.get_db_connection()
+    conn.execute("UPDATE products SET price = 2 WHERE name = 'Netflix pack'")
+    conn.commit()
+    assert cached_days() == cached
+
+    conn.execute("UPDATE products SET category_name = 'Streaming' WHERE name = 'Netflix pack'")
+    conn.commit()
+    conn.close()
+    after = database.get_sales_summary(start, end)["category_breakdown"]
+    # API orders follow the product; local orders keep the category they were bought under
+    assert after["Streaming"] > 0 and after["Netflix"] > 0
+    assert after["Netflix"] + after["Streaming"] == before["Netflix"]
+
+@pytest.fixture
+def report_files(db, tmp_path, monkeypatch):
+    archive = pytest.importorskip("reports.archive")
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(archive.report_dir("daily"))
+    first_day = datetime(2024, 1, 1)
+    for n in range(200):
+        day = (first_day + timedelta(days=n)).strftime("%Y_%m_%d")
+        with open(os.path.join(archive.report_dir("daily"), f"daily_sales_{day}.pdf"), "wb") as f:
+            f.write(b"%PDF-1.4 " + day.encode())
+    return archive
+
+
+def test_archive_indexes_reuses_file_id_and_applies_retention(report_files):
+    archive = report_files
+    from aiogram.types import FSInputFile
+
+    assert archive.index_existing_reports() == 200
+    assert archive.index_existing_reports() == 0
+    newest = database.get_report_archive_page("daily", 10, 0)[0]['period']
+    assert newest == "2024_07_18"
+
+    uploads, sends = [], []
+
+    async def send(document):
+        sends.append(document)
+        if isinstance(document, FSInputFile):
+            uploads.append(document)
+        return SimpleNamespace(document=SimpleNamespace(file_id=f"tg-file-{len(uploads)}"))
+
+    async def scenario():
+        for _ in range(5):
+            await archive.send_report(send, "daily", newest)
+        await archive.send_report(send, "daily", "2024_01_01")
+        return await archive.apply_retention(now=datetime(2024, 7, 18))
+
+    released, removed = asyncio.run(scenario())
+    assert len(sends) == 6 and len(uploads) == 2
+    assert (released, removed) == (1, 108)
+    kept = len(os.listdir(archive.report_dir("daily")))
+    assert kept == archive.RETENTION_DAYS["daily"] + 1
+    assert database.count_report_archive("daily") == kept + 1
+    old = database.get_report_archive_entry("daily", "2024_01_01")
+    assert old['file_path'] is None and old['file_id'] == "tg-file-2"
+
+
+def test_report_reaches_every_admin(report_files, monkeypatch):
+    scheduler = pytest.importorskip("reports.scheduler")
+    report_files.index_existing_reports()
+    monkeypatch.setattr(database, "get_all_admin_ids", lambda: [1, 2, 3])
+    path = os.path.join(report_files.report_dir("daily"), "daily_sales_2024_07_18.pdf")
+    missing = os.path.join(report_files.report_dir("daily"), "daily_sales_2030_01_01.pdf")
+
+    class FakeBot:
+        def __init__(self):
+            self.chats = []
+
+        async def send_document(self, chat_id, document, **kwargs):
+            if chat_id == 1:
+                raise RuntimeError("chat not found")
+            self.chats.append(chat_id)
+            return SimpleNamespace(document=SimpleNamespace(file_id="tg-file"))
+
+    bot = FakeBot()
+    asyncio.run(scheduler.send_report_to_admins(bot, path, "Daily", "2024-07-18", 1.0, 100))
+    asyncio.run(scheduler.send_report_to_admins(bot, missing, "Daily", "2030-01-01", 0.0, 0))
+    assert bot.chats == [2, 3]
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+import services.settings as settings
+
+
+def test_cached_containers_are_read_only(db):
+    settings.update_setting("margins", {"default": 1.1, "PUBG": 1.2})
+    settings.update_setting("banned_words", ["a", "b"])
+    version = settings.get_settings_version()
+
+    margins = settings.get_setting("margins")
+    with pytest.raises(TypeError):
+        margins["PUBG"] = 9.0
+    with pytest.raises(AttributeError):
+        settings.get_setting("banned_words").append("c")
+
+    assert settings.get_setting("margins") == {"default": 1.1, "PUBG": 1.2}
+    assert list(settings.get_setting("banned_words")) == ["a", "b"]
+    assert settings.get_settings_version() == version
+
+
+def test_copies_can_be_changed_and_written_back(db):
+    settings.update_setting("margins", {"default": 1.0, "nested": {"x": [1]}})
+    margins = settings.thaw(settings.get_setting("margins"))
+    margins["nested"]["x"].append(2)
+    settings.update_setting("margins", margins)
+    assert settings.thaw(settings.get_setting("margins"))["nested"]["x"] == [1, 2]
+
+    everything = settings.load_settings()
+    everything["margins"]["default"] = 2.0
+    json.dumps(everything)
+    assert settings.get_setting("margins")["default"] == 1.0
+
+    settings.set_category_margin("PUBG", 1.3)
+    assert settings.get_margin_for_category("PUBG") == 1.3
+
+
+def test_read_only_values_survive_a_reload(db):
+    settings.update_setting("category_names", {"PUBG Mobile": "PUBG ⭐"})
+    settings.invalidate()
+    names = settings.get_setting("category_names")
+    assert names["PUBG Mobile"] == "PUBG ⭐"
+    with pytest.raises(TypeError):
+        names["x"] = "y"
@@ -0,0 +1,116 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import services.subscription_cache as subscription_cache
+from services.subscription_cache import SubscriptionCache
+
+
+class Fetcher:
+    """Stand-in for get_chat_member: counts calls, answers from ``subscribed``."""
+
+    def __init__(self, subscribed=(), delay=0.0, error=None):
+        self.subscribed = set(subscribed)
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self, user_id):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return user_id in self.subscribed
+
+
+def test_positive_and_negative_results_expire_separately():
+    async def scenario():
+        cache, fetch = SubscriptionCache(positive_ttl=60, negative_ttl=0.05), Fetcher(subscribed={1})
+        first = [await cache.is_subscribed(uid, fetch) for uid in (1, 2)]
+        cached = [await cache.is_subscribed(uid, fetch) for uid in (1, 2)]
+        calls_while_fresh = fetch.calls
+        await asyncio.sleep(0.1)                  # only the negative entry expired
+        fetch.subscribed.add(2)
+        later = [await cache.is_subscribed(uid, fetch) for uid in (1, 2)]
+        return first, cached, calls_while_fresh, later, fetch.calls, cache.stats()
+
+    first, cached, calls_while_fresh, later, calls, stats = asyncio.run(scenario())
+    assert first == cached == [True, False] and later == [True, True]
+    assert calls_while_fresh == 2 and calls == 3
+    assert (stats["hits"], stats["misses"], stats["shared"], stats["entries"]) == (3, 3, 0, 2)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_concurrent_lookups_share_one_fetch():
+    async def scenario():
+        cache, fetch = SubscriptionCache(), Fetcher(subscribed={7}, delay=0.01)
+        results = await asyncio.gather(*(cache.is_subscribed(7, fetch) for _ in range(20)))
+        return results, fetch.calls, cache.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == [True] * 20 and calls == 1
+    assert (stats["misses"], stats["shared"]) == (1, 19)
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    async def scenario():
+        cache, fetch = SubscriptionCache(), Fetcher(delay=0.01, error=RuntimeError("flood wait"))
+        results = await asyncio.gather(*(cache.is_subscribed(7, fetch) for _ in range(5)), return_exceptions=True)
+        fetch.error = None
+        again = await cache.is_subscribed(7, fetch)
+        return results, again, fetch.calls, cache.stats()
+
+    results, again, calls, stats = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert again is False and calls == 2 and stats["errors"] == 1
+
+
+def test_cancelled_leader_does_not_leave_waiters_hanging():
+    async def scenario():
+        cache, fetch = SubscriptionCache(), Fetcher(subscribed={7}, delay=10)
+        leader = asyncio.ensure_future(cache.is_subscribed(7, fetch))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(cache.is_subscribed(7, fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        results = await asyncio.wait_for(asyncio.gather(*waiters, return_exceptions=True), timeout=1)
+        fetch.delay = 0
+        again = await cache.is_subscribed(7, fetch)
+        return results, again, fetch.calls
+
+    results, again, calls = asyncio.run(scenario())
+    assert all(isinstance(r, asyncio.CancelledError) for r in results)
+    assert again is True and calls == 2
+
+
+def test_check_sub_button_asks_telegram_again(db, monkeypatch):
+    pytest.importorskip("aiogram")
+    from aiogram import types
+    from bot.middlewares.subscription import StrictSubscriptionMiddleware, _fetch_subscription
+
+    cache = SubscriptionCache()
+    monkeypatch.setattr(subscription_cache, "_cache", cache)
+    user = types.User(id=4242, is_bot=False, first_name="Test")
+    statuses = ["left"]
+
+    class FakeBot:
+        calls = 0
+
+        async def get_chat_member(self, chat_id, user_id):
+            FakeBot.calls += 1
+            return SimpleNamespace(status=statuses[-1])
+
+    async def handler(event, data):
+        return "handled"
+
+    async def scenario():
+        bot = FakeBot()
+        # an earlier update found the user unsubscribed; they join the channel and press the button
+        assert not await cache.is_subscribed(user.id, lambda uid: _fetch_subscription(bot, uid))
+        statuses.append("member")
+        button = types.CallbackQuery(id="1", from_user=user, chat_instance="1", data="check_sub")
+        result = await StrictSubscriptionMiddleware()(handler, button, {"event_from_user": user, "bot": bot})
+        return result, FakeBot.calls
+
+    assert asyncio.run(scenario()) == ("handled", 2)